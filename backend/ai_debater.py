@@ -3,63 +3,150 @@ AI 토론자 시스템 (LLM 기반, CPU 경량 버전)
 페르소나를 반영해 새로운 댓글 스타일로 토론 생성
 """
 
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import random
 import sys, os
+import time
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from model.comment_persona_engine import CommentPersonaEngine
-from models import Side, DebateMessage, AnalysisResult, DebateState
+from model.generation import generate, derive_seed
+from model.llm_loader import DEFAULT_MODEL_ID, load_text_generation
+from model.prompt_budget import PromptBuilder, context_length
+from request_profiler import span
+from response_cache import ResponseCache
+from sentiment_tracker import SentimentTracker
+from models import Side, DebateMessage, AnalysisResult, DebateState, Argument, EmotionalPattern
+
+DEFAULT_TOPIC = "정치적 공정성"
+RESPONSE_MAX_NEW_TOKENS = 150
+# 프롬프트에 넣을 최근 대화 (최대 메시지 수 / 토큰 예산)
+HISTORY_MAX_MESSAGES = 4
+HISTORY_TOKEN_BUDGET = 300
+
+
+def build_default_analysis() -> AnalysisResult:
+    """페르소나 기반 토론용 더미 분석 정보"""
+    return AnalysisResult(
+        left_arguments=[Argument(point="진보", keywords=["개혁"])],
+        right_arguments=[Argument(point="보수", keywords=["안정"])],
+        controversial_keywords=["정치"],
+        left_emotional_patterns=[EmotionalPattern(pattern="열정적", examples=[])],
+        right_emotional_patterns=[EmotionalPattern(pattern="냉정함", examples=[])],
+        sample_comments={"left": [], "right": []}
+    )
 
 
 class AIDebater:
     """AI 토론자 (경량 LLM 기반)"""
 
-    def __init__(self, side: Side, analysis: AnalysisResult, persona_engine: CommentPersonaEngine, llm_pipeline):
+    def __init__(self, side: Side, analysis: AnalysisResult, persona_engine: CommentPersonaEngine, llm_pipeline,
+                 response_cache: Optional[ResponseCache] = None, speculative: Optional[Dict] = None):
         self.side = side
         self.analysis = analysis
         self.persona_engine = persona_engine
         self.llm = llm_pipeline  # ✅ pipeline 공유
+        self.response_cache = response_cache
+        self.speculative = speculative if speculative is not None else {}  # 초안 종류 → SpeculativeDecoder
         self.device = "cpu"
 
-    def generate_response(self, state: DebateState, opponent_message: Optional[DebateMessage] = None) -> str:
-        """토론 응답 생성 (경량 모델 기반)"""
+    def build_prompt(self, state: DebateState, opponent_message: Optional[DebateMessage] = None) -> str:
         side_str = "left" if self.side == Side.LEFT else "right"
         persona_prompt = self.persona_engine.get_persona_prompt(side_str)
 
-        conversation = ""
-        for msg in state.messages[-4:]:
-            speaker = "나" if msg.side == self.side else "상대"
-            conversation += f"{speaker}: {msg.content}\n"
-
+        recent = state.messages[-HISTORY_MAX_MESSAGES:]
         topic = state.current_topic or "정치 논쟁"
         opponent_text = opponent_message.content if opponent_message else "이 사안에 대해 너의 생각은 뭐야?"
 
-        prompt = f"""
+        # 페르소나/주제/마지막 질문은 항상 포함, 최근 대화는 최신부터 예산 안에서
+        return (
+            PromptBuilder(self.persona_engine.token_counter, context_length(self.llm) - RESPONSE_MAX_NEW_TOKENS)
+            .text(f"""
 {persona_prompt}
 
 현재 주제: {topic}
 
 최근 대화:
-{conversation}
+""")
+            .items([msg.content for msg in recent], budget=HISTORY_TOKEN_BUDGET, newest_first=True,
+                   labels=["나: " if msg.side == self.side else "상대: " for msg in recent])
+            .text(f"""
 상대: {opponent_text}
-나:"""
+나:""")
+            .build()
+        )
+
+    def generation_params(self) -> dict:
+        return dict(
+            max_new_tokens=RESPONSE_MAX_NEW_TOKENS,
+            temperature=0.8,
+            do_sample=True,
+            top_p=0.9,
+            pad_token_id=self.llm.tokenizer.eos_token_id
+        )
+
+    @staticmethod
+    def _postprocess(prompt: str, generated_text: str) -> str:
+        response = generated_text[len(prompt):].strip()
+        if len(response) > 200:
+            response = response.split(".")[0] + "."
+        return response or "그 부분은 좀 더 생각해봐야겠네요."
+
+    def generate_candidates(self, state: DebateState, opponent_message: Optional[DebateMessage] = None,
+                            n: int = 1, rng: Optional[random.Random] = None) -> List[str]:
+        """같은 프롬프트로 후보 n개를 한 번의 generate 호출로 생성 (프롬프트 prefill 공유)"""
+        with span("build_prompt"):
+            prompt = self.build_prompt(state, opponent_message)
+        params = self.generation_params()
+        seed = derive_seed(rng)
+        if n == 1 and state.speculative:
+            text = self._generate_speculative(state, prompt, params, seed)
+            if text is not None:
+                return [self._postprocess(prompt, text)]
+        if n > 1:
+            params["num_return_sequences"] = n
+        with span("generate"):
+            started = time.perf_counter()
+            outputs = generate(self.llm, prompt, seed=seed, **params)
+        if n == 1:
+            # 추측 디코딩 속도 비교 기준 (일반 생성 토큰당 시간)
+            for decoder in self.speculative.values():
+                decoder.record_baseline(prompt, outputs[0]["generated_text"], time.perf_counter() - started)
+        return [self._postprocess(prompt, out["generated_text"]) for out in outputs]
 
+    def _generate_speculative(self, state: DebateState, prompt: str, params: dict, seed: Optional[int]) -> Optional[str]:
+        """세션이 고른 초안으로 추측 디코딩, 쓸 수 없으면 None (일반 생성으로 처리)"""
+        decoder = self.speculative.get(state.speculative.get("draft"))
+        if decoder is None:
+            return None
         try:
-            result = self.llm(
-                prompt,
-                max_new_tokens=150,
-                temperature=0.8,
-                do_sample=True,
-                top_p=0.9,
-                pad_token_id=self.llm.tokenizer.eos_token_id
-            )[0]["generated_text"]
-
-            response = result[len(prompt):].strip()
-            if len(response) > 200:
-                response = response.split(".")[0] + "."
-            return response or "그 부분은 좀 더 생각해봐야겠네요."
+            with span("generate_speculative"):
+                text, stats = decoder.generate(prompt, key=self.side.value, seed=seed, **params)
+        except ValueError as e:
+            print(f"⚠ 추측 디코딩 불가 → 일반 생성: {e}")
+            return None
+
+        from model.speculative import merge_stats, summarize
+        state.speculative = summarize(merge_stats(dict(state.speculative), stats), decoder.baseline_ms_per_token())
+        return text
+
+    def generate_response(self, state: DebateState, opponent_message: Optional[DebateMessage] = None,
+                          rng: Optional[random.Random] = None) -> str:
+        """토론 응답 생성 (경량 모델 기반, rng가 있으면 재현 가능한 시드로 생성)"""
+        try:
+            # 시드 재현 모드는 캐시를 거치지 않음 (캐시 상태에 따라 결과가 달라지므로)
+            cache = self.response_cache if rng is None else None
+            if not cache:
+                return self.generate_candidates(state, opponent_message, rng=rng)[0]
+
+            key = cache.make_key(self.build_prompt(state, opponent_message), self.generation_params())
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            candidates = self.generate_candidates(state, opponent_message, n=cache.candidates_per_key)
+            cache.put(key, candidates)
+            return candidates[0]
 
         except Exception as e:
             print(f"⚠ 응답 생성 실패 ({self.side.name}): {e}")
@@ -69,43 +156,110 @@ class AIDebater:
 class DebaterManager:
     """토론자 관리 (경량 모델 + LLM 파이프라인 공유)"""
 
-    def __init__(self, analysis: AnalysisResult, persona_engine: CommentPersonaEngine):
+    def __init__(self, analysis: AnalysisResult, persona_engine: CommentPersonaEngine, llm_pipeline=None,
+                 response_cache: Optional[ResponseCache] = None, opening_pool=None,
+                 speculative: Optional[Dict] = None):
+        """
+        Args:
+            llm_pipeline: 공유할 생성 파이프라인 (없으면 페르소나 엔진 것 재사용)
+            response_cache: 같은 문맥 응답 캐시 (선택)
+            opening_pool: 미리 생성해 둔 첫 발언 풀 (선택, OpeningPool)
+            speculative: 초안 종류 → SpeculativeDecoder (state.speculative 가 있는 세션만 사용)
+        """
         self.analysis = analysis
         self.persona_engine = persona_engine
+        self.opening_pool = opening_pool
+        # 발언 감정 강도 → 주제 전환 / 종료 판단 (상태는 DebateState에 있으므로 세션 간 공유 가능)
+        self.tracker = SentimentTracker(analysis)
 
         # ✅ 경량 모델 설정
-        self.model_name = "skt/kogpt2-base-v2"
+        self.model_name = DEFAULT_MODEL_ID
         self.device = "cpu"
+
+        # 같은 모델을 이미 올린 페르소나 엔진이 있으면 파이프라인 재사용
+        llm_pipeline = llm_pipeline or persona_engine.llm or self._load_pipeline()
+
+        # 두 토론자 생성
+        self.left_debater = AIDebater(Side.LEFT, analysis, persona_engine, llm_pipeline, response_cache, speculative)
+        self.right_debater = AIDebater(Side.RIGHT, analysis, persona_engine, llm_pipeline, response_cache, speculative)
+
+    def _load_pipeline(self):
         print(f"🤖 대화 모델 로딩 중: {self.model_name} ({self.device})")
 
         try:
-            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            model = AutoModelForCausalLM.from_pretrained(
-                self.model_name,
-                torch_dtype=torch.float32,
-                device_map=None,
-                low_cpu_mem_usage=True
-            ).to(self.device)
-
-            llm_pipeline = pipeline(
-                "text-generation",
-                model=model,
-                tokenizer=tokenizer,
-                device=-1
+            _, _, llm_pipeline = load_text_generation(
+                self.model_name, governor=getattr(self.persona_engine, "governor", None)
             )
-
             print("✓ 대화 모델 로딩 완료! (CPU 경량 모드)\n")
+            return llm_pipeline
         except Exception as e:
             print(f"❌ 모델 로딩 실패: {e}")
-            llm_pipeline = None
+            return None
 
-        # 두 토론자 생성
-        self.left_debater = AIDebater(Side.LEFT, analysis, persona_engine, llm_pipeline)
-        self.right_debater = AIDebater(Side.RIGHT, analysis, persona_engine, llm_pipeline)
-
-    def generate_response(self, side: Side, state: DebateState, opponent_message: Optional[DebateMessage] = None):
+    def generate_response(self, side: Side, state: DebateState, opponent_message: Optional[DebateMessage] = None,
+                          rng: Optional[random.Random] = None):
         """토론자별 응답 생성"""
         if side == Side.LEFT:
-            return self.left_debater.generate_response(state, opponent_message)
+            return self.left_debater.generate_response(state, opponent_message, rng)
         else:
-            return self.right_debater.generate_response(state, opponent_message)
+            return self.right_debater.generate_response(state, opponent_message, rng)
+
+    def plan_turn(self, state: DebateState, side: Optional[Side] = None):
+        """다음 발언자 (좌/우 번갈아)와 그가 답할 상대의 마지막 메시지 (상태는 바꾸지 않음)"""
+        if side is None:
+            side = Side.LEFT if (state.message_count + 1) % 2 == 1 else Side.RIGHT
+
+        opponent_side = Side.RIGHT if side == Side.LEFT else Side.LEFT
+        opponent_message = None
+        for msg in reversed(state.messages):
+            if msg.side == opponent_side:
+                opponent_message = msg
+                break
+        return side, opponent_message
+
+    def commit_turn(self, state: DebateState, side: Side, content: str,
+                    rng: Optional[random.Random] = None, intensity: Optional[float] = None) -> DebateMessage:
+        """
+        발언을 상태에 추가 (다음 프롬프트 조립용 토큰 수도 미리 계산)
+        감정 강도를 반영해 주제 전환 / 토론 종료 (state.is_active = False)까지 처리합니다.
+        """
+        self.persona_engine.token_counter.count(content)
+        state.message_count += 1
+        message = DebateMessage(
+            side=side,
+            content=content,
+            current_topic=state.current_topic,
+            timestamp=datetime.now().isoformat(),
+            intensity=intensity
+        )
+        with span("sentiment"):
+            self.tracker.update_state_after_message(state, message, rng)
+        return message
+
+    def next_turn(self, state: DebateState, side: Optional[Side] = None,
+                  rng: Optional[random.Random] = None) -> DebateMessage:
+        """
+        발언 순서를 정하고 (좌/우 번갈아) 다음 메시지를 생성해 상태에 추가
+        rng: 세션 시드 RNG (같은 시드면 같은 토론이 재현됨)
+        """
+        side, opponent_message = self.plan_turn(state, side)
+
+        content = None
+        # 첫 턴만 풀 사용 (풀은 첫 발언 진영만 채움), 시드 재현 모드는 풀 대신 시드로 생성
+        if not state.messages and self.opening_pool is not None and rng is None:
+            content = self.opening_pool.take(side, state.current_topic)
+        if content is None:
+            content = self.generate_response(side, state, opponent_message, rng)
+
+        return self.commit_turn(state, side, content, rng)
+
+    def propose_branches(self, state: DebateState, n: int, side: Optional[Side] = None,
+                         rng: Optional[random.Random] = None) -> Tuple[Side, List[str]]:
+        """
+        다음 발언 후보 n개를 한 번의 generate로 생성 (상태는 바꾸지 않음)
+        프롬프트 prefill을 공유하므로 n번 따로 호출하는 것보다 훨씬 쌉니다.
+        고른 후보는 commit_turn으로 반영합니다.
+        """
+        side, opponent_message = self.plan_turn(state, side)
+        debater = self.left_debater if side == Side.LEFT else self.right_debater
+        return side, debater.generate_candidates(state, opponent_message, n=n, rng=rng)
@@ -2,51 +2,86 @@
 댓글 분석 엔진 (로컬 LLM 버전, CPU 경량 모델 사용)
 jhgan/ko-alpaca-7b를 사용하여 감정 분석 및 성향 분류
 """
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from typing import List
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from model.generation import generate
+from model.llm_loader import default_backend, load_text_generation
+from model.prompt_budget import PromptBuilder, TokenCounter, context_length
+from memory_governor import current_rss_mb, peak_rss_mb
 from models import AnalysisResult, Argument, EmotionalPattern
 
+ANALYZER_MODEL_ID = "jhgan/ko-alpaca-7b"
+ANALYSIS_MAX_NEW_TOKENS = 512
+ANALYSIS_MAX_COMMENTS = 30
+ANALYSIS_MAX_PROMPT_TOKENS = 2048  # 문맥이 더 긴 모델이어도 분석 프롬프트 prefill 상한
+
 
 class CommentAnalyzer:
     """댓글 분석 엔진 (규칙 기반 + 선택적 LLM)"""
 
-    def __init__(self, use_llm=False):
+    def __init__(self, use_llm=False, backend: Optional[str] = None, governor=None,
+                 low_memory: Optional[bool] = None, quantize: Optional[str] = None,
+                 model_name: str = ANALYZER_MODEL_ID):
         """
         Args:
             use_llm: True면 LLM 사용, False면 규칙 기반 (빠름, 메모리 적게 사용)
+            backend: 추론 백엔드 "torch" | "onnx" | "tiny" | "stub" (None이면 COLORWAR_LLM_BACKEND)
+            governor: 메모리 예산 관리자 (선택, 예산을 넘으면 로딩 거절 → 규칙 기반으로 전환)
+            low_memory: safetensors mmap 로딩 (None이면 COLORWAR_ANALYZER_LOW_MEMORY)
+            quantize: "int8" | "int4" 가중치 양자화 (None이면 COLORWAR_ANALYZER_QUANT)
+            model_name: 분석 모델 ID
         """
         self.use_llm = use_llm
         self.model = None
         self.tokenizer = None
+        self.llm = None
+        self.backend = backend or default_backend()
+        self.load_stats: Optional[Dict] = None
+        self.token_counter = TokenCounter()
 
         if use_llm:
             # ✅ 경량 한국어 모델 (CPU에서 빠르게 동작)
-            self.model_name = "jhgan/ko-alpaca-7b"
+            self.model_name = model_name
             self.device = "cpu"
+            if low_memory is None:
+                low_memory = os.getenv("COLORWAR_ANALYZER_LOW_MEMORY", "0") == "1"
+            quantize = quantize or os.getenv("COLORWAR_ANALYZER_QUANT") or None
 
-            print(f"⚙️ 감정 분석 LLM 모델 로딩 중: {self.model_name}")
+            mode = quantize or ("mmap" if low_memory else "float32")
+            print(f"⚙️ 감정 분석 LLM 모델 로딩 중: {self.model_name} (백엔드: {self.backend}, 가중치: {mode})")
             print(f"디바이스: {self.device.upper()} (경량 CPU 모드)")
 
             try:
-                self.tokenizer = AutoTokenizer.from_pretrained(
-                    self.model_name,
+                rss_before = current_rss_mb()
+                started = time.perf_counter()
+                self.model, self.tokenizer, self.llm = load_text_generation(
+                    self.model_name, self.backend, governor, low_memory=low_memory, quantize=quantize,
                     trust_remote_code=True
                 )
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    self.model_name,
-                    torch_dtype=torch.float32,  # CPU 모드
-                    device_map=None,
-                    low_cpu_mem_usage=True,
-                    trust_remote_code=True
-                ).to(self.device)
-
-                print("✓ 감정 분석 모델 로딩 완료 (경량 CPU 모드)")
+                mmap_stats = getattr(self.model, "mmap_stats", None) or {}  # mmap 로딩일 때 연산 dtype / 변환 크기
+                if governor is not None:
+                    self.model = None  # 가중치 참조는 관리자만 보유
+                self.token_counter = TokenCounter(self.tokenizer)
+
+                self.load_stats = {
+                    "mode": mode,
+                    "load_sec": round(time.perf_counter() - started, 2),
+                    "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+                    "peak_rss_mb": round(peak_rss_mb(), 1),
+                }
+                self.load_stats.update(mmap_stats)
+                print(f"✓ 감정 분석 모델 로딩 완료 ({self.load_stats['load_sec']}초, "
+                      f"RSS +{self.load_stats['rss_delta_mb']}MB, 최대 RSS {self.load_stats['peak_rss_mb']}MB)")
             except Exception as e:
                 print(f"⚠ 모델 로딩 실패: {e}")
                 print("→ 규칙 기반 분석으로 자동 전환합니다.")
-                self.model = None
-                self.tokenizer = None
+                self.model, self.tokenizer, self.llm = None, None, None
                 self.use_llm = False
         else:
             print("✓ 규칙 기반 댓글 분석 사용 (빠름, 메모리 효율적)")
@@ -58,7 +93,7 @@ class CommentAnalyzer:
         """댓글 텍스트를 분석하여 좌파/우파 논점을 추출"""
         comments = [c.strip() for c in comments_text.split('\n') if c.strip()]
 
-        if not self.use_llm or not self.model or not self.tokenizer:
+        if not self.use_llm or not self.llm:
             return self._simple_analysis(comments)
 
         return self._llm_analysis(comments)
@@ -68,27 +103,20 @@ class CommentAnalyzer:
     # --------------------------------------------
     def _llm_analysis(self, comments: List[str]) -> AnalysisResult:
         """LLM을 사용한 고급 분석"""
-        prompt = self._create_analysis_prompt(comments[:30])  # 최대 30개만 사용
+        prompt = self._create_analysis_prompt(comments[:ANALYSIS_MAX_COMMENTS])  # 최대 30개, 토큰 예산 안에서
 
         try:
-            inputs = self.tokenizer(
+            result = generate(
+                self.llm,
                 prompt,
-                return_tensors="pt",
-                max_length=2048,
-                truncation=True
-            ).to(self.device)
-
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=512,  # ✅ 토큰 수 줄여 속도 개선
-                    temperature=0.7,
-                    do_sample=True,
-                    top_p=0.9,
-                    pad_token_id=self.tokenizer.eos_token_id
-                )
-
-            generated = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+                max_new_tokens=ANALYSIS_MAX_NEW_TOKENS,  # ✅ 토큰 수 줄여 속도 개선
+                temperature=0.7,
+                do_sample=True,
+                top_p=0.9,
+                pad_token_id=self.tokenizer.eos_token_id
+            )
+
+            generated = result[0]["generated_text"]
             response = generated[len(prompt):].strip()
 
             return self._parse_llm_response(response, comments)
@@ -101,12 +129,16 @@ class CommentAnalyzer:
     # 프롬프트 생성
     # --------------------------------------------
     def _create_analysis_prompt(self, comments: List[str]) -> str:
-        comments_str = "\n".join([f"{i+1}. {c}" for i, c in enumerate(comments)])
-        return f"""다음은 정치 관련 댓글들입니다. 이 댓글들을 분석하여 좌파(진보)와 우파(보수)의 주요 논점을 파악해주세요.
+        # 끝의 출력 형식 지시문이 잘리지 않도록 댓글은 (min(문맥 길이 - 생성 길이, 프롬프트 상한) - 지시문) 안에서만
+        max_tokens = min(context_length(self.llm, default=2048) - ANALYSIS_MAX_NEW_TOKENS, ANALYSIS_MAX_PROMPT_TOKENS)
+        return (
+            PromptBuilder(self.token_counter, max_tokens)
+            .text("""다음은 정치 관련 댓글들입니다. 이 댓글들을 분석하여 좌파(진보)와 우파(보수)의 주요 논점을 파악해주세요.
 
 댓글:
-{comments_str}
-
+""")
+            .items(comments, numbered=True)
+            .text("""
 다음 형식으로 분석 결과를 작성해주세요:
 
 [좌파 논점]
@@ -122,7 +154,9 @@ class CommentAnalyzer:
 [논쟁 키워드]
 키워드1, 키워드2, 키워드3
 
-분석:"""
+분석:""")
+            .build()
+        )
 
     # --------------------------------------------
     # LLM 응답 파싱
@@ -229,3 +263,25 @@ class CommentAnalyzer:
                 "right": right_comments[:10]
             }
         )
+
+
+if __name__ == "__main__":
+    # 로딩 방식별 기동 시간 / 최대 RSS 측정
+    #   python analyzer.py --low-memory --quantize int8
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="분석 모델 로딩 측정")
+    parser.add_argument("--model", default=ANALYZER_MODEL_ID)
+    parser.add_argument("--low-memory", action="store_true")
+    parser.add_argument("--quantize", choices=["int8", "int4"])
+    args = parser.parse_args()
+
+    import torch, transformers  # noqa: F401 — 라이브러리 import 비용은 측정에서 제외
+
+    analyzer = CommentAnalyzer(use_llm=True, low_memory=args.low_memory, quantize=args.quantize, model_name=args.model)
+    started = time.perf_counter()
+    analyzer.analyze_comments("진보적 개혁이 필요합니다\n경제 성장이 최우선입니다")
+    stats = dict(analyzer.load_stats or {}, first_analysis_sec=round(time.perf_counter() - started, 2),
+                 peak_rss_after_first_analysis_mb=round(peak_rss_mb(), 1))
+    print(json.dumps(stats, ensure_ascii=False))
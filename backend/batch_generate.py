@@ -0,0 +1,224 @@
+"""
+오프라인 배치 토론 생성기 (데이터셋 생산용)
+FastAPI 없이 CommentPersonaEngine + DebaterManager를 직접 돌려
+N개 토론 × M턴을 샤딩된 JSONL로 저장합니다.
+
+사용 예:
+    cd backend
+    python batch_generate.py --left left.txt --right right.txt \\
+        --debates 1000 --turns 20 --workers 8 --threads-per-worker 4 --out ../dataset
+
+같은 --out 으로 다시 실행하면 이미 저장된 토론은 건너뛰고 이어서 생성합니다.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Set
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+PERSONAS_FILE = "personas.json"
+SHARD_PATTERN = "debates-{:05d}.jsonl"
+
+# 워커 프로세스 전역 (프로세스당 모델 1회 로딩)
+_engine = None
+_manager = None
+
+
+# ==========================================================
+# 워커
+# ==========================================================
+def _pin_threads(threads: int):
+    """torch import 전에 BLAS/OpenMP 스레드 수를 고정해 코어 과다 할당 방지"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # 이미 병렬 작업이 시작된 경우 변경 불가
+
+
+def _init_worker(threads: int, personas: Dict, left: List[str], right: List[str]):
+    global _engine, _manager
+    _pin_threads(threads)
+
+    from model.comment_persona_engine import CommentPersonaEngine
+    from ai_debater import DebaterManager, build_default_analysis
+
+    # 입력 파일은 부모에서 이미 중복 제거됨
+    _engine = CommentPersonaEngine(dedup_threshold=None)
+    _engine.add_left_comments(left)
+    _engine.add_right_comments(right)
+    _engine.left_persona, _engine.right_persona = personas["left"], personas["right"]
+    _manager = DebaterManager(build_default_analysis(), _engine)
+
+
+def _run_debate(debate_id: int, turns: int, seed: int) -> Dict:
+    from ai_debater import DEFAULT_TOPIC
+    from models import DebateState
+
+    # 같은 시드 → 같은 토론 (서버의 시드 재현 모드와 동일한 방식)
+    rng = random.Random(f"{seed}:debate")
+    state = DebateState(current_topic=DEFAULT_TOPIC, is_active=True)
+    started = time.perf_counter()
+    for _ in range(turns):
+        if not state.is_active:
+            break  # 감정 과열 / 합의 등으로 종료된 토론은 더 생성하지 않음 (서버와 동일)
+        _manager.next_turn(state, rng=rng)
+
+    return {
+        "debate_id": debate_id,
+        "seed": seed,
+        "topic": state.current_topic,
+        "end_reason": state.end_reason,
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+        "messages": [m.model_dump(mode="json") for m in state.messages],
+    }
+
+
+# ==========================================================
+# 체크포인트 / 샤드
+# ==========================================================
+def _read_lines(path: Path) -> List[str]:
+    return [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _completed_ids(out_dir: Path) -> Set[int]:
+    """저장된 샤드에서 완료된 토론 ID 복구 (중단 시 잘린 마지막 줄은 무시)"""
+    done = set()
+    for shard in sorted(out_dir.glob("debates-*.jsonl")):
+        for line in _read_lines(shard):
+            try:
+                done.add(json.loads(line)["debate_id"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+    return done
+
+
+class ShardWriter:
+    """레코드를 shard_size개씩 새 JSONL 파일로 나눠 스트리밍 저장"""
+
+    def __init__(self, out_dir: Path, shard_size: int):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        existing = sorted(out_dir.glob("debates-*.jsonl"))
+        self.shard_index = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+        self.count = 0
+        self.fp = None
+
+    def write(self, record: Dict):
+        if self.fp is None or self.count >= self.shard_size:
+            self.close()
+            path = self.out_dir / SHARD_PATTERN.format(self.shard_index)
+            self.fp = open(path, "a", encoding="utf-8")
+            self.shard_index += 1
+            self.count = 0
+        self.fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.fp.flush()
+        self.count += 1
+
+    def close(self):
+        if self.fp:
+            self.fp.close()
+            self.fp = None
+
+
+def _prepare_personas(out_dir: Path, left: List[str], right: List[str], seed: int) -> Dict:
+    """페르소나는 한 번만 생성해 저장 → 모든 워커/재시작이 같은 페르소나 사용"""
+    path = out_dir / PERSONAS_FILE
+    if path.exists():
+        print(f"✓ 저장된 페르소나 사용: {path}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    from model.comment_persona_engine import CommentPersonaEngine
+
+    engine = CommentPersonaEngine(dedup_threshold=None)
+    engine.add_left_comments(left)
+    engine.add_right_comments(right)
+    personas = {
+        "left": engine.generate_persona_via_llm("left", random.Random(f"{seed}:left")),
+        "right": engine.generate_persona_via_llm("right", random.Random(f"{seed}:right")),
+    }
+    if not personas["left"] or not personas["right"]:
+        raise RuntimeError("페르소나 생성 실패 (각 진영 댓글 5개 이상 필요)")
+    path.write_text(json.dumps(personas, ensure_ascii=False, indent=2), encoding="utf-8")
+    return personas
+
+
+def _load_comments(path: str, threshold: float) -> List[str]:
+    from model.comment_dedup import NearDuplicateFilter
+
+    comments = _read_lines(Path(path))
+    if threshold:
+        dedup = NearDuplicateFilter(threshold)
+        comments = dedup.filter(comments)
+        print(f"✓ {path}: {len(comments)}개 (중복 제외 비율 {dedup.dedup_ratio:.1%})")
+    return comments
+
+
+# ==========================================================
+# 메인
+# ==========================================================
+def main():
+    parser = argparse.ArgumentParser(description="오프라인 배치 토론 생성기")
+    parser.add_argument("--left", required=True, help="좌파 댓글 파일 (한 줄에 하나)")
+    parser.add_argument("--right", required=True, help="우파 댓글 파일 (한 줄에 하나)")
+    parser.add_argument("--debates", type=int, required=True, help="생성할 토론 수 N")
+    parser.add_argument("--turns", type=int, default=10, help="토론당 턴 수 M")
+    parser.add_argument("--out", default="dataset", help="출력 디렉토리")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument("--threads-per-worker", type=int, default=4)
+    parser.add_argument("--shard-size", type=int, default=1000, help="샤드당 토론 수")
+    parser.add_argument("--seed", type=int, default=0, help="토론 i의 시드 = seed + i")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8, help="0이면 중복 제거 끔")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    left = _load_comments(args.left, args.dedup_threshold)
+    right = _load_comments(args.right, args.dedup_threshold)
+    personas = _prepare_personas(out_dir, left, right, args.seed)
+
+    done = _completed_ids(out_dir)
+    pending = [i for i in range(args.debates) if i not in done]
+    print(f"\n📦 토론 {args.debates}개 중 {len(done)}개 완료됨, {len(pending)}개 생성 시작")
+    print(f"   워커 {args.workers}개 × 스레드 {args.threads_per_worker}개\n")
+    if not pending:
+        return
+
+    writer = ShardWriter(out_dir, args.shard_size)
+    started = time.perf_counter()
+    finished = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.threads_per_worker, personas, left, right),
+        ) as pool:
+            futures = [pool.submit(_run_debate, i, args.turns, args.seed + i) for i in pending]
+            for future in as_completed(futures):
+                writer.write(future.result())
+                finished += 1
+                if finished % 10 == 0 or finished == len(pending):
+                    elapsed = time.perf_counter() - started
+                    print(f"  {finished}/{len(pending)} 완료 "
+                          f"({finished / elapsed:.2f} 토론/s, {finished * args.turns / elapsed:.1f} 턴/s)")
+    finally:
+        writer.close()
+
+    print(f"\n✅ 완료: {out_dir.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+추론 백엔드 벤치마크 (torch vs onnx)
+백엔드마다 별도 프로세스에서 로딩 시간 / 메모리(RSS) / 초당 생성 토큰을 측정합니다.
+
+사용 예:
+    cd backend
+    python benchmark_backends.py --backends torch onnx --runs 5 --max-new-tokens 64
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+PROMPT = """당신은 진보(좌파) 성향의 한국 유튜브 댓글러입니다.
+
+현재 주제: 정치적 공정성
+
+최근 대화:
+상대: 이 사안에 대해 너의 생각은 뭐야?
+나:"""
+
+
+def current_rss_mb() -> float:
+    """현재 RSS (Linux /proc 기준, 없으면 최대 RSS로 대체)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 ** 2
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_single(backend: str, model_id: str, runs: int, max_new_tokens: int) -> dict:
+    from model.llm_loader import load_text_generation
+
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    _, tokenizer, llm = load_text_generation(model_id, backend)
+    load_sec = time.perf_counter() - started
+    rss_loaded = current_rss_mb()
+
+    params = dict(
+        max_new_tokens=max_new_tokens,
+        min_new_tokens=max_new_tokens,  # 백엔드 간 같은 토큰 수로 비교
+        do_sample=False,
+        pad_token_id=tokenizer.eos_token_id,
+    )
+    llm(PROMPT, **params)  # 워밍업
+
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        llm(PROMPT, **params)
+        latencies.append(time.perf_counter() - started)
+
+    total = sum(latencies)
+    return {
+        "backend": backend,
+        "load_sec": round(load_sec, 2),
+        "model_rss_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "avg_latency_sec": round(total / runs, 3),
+        "tokens_per_sec": round(runs * max_new_tokens / total, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="추론 백엔드 벤치마크")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"])
+    parser.add_argument("--model", default="skt/kogpt2-base-v2")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--single", help=argparse.SUPPRESS)  # 내부용: 한 백엔드만 측정
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args.model, args.runs, args.max_new_tokens)))
+        return
+
+    results = []
+    for backend in args.backends:
+        print(f"⏱ {backend} 측정 중...")
+        proc = subprocess.run(
+            [sys.executable, __file__, "--single", backend, "--model", args.model,
+             "--runs", str(args.runs), "--max-new-tokens", str(args.max_new_tokens)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"❌ {backend} 실패:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        return
+    columns = ["backend", "load_sec", "model_rss_mb", "peak_rss_mb", "avg_latency_sec", "tokens_per_sec"]
+    print("\n" + " | ".join(f"{c:>15}" for c in columns))
+    print("-" * (18 * len(columns)))
+    for r in results:
+        print(" | ".join(f"{r[c]:>15}" for c in columns))
+
+    base = results[0]["tokens_per_sec"]
+    for r in results[1:]:
+        print(f"\n{r['backend']} / {results[0]['backend']} 속도: {r['tokens_per_sec'] / base:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
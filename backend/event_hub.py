@@ -0,0 +1,163 @@
+"""
+서버 → 브라우저 상태 푸시 (Server-Sent Events)
+탭마다 10초 폴링으로 /api/health, /api/comments/stats 를 부르는 대신
+연결 하나(/api/events)로 바뀐 것만 보냅니다.
+
+- status: 댓글 수 / 페르소나 준비 / 모델 상태 스냅샷 — 서버에서 한 번 계산해 모든 구독자에게,
+          내용이 바뀌었을 때만 전송 (구독자별로 최신 값 하나만 유지)
+- debate: 세션별 토론 이벤트 (started / message / ended / reset) — 해당 세션 구독자에게만
+
+다른 워커가 바꾼 상태(여러 워커 + redis 저장소)도 반영되도록 구독자가 있는 동안
+poll_interval 마다 스냅샷을 다시 계산합니다. (바뀌지 않았으면 전송 없음)
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+# 구독자별 밀린 이벤트 상한 (느린 클라이언트는 오래된 토론 이벤트부터 버림, status는 항상 최신 하나)
+MAX_PENDING_EVENTS = 256
+HEARTBEAT_SEC = 15.0
+
+
+class _Subscriber:
+    def __init__(self, session_id: Optional[str]):
+        self.session_id = session_id
+        self.pending: "OrderedDict[str, str]" = OrderedDict()  # 키 → 직렬화된 SSE 메시지
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, key: str, frame: str):
+        self.pending.pop(key, None)  # 같은 키(status)는 최신 값으로 교체
+        self.pending[key] = frame
+        while len(self.pending) > MAX_PENDING_EVENTS:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.ready.set()
+
+
+class EventHub:
+    """프로세스 내 SSE 구독자 관리 (이벤트 루프 전용, 다른 스레드에서는 poke()만)"""
+
+    def __init__(self, snapshot: Callable[[], Dict], poll_interval: float = 2.0):
+        """
+        Args:
+            snapshot: status 이벤트 내용 계산 함수 (가벼워야 함)
+            poll_interval: 구독자가 있을 때 스냅샷 재계산 주기 (초)
+        """
+        self.snapshot = snapshot
+        self.poll_interval = poll_interval
+        self._subscribers: Set[_Subscriber] = set()
+        self._ids = itertools.count(1)
+        self._last_status: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.skipped = 0  # 바뀌지 않아 보내지 않은 스냅샷 수
+
+    # ==========================================================
+    # 발행
+    # ==========================================================
+    def poke(self):
+        """상태가 바뀌었을 수 있음 → 스냅샷 재계산 예약 (어느 스레드에서나 호출 가능)"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or loop.is_closed():
+            return
+        try:
+            if threading.get_ident() == self._loop_thread:
+                wakeup.set()
+            else:
+                loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:  # 루프 종료 중
+            pass
+
+    def publish_debate(self, session_id: str, event_type: str, payload: Dict):
+        """세션 토론 이벤트 (이벤트 루프 스레드에서 호출)"""
+        if not self._subscribers:
+            return
+        data = {"type": event_type, "session_id": session_id, **payload}
+        event_id = next(self._ids)
+        frame = _frame("debate", data, event_id)
+        for sub in self._subscribers:
+            if sub.session_id is None or sub.session_id == session_id:
+                sub.push(f"debate:{event_id}", frame)
+        self.sent += 1
+
+    def _publish_status(self, force_to: Optional[_Subscriber] = None):
+        try:
+            status = self.snapshot()
+        except Exception as e:
+            print(f"⚠ 상태 스냅샷 계산 실패: {e}")
+            return
+        body = json.dumps(status, ensure_ascii=False, sort_keys=True)
+        if body != self._last_status:
+            self._last_status = body
+            frame = _frame_raw("status", body, next(self._ids))
+            for sub in self._subscribers:
+                sub.push("status", frame)
+            self.sent += 1
+        elif force_to is not None:  # 새 구독자에게는 바뀌지 않았어도 현재 값
+            force_to.push("status", _frame_raw("status", body, next(self._ids)))
+        else:
+            self.skipped += 1
+
+    # ==========================================================
+    # 구독
+    # ==========================================================
+    async def subscribe(self, session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """SSE 본문 스트림 (연결 직후 현재 status 스냅샷 1회)"""
+        self._ensure_task()
+        sub = _Subscriber(session_id)
+        self._subscribers.add(sub)
+        try:
+            yield "retry: 3000\n\n"  # 끊기면 3초 뒤 재연결
+            self._publish_status(force_to=sub)
+            while True:
+                if not sub.pending:
+                    sub.ready.clear()
+                    try:
+                        await asyncio.wait_for(sub.ready.wait(), timeout=HEARTBEAT_SEC)
+                    except asyncio.TimeoutError:
+                        yield ": ping\n\n"  # 프록시 유휴 연결 종료 방지
+                        continue
+                _, frame = sub.pending.popitem(last=False)
+                yield frame
+        finally:
+            self._subscribers.discard(sub)
+
+    def _ensure_task(self):
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread = threading.get_ident()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._status_loop())
+
+    async def _status_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._subscribers:
+                self._publish_status()
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "sent": self.sent,
+            "unchanged_skipped": self.skipped,
+            "dropped": sum(s.dropped for s in self._subscribers),
+        }
+
+
+def _frame(event: str, data: Dict, event_id: int) -> str:
+    return _frame_raw(event, json.dumps(data, ensure_ascii=False), event_id)
+
+
+def _frame_raw(event: str, body: str, event_id: int) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {body}\n\n"
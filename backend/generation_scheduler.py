@@ -0,0 +1,270 @@
+"""
+세션별 생성 예산 + 공정 스케줄링
+자동 모드로 요청을 몰아보내는 한 세션이 다른 토론을 굶기지 않도록
+세션마다 큐를 두고 가중 Deficit Round Robin 으로 번갈아 생성합니다.
+
+- 세션당 동시 생성 1개 (같은 토론 상태를 동시에 건드리지 않음)
+- 세션별 토큰 버킷(초당 토큰)으로 속도 제한, 총 토큰 예산 초과 시 거절
+- 세션별 큐 길이 / 대기 시간 통계 제공
+- 사용량은 예상치(max_new_tokens)로 예약했다가 작업이 끝나면 실제 생성 길이로 정산
+- 오래 쉬고 있는 빈 세션은 정리 (탭마다 새 세션이 생겨도 맵이 계속 커지지 않음)
+"""
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class BudgetExceededError(Exception):
+    """세션 토큰 예산 초과"""
+
+
+@dataclass
+class _Job:
+    fn: Callable
+    args: tuple
+    cost: int
+    future: asyncio.Future
+    usage: Optional[Callable[[Any], int]] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # 제출한 요청의 contextvars (요청 단위 프로파일링 등이 생성 스레드까지 이어지도록)
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+@dataclass
+class _SessionQueue:
+    weight: float = 1.0
+    jobs: Deque[_Job] = field(default_factory=deque)
+    deficit: float = 0.0
+    running: bool = False
+    bucket: float = 0.0
+    bucket_updated: float = field(default_factory=time.monotonic)
+    tokens_used: int = 0
+    completed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    last_active: float = field(default_factory=time.monotonic)
+
+
+class GenerationScheduler:
+    """세션 간 가중 공정 큐잉 스케줄러"""
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        tokens_per_second: Optional[float] = None,
+        burst_tokens: Optional[int] = None,
+        session_token_budget: Optional[int] = None,
+        quantum: int = 150,
+        idle_session_ttl: float = 600.0,
+    ):
+        """
+        Args:
+            concurrency: 동시에 실행할 생성 작업 수 (추론 워커 수에 맞춤)
+            tokens_per_second: 세션별 초당 생성 토큰 한도 (None이면 무제한)
+            burst_tokens: 토큰 버킷 최대 적립량
+            session_token_budget: 세션별 총 생성 토큰 예산 (None이면 무제한)
+            quantum: 라운드마다 세션에 주는 기본 토큰 몫 (가중치를 곱함)
+            idle_session_ttl: 큐가 빈 채로 이만큼(초) 지난 세션은 정리 (사용량 / 예산 기록도 함께 사라짐)
+        """
+        self.concurrency = concurrency
+        self.tokens_per_second = tokens_per_second
+        self.burst_tokens = burst_tokens or quantum * 2
+        self.session_token_budget = session_token_budget
+        self.quantum = quantum
+        self.idle_session_ttl = idle_session_ttl
+
+        self._sessions: "OrderedDict[str, _SessionQueue]" = OrderedDict()
+        self._running = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._last_eviction = time.monotonic()
+        self.evicted = 0
+
+    # ==========================================================
+    # 공개 API
+    # ==========================================================
+    def set_weight(self, session_id: str, weight: float):
+        self._session(session_id).weight = max(weight, 0.01)
+
+    def remove_session(self, session_id: str):
+        queue = self._sessions.get(session_id)
+        if queue and not queue.jobs and not queue.running:
+            del self._sessions[session_id]
+
+    async def submit(self, session_id: str, fn: Callable, *args, cost: int = 150,
+                     usage: Optional[Callable[[Any], int]] = None) -> Any:
+        """
+        fn(*args)를 세션 큐에 넣고 차례가 오면 스레드풀에서 실행한 결과 반환
+        cost: 예상 토큰 수 (예산 / 속도 제한 예약), usage: 결과 → 실제 토큰 수 (있으면 끝난 뒤 정산)
+        """
+        self._evict_idle()
+        queue = self._session(session_id)
+        queue.last_active = time.monotonic()
+        reserved = queue.tokens_used + sum(j.cost for j in queue.jobs)
+        if self.session_token_budget is not None and reserved + cost > self.session_token_budget:
+            raise BudgetExceededError(
+                f"세션 '{session_id}' 토큰 예산 초과 ({queue.tokens_used}/{self.session_token_budget})"
+            )
+
+        self._ensure_dispatcher()
+        job = _Job(fn, args, cost, asyncio.get_running_loop().create_future(), usage=usage)
+        queue.jobs.append(job)
+        self._wakeup.set()
+        return await job.future
+
+    def queued(self) -> int:
+        """실행을 기다리는 작업 수 (백그라운드 작업 양보 판단용)"""
+        return sum(len(q.jobs) for q in self._sessions.values())
+
+    def stats(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        return {
+            session_id: {
+                "queue_depth": len(q.jobs),
+                "running": q.running,
+                "weight": q.weight,
+                "tokens_used": q.tokens_used,
+                "token_budget": self.session_token_budget,
+                "completed": q.completed,
+                "avg_wait_sec": round(q.total_wait / q.completed, 3) if q.completed else 0.0,
+                "max_wait_sec": round(q.max_wait, 3),
+                "oldest_wait_sec": round(now - q.jobs[0].enqueued_at, 3) if q.jobs else 0.0,
+            }
+            for session_id, q in self._sessions.items()
+        }
+
+    # ==========================================================
+    # 내부 구현
+    # ==========================================================
+    def _session(self, session_id: str) -> _SessionQueue:
+        if session_id not in self._sessions:
+            self._sessions[session_id] = _SessionQueue(bucket=self.burst_tokens)
+        return self._sessions[session_id]
+
+    def _evict_idle(self):
+        """빈 큐로 idle_session_ttl 이상 지난 세션 정리 (전체 훑기는 ttl/4 마다 한 번)"""
+        now = time.monotonic()
+        if now - self._last_eviction < self.idle_session_ttl / 4:
+            return
+        self._last_eviction = now
+        for session_id in [sid for sid, q in self._sessions.items()
+                           if not q.jobs and not q.running and now - q.last_active >= self.idle_session_ttl]:
+            del self._sessions[session_id]
+            self.evicted += 1
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    def _refill(self, q: _SessionQueue, now: float):
+        if self.tokens_per_second is None:
+            return
+        q.bucket = min(self.burst_tokens, q.bucket + (now - q.bucket_updated) * self.tokens_per_second)
+        q.bucket_updated = now
+
+    def _next_job(self):
+        """
+        Deficit Round Robin: 앞에서부터 세션을 돌며 몫(quantum × weight)을 적립하고
+        적립분이 작업 비용 이상이면 실행. 속도 제한에 걸린 세션은 건너뜀.
+        반환: (세션 ID, 작업) 또는 (None, 다음 재시도까지 대기 초)
+        """
+        now = time.monotonic()
+        retry_after = None
+        eligible = True
+        while eligible:  # 몫이 작업 비용만큼 쌓일 때까지 라운드 반복 (몫보다 비싼 작업 포함)
+            eligible = False
+            for session_id in list(self._sessions):
+                q = self._sessions[session_id]
+                while q.jobs and q.jobs[0].future.done():  # 취소된 요청 정리
+                    q.jobs.popleft()
+                if not q.jobs:
+                    q.deficit = 0.0
+                    continue
+                if q.running:
+                    continue
+
+                job = q.jobs[0]
+                self._refill(q, now)
+                # 버킷보다 비싼 작업은 버킷이 가득 차면 실행 (초과분은 빚으로 남아 다음 작업을 늦춤)
+                needed = min(job.cost, self.burst_tokens)
+                if self.tokens_per_second is not None and q.bucket < needed:
+                    wait = (needed - q.bucket) / self.tokens_per_second
+                    retry_after = wait if retry_after is None else min(retry_after, wait)
+                    continue
+
+                eligible = True
+                q.deficit += self.quantum * q.weight
+                if q.deficit < job.cost:
+                    continue
+
+                q.deficit -= job.cost
+                q.jobs.popleft()
+                self._sessions.move_to_end(session_id)  # 다음 라운드는 다른 세션부터
+                return session_id, job
+        return None, retry_after
+
+    async def _dispatch_loop(self):
+        while True:
+            retry_after = None
+            while self._running < self.concurrency:
+                session_id, picked = self._next_job()
+                if session_id is None:
+                    retry_after = picked
+                    break
+                self._start(session_id, picked)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=retry_after)
+            except asyncio.TimeoutError:
+                pass
+
+    def _settle(self, q: _SessionQueue, job: _Job, used: int):
+        """예약한 예상 비용을 실제 사용량으로 정산 (남은 몫 / 버킷 환급, 초과분은 추가 차감)"""
+        refund = job.cost - used
+        if not refund:
+            return
+        q.tokens_used -= refund
+        if q.jobs:  # 큐가 비면 몫은 어차피 0으로 초기화됨
+            q.deficit += refund
+        if self.tokens_per_second is not None:
+            q.bucket = min(self.burst_tokens, q.bucket + refund)
+
+    def _start(self, session_id: str, job: _Job):
+        q = self._sessions[session_id]
+        waited = time.monotonic() - job.enqueued_at
+        q.total_wait += waited
+        q.max_wait = max(q.max_wait, waited)
+        q.running = True
+        if self.tokens_per_second is not None:
+            q.bucket -= job.cost
+        q.tokens_used += job.cost
+        self._running += 1
+        asyncio.get_running_loop().create_task(self._run(q, job))
+
+    async def _run(self, q: _SessionQueue, job: _Job):
+        used = job.cost
+        try:
+            result = await run_in_threadpool(job.context.run, job.fn, *job.args)
+            if job.usage is not None:
+                used = job.usage(result)
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            if job.usage is not None:
+                used = 0  # 실패한 생성은 사용량으로 치지 않음
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._settle(q, job, used)
+            q.running = False
+            q.last_active = time.monotonic()
+            q.completed += 1
+            self._running -= 1
+            self._wakeup.set()
@@ -0,0 +1,192 @@
+"""
+멀티 프로세스 추론 풀 (CPU 코어 분산 + 가중치 공유)
+부모가 모델을 safetensors로 한 번 내보내면 워커 프로세스들이 그 파일을 mmap 해서
+N개 워커가 가중치 한 벌 분량의 메모리만 사용합니다.
+요청은 처리 중인 작업이 가장 적은 워커로 보냅니다.
+
+워커는 별도 파이썬 프로세스로 실행되며 stdin/stdout JSON 라인으로 통신합니다.
+(multiprocessing spawn은 main.py를 다시 import 하면서 모델을 또 올리기 때문에 사용하지 않음)
+"""
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_CACHE_DIR = Path(os.getenv("COLORWAR_CACHE_DIR", Path.home() / ".cache" / "color_war"))
+
+
+class _Worker:
+    """워커 프로세스 하나와 처리 중인 요청들"""
+
+    def __init__(self, worker_id: int, model_dir: Path, threads: int):
+        self.worker_id = worker_id
+        self.inflight: Dict[int, Future] = {}
+        self.completed = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.proc = subprocess.Popen(
+            [sys.executable, __file__, "--worker", str(model_dir), "--threads", str(threads)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            env={**os.environ, "OMP_NUM_THREADS": str(threads), "MKL_NUM_THREADS": str(threads)},
+        )
+        self.reader = threading.Thread(target=self._read_results, daemon=True)
+        self.reader.start()
+
+    def submit(self, req_id: int, prompt: str, seed: Optional[int], kwargs: Dict) -> Future:
+        future = Future()
+        request = {"id": req_id, "prompt": prompt, "seed": seed, "kwargs": kwargs}
+        with self.lock:
+            self.inflight[req_id] = future
+            self.proc.stdin.write(json.dumps(request, ensure_ascii=False) + "\n")
+            self.proc.stdin.flush()
+        return future
+
+    def _read_results(self):
+        for line in self.proc.stdout:
+            msg = json.loads(line)
+            if msg.get("ready"):
+                self.ready.set()
+                continue
+            with self.lock:
+                future = self.inflight.pop(msg["id"], None)
+                self.completed += 1
+            if future is None:
+                continue
+            if msg.get("error"):
+                future.set_exception(RuntimeError(f"워커 {self.worker_id}: {msg['error']}"))
+            else:
+                future.set_result(msg["result"])
+
+        # 워커 종료 → 남은 요청 실패 처리
+        self.ready.set()
+        with self.lock:
+            pending, self.inflight = self.inflight, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError(f"워커 {self.worker_id} 프로세스 종료됨"))
+
+    @property
+    def load(self) -> int:
+        return len(self.inflight)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+
+class SharedMemoryInferencePool:
+    """
+    text-generation pipeline과 같은 방식으로 호출하는 멀티 프로세스 추론 풀
+    llm(prompt, **generate_kwargs)[0]["generated_text"]
+    """
+
+    supports_seed = True
+
+    def __init__(self, model, tokenizer, num_workers: int, threads_per_worker: Optional[int] = None,
+                 cache_dir: Optional[Path] = None):
+        self.tokenizer = tokenizer
+        self.num_workers = num_workers
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+
+        model_dir = self._export(model, tokenizer, Path(cache_dir or DEFAULT_CACHE_DIR))
+        print(f"🧵 추론 워커 {num_workers}개 시작 (워커당 스레드 {threads}개, 가중치 mmap 공유)")
+        self._ids = itertools.count()
+        self._workers: List[_Worker] = [_Worker(i, model_dir, threads) for i in range(num_workers)]
+        for worker in self._workers:
+            worker.ready.wait()
+        alive = sum(w.alive for w in self._workers)
+        if not alive:
+            raise RuntimeError("추론 워커를 시작하지 못했습니다.")
+        print(f"✓ 추론 워커 {alive}/{num_workers}개 준비 완료\n")
+
+    @staticmethod
+    def _export(model, tokenizer, cache_dir: Path) -> Path:
+        """워커가 매핑할 safetensors 사본 (모델 + 설정/리비전별 1회, 임시 디렉토리에 쓴 뒤 이름 변경)"""
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from model.mmap_weights import export_model, weights_key
+
+        name = getattr(model.config, "_name_or_path", "") or model.config.model_type
+        model_dir = cache_dir / "shared" / f"{name.replace('/', '--')}-{weights_key(model)}"
+        if not model_dir.exists():
+            print(f"💾 공유 가중치 내보내는 중: {model_dir}")
+        return export_model(model, model_dir, tokenizer)
+
+    def __call__(self, prompt: str, seed: Optional[int] = None, **kwargs):
+        return self.submit(prompt, seed, **kwargs).result()
+
+    def submit(self, prompt: str, seed: Optional[int] = None, **kwargs) -> Future:
+        """처리 중인 요청이 가장 적은 워커로 전달 (seed가 있으면 워커에서 고정 후 생성)"""
+        candidates = [w for w in self._workers if w.alive] or self._workers
+        worker = min(candidates, key=lambda w: w.load)
+        return worker.submit(next(self._ids), prompt, seed, kwargs)
+
+    def stats(self) -> List[Dict]:
+        return [
+            {"worker": w.worker_id, "alive": w.alive, "inflight": w.load, "completed": w.completed}
+            for w in self._workers
+        ]
+
+    def close(self):
+        for worker in self._workers:
+            if worker.alive:
+                worker.proc.stdin.close()
+        for worker in self._workers:
+            try:
+                worker.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.proc.kill()
+
+
+# ==========================================================
+# 워커 프로세스
+# ==========================================================
+def _worker_main(model_dir: str, threads: int):
+    # 프로토콜 전용 stdout 확보, 나머지 출력은 stderr로
+    protocol = sys.stdout
+    sys.stdout = sys.stderr
+
+    import torch
+    from transformers import AutoTokenizer, pipeline
+
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from model.generation import generate
+    from model.mmap_weights import load_model_mmap
+    from model.shared_prefix import SharedPrefixTextGenerationPipeline
+
+    torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = load_model_mmap(model_dir)
+    # 후보 n개 생성 시 프롬프트 prefill 1회 공유 (서버 프로세스 안 파이프라인과 같은 클래스)
+    llm = pipeline("text-generation", model=model, tokenizer=tokenizer, device=-1,
+                   pipeline_class=SharedPrefixTextGenerationPipeline)
+
+    def send(msg: Dict):
+        protocol.write(json.dumps(msg, ensure_ascii=False) + "\n")
+        protocol.flush()
+
+    send({"ready": True})
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            with torch.inference_mode():
+                result = generate(llm, request["prompt"], seed=request.get("seed"), **request["kwargs"])
+            send({"id": request["id"], "result": result})
+        except Exception as e:
+            send({"id": request["id"], "error": repr(e)})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worker", required=True, help="공유 가중치 디렉토리")
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+    _worker_main(args.worker, args.threads)
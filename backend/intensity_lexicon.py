@@ -0,0 +1,151 @@
+"""
+한국어 감정 강도 사전 + Aho-Corasick 매칭
+모델 호출 없이 댓글/발언의 과열 정도를 점수로 냅니다.
+
+- 사전 항목(표현 → 가중치)을 한 번 오토마톤으로 컴파일해 두고
+- 여러 문장을 구분자로 이어 붙여 한 번만 훑은 뒤 (항목 수와 무관하게 글자 수에 비례)
+- 매칭 위치를 문장 번호로 바꿔 numpy로 한꺼번에 합산합니다.
+
+점수는 -1 ~ 1 (양수: 과열 / 공격적, 음수: 수긍 / 진정, 0: 중립)
+"""
+import os
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 표현 → 가중치 (부분 문자열로 매칭하므로 활용형 공통 부분만 적음)
+DEFAULT_LEXICON: Dict[str, float] = {
+    # 비하 / 멸칭
+    "개돼지": 3.0, "매국노": 3.0, "빨갱이": 3.0, "토착왜구": 3.0, "수꼴": 2.5, "좌좀": 2.5,
+    "대깨": 2.5, "틀딱": 2.5, "쓰레기": 2.5, "벌레": 2.0, "종북": 2.0, "친일파": 2.0,
+    # 욕설 / 공격
+    "미친": 2.5, "정신나간": 2.5, "개소리": 2.5, "헛소리": 2.0, "닥쳐": 3.0, "꺼져": 3.0,
+    "역겹": 2.0, "한심": 1.5, "멍청": 2.0, "무식": 1.5, "뇌가": 1.5, "수준 하고는": 2.0,
+    # 비난 / 단정
+    "거짓말": 1.5, "선동": 1.5, "날조": 1.5, "내로남불": 1.5, "위선": 1.5, "최악": 1.5,
+    "망했": 1.5, "망한다": 1.5, "나라 망": 2.0, "책임져": 1.5, "사퇴": 1.0, "탄핵": 1.0,
+    "말이 되냐": 1.5, "어이없": 1.0, "웃기네": 1.0, "뻔뻔": 1.5,
+    # 강조 / 어조
+    "도대체": 0.7, "절대": 0.5, "진짜": 0.3, "완전": 0.3, "ㅉㅉ": 1.0, "ㅋㅋㅋ": 0.5,
+    "!!": 0.7, "??": 0.7, "?!": 0.7,
+    # 수긍 / 진정
+    "동의": -1.5, "맞는 말": -1.5, "일리가": -1.5, "인정": -1.0, "좋은 지적": -1.5,
+    "이해합니다": -1.5, "공감": -1.0, "존중": -1.5, "감사": -1.0, "죄송": -1.0,
+    "차분": -1.0, "대화로": -1.0, "함께": -0.5, "타협": -1.0,
+}
+
+# 가중치 합 → 점수 변환 기준 (이 정도 합이면 tanh ≈ 0.76)
+SATURATION_WEIGHT = 4.0
+# 문장 길이 보정 기준 글자 수 (이보다 긴 문장은 sqrt로 완만하게 희석)
+REFERENCE_CHARS = 80
+# 문장 경계 (사전 표현에 들어갈 수 없는 글자)
+_SEPARATOR = "\x00"
+
+
+class IntensityAutomaton:
+    """사전 표현 다중 매칭 오토마톤 (Aho-Corasick, 순수 Python)"""
+
+    def __init__(self, lexicon: Dict[str, float]):
+        self.size = len(lexicon)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._weight: List[float] = [0.0]  # 노드에서 끝나는 모든 표현 (실패 링크로 이어진 것 포함) 가중치 합
+
+        for term, weight in lexicon.items():
+            if not term or _SEPARATOR in term:
+                continue
+            node = 0
+            for ch in term:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._weight.append(0.0)
+                node = nxt
+            self._weight[node] += weight
+
+        # BFS로 실패 링크 + 출력 가중치 누적 (짧은 접미사 표현도 함께 매칭됨)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._weight[child] += self._weight[self._fail[child]]
+
+    def scan(self, text: str) -> Tuple[List[int], List[float]]:
+        """(표현이 끝난 위치들, 가중치들) — 가중치 0인 노드는 기록하지 않음"""
+        goto, fail, weight = self._goto, self._fail, self._weight
+        positions, weights = [], []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            w = weight[node]
+            if w:
+                positions.append(i)
+                weights.append(w)
+        return positions, weights
+
+
+class IntensityScorer:
+    """문장 배치 강도 점수 (-1 ~ 1)"""
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None):
+        self.automaton = IntensityAutomaton(lexicon or DEFAULT_LEXICON)
+
+    def raw_weights(self, texts: Sequence[str]) -> np.ndarray:
+        """문장별 매칭 가중치 합 (한 번의 훑기)"""
+        if not texts:
+            return np.zeros(0, dtype=np.float64)
+        joined = _SEPARATOR.join(texts)
+        positions, weights = self.automaton.scan(joined)
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+        if not positions:
+            return np.zeros(len(texts), dtype=np.float64)
+        owner = np.searchsorted(starts, np.asarray(positions), side="right") - 1
+        return np.bincount(owner, weights=np.asarray(weights), minlength=len(texts))
+
+    def score_many(self, texts: Sequence[str]) -> np.ndarray:
+        raw = self.raw_weights(texts)
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.float64, count=len(texts))
+        dilution = np.sqrt(np.maximum(lengths / REFERENCE_CHARS, 1.0))
+        return np.tanh(raw / (SATURATION_WEIGHT * dilution))
+
+    def score(self, text: str) -> float:
+        return float(self.score_many([text])[0])
+
+
+def load_lexicon(path: str) -> Dict[str, float]:
+    """'표현<TAB>가중치' 줄 단위 파일 (# 주석 허용) — 기본 사전에 덮어씀"""
+    lexicon = dict(DEFAULT_LEXICON)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            term, _, weight = line.rpartition("\t")
+            if term:
+                lexicon[term] = float(weight)
+    return lexicon
+
+
+_default_scorer: Optional[IntensityScorer] = None
+
+
+def default_scorer() -> IntensityScorer:
+    """프로세스 공용 채점기 (COLORWAR_INTENSITY_LEXICON 이 있으면 그 파일을 추가 반영)"""
+    global _default_scorer
+    if _default_scorer is None:
+        path = os.getenv("COLORWAR_INTENSITY_LEXICON")
+        _default_scorer = IntensityScorer(load_lexicon(path) if path else None)
+    return _default_scorer
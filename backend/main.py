@@ -2,26 +2,41 @@
 FastAPI 메인 서버 (LLM 기반)
 정치 유튜브 댓글 → 페르소나 생성 → AI 토론 시뮬레이터
 """
+import asyncio
 import os
+import random
 import sys
+import time
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
-from fastapi import FastAPI, HTTPException
+from typing import Optional, Tuple, Union
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, StreamingResponse
 
 # 상위 디렉토리를 Python 경로에 추가 (model 모듈 import를 위해)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # 로컬 모듈 import
-from model.comment_persona_engine import CommentPersonaEngine
-from ai_debater import DebaterManager
+from model.comment_persona_engine import PERSONA_MAX_NEW_TOKENS, CommentPersonaEngine
+from model.state_store import RECORD_SCHEMA, DebateRecord, StateConflictError, create_state_store
+from model.llm_loader import DEFAULT_MODEL_ID, TINY_MODEL_ID, default_backend
+from model.thread_calibration import calibrate_and_save, calibrated_workers, load_calibration
+from ai_debater import DebaterManager, build_default_analysis, DEFAULT_TOPIC, RESPONSE_MAX_NEW_TOKENS
+from inference_pool import SharedMemoryInferencePool
+from event_hub import EventHub
+from memory_governor import ManagedPipeline, MemoryGovernor
+from generation_scheduler import GenerationScheduler, BudgetExceededError
+from response_cache import ResponseCache
+from opening_pool import OpeningPool
+from persona_refresher import PersonaRefresher
+from sentiment_tracker import SentimentTracker
+from request_profiler import PROFILE_MODES, MAX_PROFILE_REQUESTS, ProfilingMiddleware, RequestProfiler, profiled, span
+from single_flight import SingleFlight, fingerprint
+from static_assets import StaticAssetBundle
 from models import (
-    AnalysisResult, Argument, EmotionalPattern,
-    DebateState, DebateMessage, DebateStatusResponse,
-    DebateMessageResponse, Side, CommentSubmission, CommentStats
+    DebateState, DebateStatusResponse,
+    DebateMessageResponse, DebateBranchesResponse, Side, CommentSubmission, CommentStats
 )
 
 # ---------------------------------------------------------
@@ -41,12 +56,247 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 관리자 전용 요청 프로파일링 (COLORWAR_ADMIN_TOKEN 이 없으면 꺼짐, /api/admin/profile 로 켬)
+request_profiler = RequestProfiler()
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
 # ---------------------------------------------------------
 # ✅ 전역 상태 관리
 # ---------------------------------------------------------
-persona_engine = CommentPersonaEngine()
+# 근사 중복 판정 유사도 (0이면 중복 제거 끔)
+DEDUP_THRESHOLD = float(os.getenv("COLORWAR_DEDUP_THRESHOLD", "0.8"))
+
+# 호스트별 스레드/워커/배치 보정 (COLORWAR_CALIBRATE=1: 저장된 결과가 없으면 시작 시 측정, force: 항상 측정)
+CALIBRATE = os.getenv("COLORWAR_CALIBRATE", "0")
+LLM_BACKEND = default_backend()
+CALIBRATION_MODEL_ID = TINY_MODEL_ID if LLM_BACKEND == "tiny" else DEFAULT_MODEL_ID
+
+# 추론 워커 프로세스 수 (0이면 서버 프로세스 안에서 직접 생성, auto면 보정 결과의 워커 수 — 보정을 마친 뒤 정함)
+_workers_setting = os.getenv("COLORWAR_INFERENCE_WORKERS", "0")
+
+# 모델 메모리 예산 (MB, 0이면 무제한 — 사용량 기록만) / 유휴 모델 오프로드 방식 (mmap | unload)
+MEMORY_BUDGET_MB = float(os.getenv("COLORWAR_MEMORY_BUDGET_MB", "0"))
+memory_governor = MemoryGovernor(
+    budget_mb=MEMORY_BUDGET_MB or None,
+    offload_mode=os.getenv("COLORWAR_OFFLOAD_MODE", "mmap"),
+)
+
+# 댓글 풀 / 페르소나 / 토론 세션 저장소 (memory | redis — uvicorn --workers N 이면 redis)
+state_store = create_state_store()
+
+# 워커 풀을 쓰면 가중치는 워커 프로세스가 들고 있으므로 관리자를 거치지 않음
+# (auto는 아직 워커 수를 모르므로 관리자로 올린 뒤, 풀을 만들게 되면 관리자에게서 가중치를 넘겨받음)
+persona_engine = CommentPersonaEngine(
+    dedup_threshold=DEDUP_THRESHOLD or None,
+    governor=memory_governor if _workers_setting in ("0", "auto") else None,
+    store=state_store,
+)
+
+
+def _torch_model():
+    """서버 프로세스에 올라간 torch 모델 (관리자 소유면 관리자에게서, torch/tiny 백엔드가 아니면 None)"""
+    if persona_engine.backend not in ("torch", "tiny"):
+        return None
+    return persona_engine.model if persona_engine.model is not None else getattr(persona_engine.llm, "model", None)
+
+
+if CALIBRATE in ("1", "force") and _torch_model() is not None:
+    if CALIBRATE == "force" or load_calibration(CALIBRATION_MODEL_ID, persona_engine.backend) is None:
+        calibrate_and_save(persona_engine.llm, CALIBRATION_MODEL_ID, persona_engine.backend)
+_calibration = load_calibration(CALIBRATION_MODEL_ID, LLM_BACKEND) or {}
+if _workers_setting == "auto":
+    INFERENCE_WORKERS = calibrated_workers(CALIBRATION_MODEL_ID, LLM_BACKEND) or 0
+    if INFERENCE_WORKERS <= 1:
+        INFERENCE_WORKERS = 0  # 워커 1개는 서버 프로세스 안 생성과 같으므로 풀을 만들지 않음
+else:
+    INFERENCE_WORKERS = int(_workers_setting)
+if INFERENCE_WORKERS > 0 and _torch_model() is not None:
+    # 페르소나 엔진/토론자 모두 공유 가중치 워커 풀로 생성
+    _model = _torch_model()
+    if isinstance(persona_engine.llm, ManagedPipeline):
+        memory_governor.forget(persona_engine.llm.name)  # 관리자 대신 워커 풀이 가중치를 가짐
+    persona_engine.llm = SharedMemoryInferencePool(
+        _model, persona_engine.tokenizer, INFERENCE_WORKERS,
+        threads_per_worker=_calibration.get("threads_per_worker") if _calibration.get("workers") == INFERENCE_WORKERS else None,
+    )
+    persona_engine.model = _model = None  # 서버 프로세스의 가중치 사본 해제
 debater_manager: Optional[DebaterManager] = None
-current_state: Optional[DebateState] = None
+
+# 추측 디코딩 (세션별 선택: /api/debate/start?speculative=ngram|model) — 초안 종류 → SpeculativeDecoder
+SPECULATIVE_DRAFT_MODEL = os.getenv("COLORWAR_SPECULATIVE_DRAFT_MODEL")
+speculative_decoders: dict = {}
+
+# 같은 문맥 응답 캐시 (키 수, 0이면 끔) — 토론이 새로 시작돼도 유지
+RESPONSE_CACHE_SIZE = int(os.getenv("COLORWAR_RESPONSE_CACHE_SIZE", "0"))
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    candidates_per_key=int(os.getenv("COLORWAR_RESPONSE_CACHE_CANDIDATES", "4")),
+) if RESPONSE_CACHE_SIZE > 0 else None
+
+# 백그라운드 스레드의 생성(페르소나 갱신, 첫 발언 보충)도 스케줄러를 거침 — 토론 세션보다 낮은 가중치의 전용 세션
+BACKGROUND_SESSION = "__background__"
+BACKGROUND_WEIGHT = float(os.getenv("COLORWAR_BACKGROUND_WEIGHT", "0.2"))
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _submit_background(fn, *args, cost: Optional[int] = None):
+    """다른 스레드에서 스케줄러에 생성 작업을 넣고 결과를 기다림 (서버 루프가 없으면 바로 실행)"""
+    loop = _event_loop
+    if loop is None or loop.is_closed():
+        return fn(*args)
+
+    async def run():
+        scheduler.set_weight(BACKGROUND_SESSION, BACKGROUND_WEIGHT)
+        try:
+            return await scheduler.submit(BACKGROUND_SESSION, fn, *args, cost=cost or PERSONA_MAX_NEW_TOKENS)
+        finally:
+            scheduler.remove_session(BACKGROUND_SESSION)  # 사용량이 세션 예산에 쌓이지 않도록
+
+    return asyncio.run_coroutine_threadsafe(run(), loop).result()
+
+
+# 첫 발언 사전 생성 풀 (페르소나 생성 시 prefill_openings=true 로 시작)
+# 생성 호출 한 번에 만드는 후보 수는 보정 결과의 batch_size (처리량이 가장 좋았던 배치 크기)
+opening_pool = OpeningPool(
+    size=int(os.getenv("COLORWAR_OPENING_POOL_SIZE", "4")),
+    is_busy=lambda: scheduler.queued() > 0,
+    batch_size=_calibration.get("batch_size"),
+    submit=_submit_background,
+    candidate_tokens=RESPONSE_MAX_NEW_TOKENS,
+)
+
+# 댓글이 계속 들어오면 기준(증가량 / 키워드 이동)을 넘을 때 페르소나를 백그라운드에서 갱신 (0이면 끔)
+# 여러 워커면 한 워커에서만 켜는 것을 권장 (동시에 만든 결과는 먼저 끝난 것만 반영)
+PERSONA_REFRESH = os.getenv("COLORWAR_PERSONA_REFRESH", "1") != "0"
+persona_refresher = PersonaRefresher(
+    persona_engine,
+    is_busy=lambda: scheduler.queued() > 0,
+    on_refresh=lambda side, persona: (opening_pool.invalidate(), event_hub.poke()),
+    interval=float(os.getenv("COLORWAR_PERSONA_REFRESH_INTERVAL", "30")),
+    submit=_submit_background,
+)
+
+# 세션별 토론 상태는 state_store에 (session_id 쿼리 파라미터, 없으면 기본 세션)
+# 시드 재현 모드의 RNG는 (시드, 턴 번호)로 매 턴 다시 만들어 어느 워커가 받아도 같은 결과
+DEFAULT_SESSION = "default"
+MAX_BRANCHES = 8
+
+# 처리 중인 같은 요청 합치기 (더블클릭 / 재시도)
+single_flight = SingleFlight()
+
+# 세션 간 공정 스케줄링 (세션별 초당 토큰 / 총 토큰 예산, 0이면 제한 없음)
+scheduler = GenerationScheduler(
+    concurrency=max(1, INFERENCE_WORKERS),
+    tokens_per_second=float(os.getenv("COLORWAR_SESSION_TOKENS_PER_SEC", "0")) or None,
+    session_token_budget=int(os.getenv("COLORWAR_SESSION_TOKEN_BUDGET", "0")) or None,
+    idle_session_ttl=float(os.getenv("COLORWAR_SCHEDULER_IDLE_SEC", "600")),
+)
+
+# 상태 푸시 채널 (/api/events) — 구독자가 있을 때만 스냅샷 계산, 바뀐 경우만 전송
+# /api/health 응답은 HEALTH_CACHE_SEC 동안 재사용 (탭이 많아도 한 번만 계산)
+HEALTH_CACHE_SEC = float(os.getenv("COLORWAR_HEALTH_CACHE_SEC", "2"))
+_health_cache: Tuple[float, Optional[dict]] = (0.0, None)
+_cuda_available: Optional[bool] = None
+
+
+def _cuda() -> bool:
+    """CUDA 사용 가능 여부 (처음 한 번만 확인, 스텁 모드는 torch 없이 기동)"""
+    global _cuda_available
+    if _cuda_available is None:
+        _cuda_available = False
+        if persona_engine.backend != "stub":
+            import torch
+            _cuda_available = torch.cuda.is_available()
+    return _cuda_available
+
+
+def _status_snapshot() -> dict:
+    """status 이벤트 내용 (댓글 수 / 페르소나 / 모델 상태)"""
+    stats = persona_engine.get_stats()
+    return {
+        "llm_backend": persona_engine.backend,
+        "model_loaded": persona_engine.llm is not None,
+        "device": "cuda" if _cuda() else "cpu",
+        "left_count": stats["left_count"],
+        "right_count": stats["right_count"],
+        "comments_ready": stats["persona_ready"],
+        "personas_generated": stats["personas_generated"],
+        "persona_ready": persona_engine.is_ready(),
+        "persona_refreshing": persona_refresher.refreshing,
+    }
+
+
+event_hub = EventHub(_status_snapshot, poll_interval=float(os.getenv("COLORWAR_EVENTS_POLL_SEC", "2")))
+
+
+def _debate_event(session_id: str, state: DebateState, message=None):
+    """토론 진행 이벤트 (메시지 + 종료 여부)"""
+    payload = {"message_count": state.message_count, "current_topic": state.current_topic,
+               "is_active": state.is_active, "end_reason": state.end_reason}
+    if message is not None:
+        event_hub.publish_debate(session_id, "message", {**payload, "message": message.model_dump(mode="json")})
+    if not state.is_active:
+        event_hub.publish_debate(session_id, "ended", payload)
+
+
+def _seeded_rng(seed: Optional[int], stream: str) -> Optional[random.Random]:
+    """시드 + 용도별 스트림 이름으로 독립 RNG 생성 (동시 실행돼도 순서 무관하게 재현)"""
+    return random.Random(f"{seed}:{stream}") if seed is not None else None
+
+
+# 이전 버전에서 저장된 세션 (발언별 감정 강도 없음) 채점용
+legacy_tracker = SentimentTracker(build_default_analysis())
+
+
+def _load_session(session_id: str) -> Tuple[Optional[DebateRecord], Optional[DebateState]]:
+    with span("load_session"):
+        record = state_store.load_debate(session_id)
+        if record is None:
+            return None, None
+        state = DebateState.model_validate(record.state)
+        if record.schema < RECORD_SCHEMA:
+            # 이전 버전 세션만 점수 없는 발언을 채점 (다음 저장부터 새 형식이라 다시 훑지 않음)
+            legacy_tracker.backfill(state)
+            record.schema = RECORD_SCHEMA
+        return record, state
+
+
+def _save_session(session_id: str, record: DebateRecord, state: DebateState):
+    """읽은 버전 그대로일 때만 저장 — 다른 워커/요청이 먼저 진행했으면 409"""
+    try:
+        with span("save_session"):
+            record.state = state.model_dump(mode="json", exclude_none=True)
+            state_store.save_debate(session_id, record)
+    except StateConflictError as e:
+        raise HTTPException(status_code=409, detail=f"다른 요청이 먼저 토론을 진행했습니다. 다시 시도하세요. ({e})")
+
+
+def _get_debater_manager() -> DebaterManager:
+    """토론을 다른 워커가 시작했어도 이 워커에서 이어갈 수 있도록 필요 시 생성"""
+    global debater_manager
+    if debater_manager is None:
+        debater_manager = DebaterManager(
+            build_default_analysis(), persona_engine,
+            response_cache=response_cache, opening_pool=opening_pool, speculative=speculative_decoders
+        )
+    return debater_manager
+
+
+def _speculative_comments(side: str):
+    return persona_engine.left_comments if side == "left" else persona_engine.right_comments
+
+
+def _get_speculative_decoder(kind: str):
+    """초안 종류별 디코더 (처음 요청될 때 생성, 쓸 수 없는 백엔드면 ValueError)"""
+    if kind not in speculative_decoders:
+        from model.speculative import SpeculativeDecoder
+        speculative_decoders[kind] = SpeculativeDecoder.for_pipeline(
+            persona_engine.llm, kind, corpus=_speculative_comments, draft_model_id=SPECULATIVE_DRAFT_MODEL,
+            backend=persona_engine.backend, governor=memory_governor,
+        )
+        print(f"⚡ 추측 디코딩 준비 완료 (초안: {kind})")
+    return speculative_decoders[kind]
+
 
 print("\n" + "="*60)
 print("🚀 서버 초기화 중...")
@@ -57,13 +307,10 @@ print("LLM 로딩 완료 후 페르소나 생성이 가능합니다.\n")
 # ---------------------------------------------------------
 # ✅ 루트 엔드포인트
 # ---------------------------------------------------------
-@app.get("/")
-async def root():
-    # frontend 폴더는 프로젝트 루트에 있음 (backend의 형제 디렉토리)
-    frontend_path = os.path.join(os.path.dirname(__file__), '..', 'frontend', 'index.html')
-    frontend_path = os.path.abspath(frontend_path)  # 절대 경로로 변환
-    if os.path.exists(frontend_path):
-        return FileResponse(frontend_path)
+@app.api_route("/", methods=["GET", "HEAD"])
+async def root(request: Request):
+    if static_bundle is not None and static_bundle.index is not None:
+        return _static_response(request, static_bundle.index, static_bundle.index.name)
     return {"message": "Political Comment War Simulator API (LLM 기반)"}
 
 
@@ -78,8 +325,10 @@ async def submit_left_comments(submission: CommentSubmission):
     if not submission.comments:
         raise HTTPException(status_code=400, detail="댓글이 비어있습니다.")
     
-    persona_engine.add_left_comments(submission.comments)
-    print(f"✓ 좌파 댓글 {len(submission.comments)}개 추가됨 (총 {len(persona_engine.left_comments)}개)")
+    total = persona_engine.add_left_comments(submission.comments)
+    persona_refresher.notify()
+    event_hub.poke()
+    print(f"✓ 좌파 댓글 {len(submission.comments)}개 추가됨 (총 {total}개)")
     
     return CommentStats(**persona_engine.get_stats())
 
@@ -92,8 +341,10 @@ async def submit_right_comments(submission: CommentSubmission):
     if not submission.comments:
         raise HTTPException(status_code=400, detail="댓글이 비어있습니다.")
     
-    persona_engine.add_right_comments(submission.comments)
-    print(f"✓ 우파 댓글 {len(submission.comments)}개 추가됨 (총 {len(persona_engine.right_comments)}개)")
+    total = persona_engine.add_right_comments(submission.comments)
+    persona_refresher.notify()
+    event_hub.poke()
+    print(f"✓ 우파 댓글 {len(submission.comments)}개 추가됨 (총 {total}개)")
     
     return CommentStats(**persona_engine.get_stats())
 
@@ -112,6 +363,10 @@ async def reset_comments():
     모든 댓글/페르소나 초기화
     """
     persona_engine.reset()
+    opening_pool.clear()
+    event_hub.poke()
+    if response_cache:
+        response_cache.clear()  # 페르소나가 바뀌면 프롬프트도 바뀌지만 메모리 즉시 회수
     return {"message": "댓글 및 페르소나 초기화 완료"}
 
 
@@ -119,26 +374,50 @@ async def reset_comments():
 # ✅ 페르소나 생성 API
 # ---------------------------------------------------------
 @app.post("/api/comments/generate-persona")
-async def generate_persona():
+async def generate_persona(seed: Optional[int] = None, prefill_openings: bool = False):
     """
     수집된 좌/우 댓글을 기반으로 LLM이 페르소나 생성
+    seed를 주면 같은 댓글에서 같은 페르소나가 재현됩니다.
+    prefill_openings=true 면 기본 주제 + 분석 주제별 첫 발언을 백그라운드에서 미리 생성합니다.
+    같은 댓글/옵션으로 처리 중인 요청이 있으면 새로 생성하지 않고 그 결과를 함께 받습니다.
     """
-    if len(persona_engine.left_comments) < 5 or len(persona_engine.right_comments) < 5:
+    left_count, right_count = persona_engine.comment_count("left"), persona_engine.comment_count("right")
+    key = ("*", "generate_persona",
+           fingerprint(seed, prefill_openings, state_store.pool_epoch(), left_count, right_count))
+    return await single_flight.run(
+        key, lambda: _generate_persona(seed, prefill_openings, left_count, right_count)
+    )
+
+
+async def _generate_persona(seed: Optional[int], prefill_openings: bool, left_count: int, right_count: int):
+    if left_count < 5 or right_count < 5:
         raise HTTPException(
             status_code=400,
-            detail=f"댓글이 충분하지 않습니다. 좌:{len(persona_engine.left_comments)}, 우:{len(persona_engine.right_comments)} (각 5개 이상 필요)"
+            detail=f"댓글이 충분하지 않습니다. 좌:{left_count}, 우:{right_count} (각 5개 이상 필요)"
         )
 
-    left_p = persona_engine.generate_persona_via_llm("left")
-    right_p = persona_engine.generate_persona_via_llm("right")
+    # 이벤트 루프를 막지 않도록 스레드에서 생성 (워커 풀이면 좌/우 동시 처리)
+    left_p, right_p = await asyncio.gather(
+        run_in_threadpool(profiled(persona_engine.generate_persona_via_llm), "left", _seeded_rng(seed, "left")),
+        run_in_threadpool(profiled(persona_engine.generate_persona_via_llm), "right", _seeded_rng(seed, "right")),
+    )
 
     if not left_p or not right_p:
         raise HTTPException(status_code=500, detail="페르소나 생성 실패")
 
+    # 이전 페르소나로 만든 첫 발언은 폐기
+    opening_pool.clear()
+    event_hub.poke()
+    if prefill_openings:
+        analysis = build_default_analysis()
+        topics = [DEFAULT_TOPIC] + SentimentTracker(analysis).available_topics
+        opening_pool.prefill(DebaterManager(analysis, persona_engine), topics)
+
     return {
         "message": "페르소나 생성 완료",
         "left_persona": left_p,
-        "right_persona": right_p
+        "right_persona": right_p,
+        "prefill_openings": prefill_openings
     }
 
 
@@ -146,130 +425,311 @@ async def generate_persona():
 # ✅ 토론 시뮬레이션 API
 # ---------------------------------------------------------
 @app.post("/api/debate/start")
-async def start_debate():
+async def start_debate(session_id: str = DEFAULT_SESSION, seed: Optional[int] = None, topic: str = DEFAULT_TOPIC,
+                       speculative: Optional[str] = Query(None, pattern="^(ngram|model)$")):
     """
     생성된 페르소나를 기반으로 토론 세션 시작
+    seed를 주면 같은 페르소나/입력에서 토론이 토큰 단위로 재현됩니다.
+    speculative를 주면 이 세션의 응답을 추측 디코딩으로 생성합니다 (ngram: 댓글 풀 n-gram 초안, model: 작은 초안 모델).
     """
-    global debater_manager, current_state
+    key = (session_id, "start", fingerprint(seed, topic, speculative))
+    return await single_flight.run(key, lambda: _start_debate(session_id, seed, topic, speculative))
+
+
+async def _start_debate(session_id: str, seed: Optional[int], topic: str, speculative: Optional[str] = None):
+    global debater_manager
 
     if not persona_engine.is_ready():
         raise HTTPException(status_code=400, detail="페르소나가 아직 준비되지 않았습니다. 먼저 /api/comments/generate-persona 실행")
-
-    # 더미 분석 정보로 토론자 초기화
-    dummy_analysis = AnalysisResult(
-        left_arguments=[Argument(point="진보", keywords=["개혁"])],
-        right_arguments=[Argument(point="보수", keywords=["안정"])],
-        controversial_keywords=["정치"],
-        left_emotional_patterns=[EmotionalPattern(pattern="열정적", examples=[])],
-        right_emotional_patterns=[EmotionalPattern(pattern="냉정함", examples=[])],
-        sample_comments={"left": [], "right": []}
+    if speculative:
+        try:
+            await run_in_threadpool(_get_speculative_decoder, speculative)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    debater_manager = DebaterManager(
+        build_default_analysis(), persona_engine,
+        response_cache=response_cache, opening_pool=opening_pool, speculative=speculative_decoders
     )
 
-    debater_manager = DebaterManager(dummy_analysis, persona_engine)
-
     # 토론 초기 상태
-    current_state = DebateState(
+    state = DebateState(
         message_count=0,
         messages=[],
-        current_topic="정치적 공정성",
+        current_topic=topic,
         topics_covered=[],
-        is_active=True
+        is_active=True,
+        speculative={"draft": speculative} if speculative else None
+    )
+    state_store.save_debate(
+        session_id, DebateRecord(state.model_dump(mode="json", exclude_none=True), seed=seed), force=True
     )
 
+    event_hub.publish_debate(session_id, "started", {"current_topic": topic, "seed": seed, "speculative": speculative})
     return {
         "message": "토론 시작",
-        "state": current_state,
+        "session_id": session_id,
+        "seed": seed,
+        "state": state,
         "persona_ready": persona_engine.is_ready()
     }
 
 
-@app.post("/api/debate/next", response_model=DebateMessageResponse)
-async def next_message(side: Optional[Side] = None):
+@app.post("/api/debate/next", response_model=Union[DebateMessageResponse, DebateBranchesResponse])
+async def next_message(side: Optional[Side] = None, session_id: str = DEFAULT_SESSION,
+                       n: int = Query(1, ge=1, le=MAX_BRANCHES)):
     """
     다음 발언 생성 (좌/우 번갈아)
+    세션별 큐에서 공정하게 순서를 기다린 뒤 생성됩니다.
+    n > 1 이면 후보 n개를 한 번의 생성으로 만들어 돌려주고, /api/debate/commit 으로 하나를 골라 반영합니다.
+    같은 세션 버전에 대해 처리 중인 같은 요청이 있으면 그 결과를 함께 받습니다.
     """
-    global current_state, debater_manager
-
-    if not current_state or not current_state.is_active:
+    record, state = _load_session(session_id)
+    if not state:
         raise HTTPException(status_code=400, detail="토론이 아직 시작되지 않았습니다.")
+    if not state.is_active:
+        raise HTTPException(status_code=400, detail=f"토론이 종료되었습니다. ({state.end_reason or 'stopped'})")
+
+    key = (session_id, "next", fingerprint(record.version, side, n))
+    return await single_flight.run(key, lambda: _next_message(session_id, record, state, side, n))
+
+
+async def _next_message(session_id: str, record: DebateRecord, state: DebateState, side: Optional[Side], n: int):
+    manager = _get_debater_manager()
+    rng = _seeded_rng(record.seed, f"debate:{state.message_count}")
+    try:
+        if n > 1:
+            branch_side, candidates = await scheduler.submit(
+                session_id, profiled(manager.propose_branches), state, n, side, rng,
+                cost=RESPONSE_MAX_NEW_TOKENS * n,
+                usage=lambda result: sum(persona_engine.token_counter.count_many(result[1]))
+            )
+            record.pending = (state.message_count, branch_side.value, candidates)
+            _save_session(session_id, record, state)
+            event_hub.publish_debate(session_id, "branches", {"side": branch_side.value, "count": len(candidates)})
+            return DebateBranchesResponse(side=branch_side, candidates=candidates, state=state,
+                                          intensities=manager.tracker.score_texts(candidates))
+
+        message = await scheduler.submit(
+            session_id, profiled(manager.next_turn), state, side, rng,
+            cost=RESPONSE_MAX_NEW_TOKENS,
+            usage=lambda message: persona_engine.token_counter.count(message.content)
+        )
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    record.pending = None
+    _save_session(session_id, record, state)
+    print(f"{'좌파' if message.side == Side.LEFT else '우파'} 응답 완료: {message.content[:50]}...")
+    _debate_event(session_id, state, message)
 
-    if not debater_manager:
-        raise HTTPException(status_code=500, detail="DebaterManager가 초기화되지 않았습니다.")
-
-    # 발언 순서 결정
-    current_state.message_count += 1
-    if side is None:
-        side = Side.LEFT if current_state.message_count % 2 == 1 else Side.RIGHT
-
-    opponent_side = Side.RIGHT if side == Side.LEFT else Side.LEFT
-    opponent_message = None
-    for msg in reversed(current_state.messages):
-        if msg.side == opponent_side:
-            opponent_message = msg
-            break
-
-    print(f"{'좌파' if side == Side.LEFT else '우파'} 응답 생성 중...")
-    content = debater_manager.generate_response(side, current_state, opponent_message)
-    print(f"응답 완료: {content[:50]}...")
-
-    message = DebateMessage(
-        side=side,
-        content=content,
-        current_topic=current_state.current_topic,
-        timestamp=datetime.now().isoformat()
-    )
-    current_state.messages.append(message)
+    return DebateMessageResponse(message=message, state=state)
+
+
+@app.post("/api/debate/commit", response_model=DebateMessageResponse)
+async def commit_branch(index: int, session_id: str = DEFAULT_SESSION):
+    """
+    /api/debate/next?n=N 으로 받은 후보 중 index번째를 토론에 반영
+    """
+    record, state = _load_session(session_id)
+    if not state or not record.pending:
+        raise HTTPException(status_code=404, detail="반영할 분기가 없습니다. 먼저 /api/debate/next?n=N 실행")
 
-    return DebateMessageResponse(message=message, state=current_state)
+    key = (session_id, "commit", fingerprint(record.version, index))
+    return await single_flight.run(key, lambda: _commit_branch(session_id, record, state, index))
+
+
+async def _commit_branch(session_id: str, record: DebateRecord, state: DebateState, index: int):
+
+    message_count, branch_side, candidates = record.pending
+    if message_count != state.message_count:
+        raise HTTPException(status_code=409, detail="분기 생성 후 토론이 진행되어 후보가 만료되었습니다.")
+    if not 0 <= index < len(candidates):
+        raise HTTPException(status_code=400, detail=f"index는 0 ~ {len(candidates) - 1} 사이여야 합니다.")
+
+    record.pending = None
+    rng = _seeded_rng(record.seed, f"debate:{state.message_count}")
+    message = _get_debater_manager().commit_turn(state, Side(branch_side), candidates[index], rng)
+    _save_session(session_id, record, state)
+    _debate_event(session_id, state, message)
+    return DebateMessageResponse(message=message, state=state)
 
 
 @app.get("/api/debate/status", response_model=DebateStatusResponse)
-async def debate_status():
+async def debate_status(session_id: str = DEFAULT_SESSION):
     """
     현재 토론 상태 조회
     """
-    global current_state
-    if not current_state:
+    _, state = _load_session(session_id)
+    if not state:
         raise HTTPException(status_code=404, detail="진행 중인 토론이 없습니다.")
-    return DebateStatusResponse(state=current_state)
+    analysis = debater_manager.analysis if debater_manager else build_default_analysis()
+    return DebateStatusResponse(state=state, analysis=analysis)
 
 
 @app.post("/api/debate/reset")
-async def reset_debate():
+async def reset_debate(session_id: str = DEFAULT_SESSION):
     """
     토론 세션 초기화
     """
-    global current_state
-    current_state = None
+    state_store.delete_debate(session_id)
+    event_hub.publish_debate(session_id, "reset", {})
+    scheduler.remove_session(session_id)
     return {"message": "토론이 초기화되었습니다."}
 
 
+@app.get("/api/scheduler/stats")
+async def scheduler_stats():
+    """
+    세션별 생성 큐 길이 / 대기 시간 / 토큰 사용량
+    """
+    return scheduler.stats()
+
+
+# ---------------------------------------------------------
+# ✅ 관리자: 요청 프로파일링
+# ---------------------------------------------------------
+def _require_admin(token: Optional[str]):
+    if not request_profiler.enabled:
+        raise HTTPException(status_code=404, detail="관리자 기능이 꺼져 있습니다. (COLORWAR_ADMIN_TOKEN 설정 필요)")
+    if not request_profiler.check_token(token):
+        raise HTTPException(status_code=403, detail="관리자 토큰이 올바르지 않습니다.")
+
+
+@app.post("/api/admin/profile")
+async def start_profiling(count: int = Query(1, ge=1, le=MAX_PROFILE_REQUESTS), mode: str = "cprofile",
+                          path: str = "/api/debate/", x_admin_token: Optional[str] = Header(None)):
+    """
+    경로가 path로 시작하는 다음 count개 요청을 프로파일링 (재시작 없이 켜고 끔)
+    mode: cprofile (전체 Python 호출) | torch (생성 작업은 torch 프로파일러)
+    """
+    _require_admin(x_admin_token)
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode는 {', '.join(PROFILE_MODES)} 중 하나입니다.")
+    if mode == "torch" and persona_engine.backend not in ("torch", "tiny"):
+        raise HTTPException(status_code=400, detail=f"torch 프로파일러는 torch 백엔드에서만 쓸 수 있습니다. (현재: {persona_engine.backend})")
+    return request_profiler.arm(count, mode, path)
+
+
+@app.get("/api/admin/profile")
+async def profiling_status(x_admin_token: Optional[str] = Header(None)):
+    """남은 요청 수 / 최근 캡처 파일 목록"""
+    _require_admin(x_admin_token)
+    return request_profiler.status()
+
+
+@app.delete("/api/admin/profile")
+async def stop_profiling(x_admin_token: Optional[str] = Header(None)):
+    """남은 프로파일링 취소 (진행 중인 캡처는 끝까지 저장)"""
+    _require_admin(x_admin_token)
+    return request_profiler.disarm()
+
+
 # ---------------------------------------------------------
 # ✅ 헬스체크
 # ---------------------------------------------------------
 @app.get("/api/health")
 async def health_check():
-    import torch
+    """서버 상태 (HEALTH_CACHE_SEC 동안 같은 응답 재사용)"""
+    global _health_cache
+    now = time.monotonic()
+    cached_at, payload = _health_cache
+    if payload is None or now - cached_at >= HEALTH_CACHE_SEC:
+        payload = _health_payload()
+        _health_cache = (now, payload)
+    return payload
+
+
+def _health_payload() -> dict:
+    cuda_available = _cuda()
     return {
         "status": "healthy",
-        "cuda_available": torch.cuda.is_available(),
-        "device": "cuda" if torch.cuda.is_available() else "cpu",
-        "persona_stats": persona_engine.get_stats()
+        "cuda_available": cuda_available,
+        "device": "cuda" if cuda_available else "cpu",
+        "llm_backend": persona_engine.backend,
+        "persona_ready": persona_engine.is_ready(),
+        "persona_stats": persona_engine.get_stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+        "opening_pool": opening_pool.stats(),
+        "memory": memory_governor.stats(),
+        "state_store": state_store.stats(),
+        "single_flight": single_flight.stats(),
+        "persona_refresh": persona_refresher.stats(),
+        "calibration": _calibration_summary(),
+        "events": event_hub.stats(),
+        "speculative": {kind: decoder.stats() for kind, decoder in speculative_decoders.items()},
+        "inference_workers": persona_engine.llm.stats() if isinstance(persona_engine.llm, SharedMemoryInferencePool) else []
     }
 
 
+@app.get("/api/events")
+async def events(session_id: Optional[str] = None):
+    """
+    상태 푸시 채널 (Server-Sent Events)
+    status: 댓글 수 / 페르소나 / 모델 상태가 바뀔 때, debate: session_id 토론 이벤트 (없으면 모든 세션)
+    """
+    return StreamingResponse(
+        event_hub.subscribe(session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _calibration_summary() -> Optional[dict]:
+    if persona_engine.backend not in ("torch", "tiny"):
+        return None
+    result = load_calibration(CALIBRATION_MODEL_ID, persona_engine.backend)
+    if result is None:
+        return None
+    return {k: v for k, v in result.items() if k != "results"}
+
+
+@app.on_event("startup")
+async def startup():
+    global _event_loop
+    _event_loop = asyncio.get_running_loop()
+    if PERSONA_REFRESH and persona_engine.llm is not None:
+        persona_refresher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    persona_refresher.stop()
+    if isinstance(persona_engine.llm, SharedMemoryInferencePool):
+        persona_engine.llm.close()
+
+
 # ---------------------------------------------------------
-# ✅ 정적 프론트엔드 제공
+# ✅ 정적 프론트엔드 제공 (시작 시 메모리에 압축본까지 준비)
 # ---------------------------------------------------------
+static_bundle: Optional[StaticAssetBundle] = None
 try:
     # frontend 폴더는 프로젝트 루트에 있음 (backend의 형제 디렉토리)
     frontend_dir = os.path.join(os.path.dirname(__file__), "..", "frontend")
     frontend_dir = os.path.abspath(frontend_dir)  # 절대 경로로 변환
     if os.path.exists(frontend_dir):
-        app.mount("/static", StaticFiles(directory=frontend_dir), name="static")
-        print(f"✓ 프론트엔드 마운트 완료: {frontend_dir}")
+        static_bundle = StaticAssetBundle(frontend_dir)
+        print(f"✓ 프론트엔드 로딩 완료: {frontend_dir} (brotli: {static_bundle.stats()['brotli']})")
 except Exception as e:
-    print(f"⚠ 프론트엔드 마운트 실패: {e}")
+    print(f"⚠ 프론트엔드 로딩 실패: {e}")
+
+
+def _static_response(request: Request, asset, request_name: str) -> Response:
+    status, body, headers = static_bundle.respond(
+        asset,
+        request_name,
+        request.headers.get("accept-encoding", ""),
+        request.headers.get("if-none-match"),
+        head=request.method == "HEAD",
+    )
+    return Response(content=body, status_code=status, headers=headers)
+
+
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"])
+async def static_file(name: str, request: Request):
+    asset = static_bundle.get(name) if static_bundle is not None else None
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return _static_response(request, asset, name)
 
 
 # ---------------------------------------------------------
@@ -0,0 +1,358 @@
+"""
+모델 메모리 예산 관리자
+올라간 모델마다 메모리 사용량을 기록하고, 예산을 넘는 로딩은 대기시키거나 거절합니다.
+예산이 모자라면 지금 생성에 쓰이지 않는 모델부터 LRU 순으로 내립니다.
+
+내리는 방식 (offload_mode):
+- mmap  : safetensors로 한 번 저장한 뒤 가중치를 파일 매핑으로 교체
+          (커널이 필요할 때 페이지를 회수, 다음 호출은 페이지 폴트만으로 복귀)
+          저장 / 매핑은 lock 밖에서 진행 ("offloading" 상태, 그 모델만 대기)
+          저장 위치는 모델 설정 / 리비전 / dtype 해시별로 나뉘고 임시 디렉토리에 다 쓴 뒤 이름을 바꿔 넣음
+- unload: 모델을 완전히 해제하고 다음 호출 때 다시 로딩
+"""
+import gc
+import re
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+# 측정 전 로딩 여부를 판단하기 위한 대략적 크기 (float32 기준, MB)
+KNOWN_FOOTPRINT_MB = {
+    "skt/kogpt2-base-v2": 500,
+    "jhgan/ko-alpaca-7b": 27000,
+}
+# 양자화 변형("<model_id>+int8")의 예상 크기 비율
+QUANT_RATIO = {"int8": 0.25, "int4": 0.125}
+OFFLOAD_MODES = ("mmap", "unload")
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """예산 안에서 모델을 올릴 수 없음"""
+
+
+def current_rss_mb() -> float:
+    """현재 프로세스 RSS (Linux /proc 기준, 없으면 최대 RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 ** 2
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def model_footprint_mb(model) -> Optional[float]:
+    """torch 모듈이면 파라미터 + 버퍼 크기 (공유 텐서는 한 번만), 아니면 None"""
+    if model is None or not hasattr(model, "parameters"):
+        return None
+    seen, total = set(), 0
+    tensors = list(model.parameters()) + list(model.buffers())
+    for t in tensors:
+        key = t.data_ptr()
+        if key not in seen:
+            seen.add(key)
+            total += t.numel() * t.element_size()
+    return total / 1024 ** 2
+
+
+class _Entry:
+    def __init__(self, name: str, model_id: str, loader: Callable[[], Tuple]):
+        self.name = name
+        self.model_id = model_id
+        self.loader = loader
+        self.model = None
+        self.tokenizer = None
+        self.llm = None
+        self.state = "unloaded"  # unloaded | loading | loaded | offloading | mapped
+        self.file_backed = False  # 가중치가 이미 safetensors 파일 매핑인지
+        base, _, variant = model_id.partition("+")
+        self.footprint_mb = KNOWN_FOOTPRINT_MB.get(base, 0) * QUANT_RATIO.get(variant, 1.0)
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.loads = 0
+        self.offloads = 0
+
+    @property
+    def resident_mb(self) -> float:
+        return self.footprint_mb if self.state in ("loaded", "loading", "offloading") else 0.0
+
+
+class ManagedPipeline:
+    """관리 대상 모델의 파이프라인 대리자 — 호출 시 필요하면 다시 올리고 사용 중으로 표시"""
+
+    def __init__(self, governor: "MemoryGovernor", entry: _Entry):
+        self._governor = governor
+        self._entry = entry
+
+    @property
+    def name(self) -> str:
+        return self._entry.name
+
+    @property
+    def tokenizer(self):
+        return self._entry.tokenizer
+
+    @property
+    def model(self):
+        return self._entry.model
+
+    @property
+    def supports_seed(self) -> bool:
+        return getattr(self._entry.llm, "supports_seed", False)
+
+    def __call__(self, prompt, **kwargs):
+        entry = self._governor.acquire(self._entry.name)
+        try:
+            return entry.llm(prompt, **kwargs)
+        finally:
+            self._governor.release(self._entry.name)
+
+    @contextmanager
+    def hold(self):
+        """파이프라인을 거치지 않고 모델을 직접 호출하는 동안 사용 중으로 표시하고 지금 올라간 모델을 내줌"""
+        entry = self._governor.acquire(self._entry.name)
+        try:
+            yield entry.model
+        finally:
+            self._governor.release(self._entry.name)
+
+
+class MemoryGovernor:
+    """모델별 메모리 사용량 추적 + 예산 초과 시 LRU 오프로드 (스레드 안전)"""
+
+    def __init__(self, budget_mb: Optional[float] = None, offload_mode: str = "mmap",
+                 wait_timeout: float = 30.0, cache_dir=None):
+        """
+        Args:
+            budget_mb: 모델 메모리 예산 (None이면 무제한, 사용량만 기록)
+            offload_mode: "mmap" | "unload"
+            wait_timeout: 사용 중인 모델이 풀리길 기다리는 최대 시간(초), 넘으면 거절
+            cache_dir: mmap 오프로드용 safetensors 저장 위치
+        """
+        if offload_mode not in OFFLOAD_MODES:
+            raise ValueError(f"알 수 없는 오프로드 방식: {offload_mode} (선택: {', '.join(OFFLOAD_MODES)})")
+        self.budget_mb = budget_mb
+        self.offload_mode = offload_mode
+        self.wait_timeout = wait_timeout
+        self.cache_dir = Path(cache_dir or Path.home() / ".cache" / "color_war") / "offload"
+        self._entries: Dict[str, _Entry] = {}
+        self._measured: Dict[str, float] = {}  # model_id → 실측 크기 (다음 로딩 예측용)
+        self._cond = threading.Condition()
+        self.refused = 0
+
+    # ==========================================================
+    # 공개 API
+    # ==========================================================
+    def load(self, name: str, model_id: str, loader: Callable[[], Tuple]) -> Tuple:
+        """
+        loader() → (model, tokenizer, pipeline) 를 예산 안에서 실행하고 관리 대상으로 등록
+        같은 name이 이미 있으면 올라간 모델을 공유합니다.
+        """
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _Entry(name, model_id, loader)
+                entry.footprint_mb = self._measured.get(model_id, entry.footprint_mb)
+        entry = self.acquire(name)
+        self.release(name)
+        return entry.model, entry.tokenizer, ManagedPipeline(self, entry)
+
+    def acquire(self, name: str) -> _Entry:
+        """사용 시작 표시 (내려가 있으면 예산 확보 후 다시 올림)"""
+        with self._cond:
+            entry = self._entries[name]
+            while entry.state in ("loading", "offloading"):
+                self._cond.wait()
+            if entry.state == "loaded":
+                entry.in_use += 1
+                entry.last_used = time.monotonic()
+                return entry
+
+            previous = entry.state
+            entry.state = "loading"  # 자리 확보를 기다리는 동안 다른 호출은 대기
+            try:
+                self._make_room(entry)
+            except MemoryBudgetExceeded:
+                entry.state = previous
+                self.refused += 1
+                self._cond.notify_all()
+                raise
+            entry.in_use += 1
+            if previous == "mapped":
+                # 파일 매핑 가중치는 그대로 사용 가능 (페이지 폴트로 복귀)
+                entry.state = "loaded"
+                entry.last_used = time.monotonic()
+                return entry
+
+        try:
+            self._load(entry)
+        except Exception:
+            with self._cond:
+                entry.state = "unloaded"
+                entry.in_use -= 1
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._measured[entry.model_id] = entry.footprint_mb
+            try:
+                self._make_room(entry)  # 예측보다 컸던 경우 실측 기준으로 다시 확보
+            except MemoryBudgetExceeded:
+                entry.model, entry.llm = None, None
+                entry.state = "unloaded"
+                entry.in_use -= 1
+                self.refused += 1
+                self._cond.notify_all()
+                gc.collect()
+                raise
+            entry.state = "loaded"
+            entry.last_used = time.monotonic()
+            self._cond.notify_all()
+        return entry
+
+    def release(self, name: str):
+        with self._cond:
+            entry = self._entries[name]
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            self._cond.notify_all()
+
+    def offload(self, name: str):
+        """사용 중이 아니면 즉시 내림"""
+        with self._cond:
+            entry = self._entries[name]
+            if entry.in_use == 0 and entry.state == "loaded":
+                self._offload(entry)
+
+    def forget(self, name: str):
+        """관리 대상에서 제거 (다른 곳이 모델을 넘겨받았을 때)"""
+        with self._cond:
+            self._entries.pop(name, None)
+            self._cond.notify_all()
+
+    def used_mb(self) -> float:
+        return sum(e.resident_mb for e in self._entries.values())
+
+    def stats(self) -> Dict:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "budget_mb": self.budget_mb,
+                "used_mb": round(self.used_mb(), 1),
+                "process_rss_mb": round(current_rss_mb(), 1),
+                "offload_mode": self.offload_mode,
+                "refused": self.refused,
+                "models": [
+                    {
+                        "name": e.name,
+                        "model_id": e.model_id,
+                        "state": e.state,
+                        "footprint_mb": round(e.footprint_mb, 1),
+                        "in_use": e.in_use,
+                        "idle_sec": round(now - e.last_used, 1),
+                        "loads": e.loads,
+                        "offloads": e.offloads,
+                    }
+                    for e in self._entries.values()
+                ],
+            }
+
+    # ==========================================================
+    # 내부
+    # ==========================================================
+    def _make_room(self, entry: _Entry):
+        """entry가 들어갈 자리 확보 (호출자가 lock 보유)"""
+        if self.budget_mb is None:
+            return
+        if entry.footprint_mb > self.budget_mb:
+            raise MemoryBudgetExceeded(
+                f"{entry.name}: 예상 {entry.footprint_mb:.0f}MB > 예산 {self.budget_mb:.0f}MB"
+            )
+
+        deadline = time.monotonic() + self.wait_timeout
+        while self._used_without(entry) + entry.footprint_mb > self.budget_mb:
+            idle = [e for e in self._entries.values()
+                    if e is not entry and e.state == "loaded" and e.in_use == 0]
+            if idle:
+                self._offload(min(idle, key=lambda e: e.last_used))
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise MemoryBudgetExceeded(
+                    f"{entry.name}: 사용 중인 모델이 예산을 차지하고 있어 {self.wait_timeout:.0f}초 내에 올릴 수 없음"
+                )
+            self._cond.wait(remaining)  # 사용 중인 모델이 풀리면 다시 시도
+
+    def _used_without(self, entry: _Entry) -> float:
+        return sum(e.resident_mb for e in self._entries.values() if e is not entry)
+
+    def _load(self, entry: _Entry):
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        model, tokenizer, llm = entry.loader()
+        measured = model_footprint_mb(model)
+        if measured is None:
+            measured = max(0.0, current_rss_mb() - rss_before)  # ONNX 등 torch 모듈이 아닌 경우
+
+        entry.model, entry.tokenizer, entry.llm = model, tokenizer, llm
+        entry.file_backed = False
+        entry.footprint_mb = measured
+        entry.loads += 1
+        print(f"🧠 {entry.name} 로딩: {measured:.0f}MB ({time.perf_counter() - started:.1f}초)")
+
+    def _offload(self, entry: _Entry):
+        # 호출자가 lock 보유, 파일 저장 / 매핑 동안만 lock을 풀고 이 모델은 "offloading"으로 둠
+        # 양자화된 모델은 save_pretrained 형식이 달라 파일 매핑 대신 해제
+        mappable = hasattr(entry.model, "save_pretrained") and not getattr(entry.model, "weight_quantization", None)
+        mapped = None
+        if self.offload_mode == "mmap" and mappable:
+            entry.state = "offloading"
+            try:
+                with self._unlocked():
+                    mapped = self._map_to_disk(entry)
+            except Exception as e:
+                print(f"⚠ {entry.name} 파일 매핑 실패 → 해제: {e}")
+
+        if mapped is not None:
+            if hasattr(entry.llm, "model"):
+                entry.llm.model = mapped
+            entry.model = mapped
+            entry.file_backed = True
+            entry.state = "mapped"
+        else:
+            entry.model, entry.llm = None, None
+            entry.state = "unloaded"
+        gc.collect()
+        entry.offloads += 1
+        self._cond.notify_all()
+        print(f"📤 {entry.name} 오프로드 ({entry.state}, {entry.footprint_mb:.0f}MB)")
+
+    @contextmanager
+    def _unlocked(self):
+        """lock을 잠시 풀었다가 다시 잡음 (한 번만 잡은 상태에서 호출)"""
+        self._cond.release()
+        try:
+            yield
+        finally:
+            self._cond.acquire()
+
+    def _map_to_disk(self, entry: _Entry):
+        """safetensors 사본(모델 설정 / 리비전 / dtype별)을 파일 매핑한 모델 반환 (lock 밖에서 호출)"""
+        if entry.file_backed:
+            return entry.model
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from model.mmap_weights import export_model, load_model_mmap, weights_key
+
+        name = re.sub(r"[^\w.-]", "--", entry.name)
+        offload_dir = export_model(entry.model, self.cache_dir / f"{name}-{weights_key(entry.model)}",
+                                   max_shard_size="100GB")
+        # 사용자 정의 코드 모델(auto_map)은 이미 이 프로세스에서 그 코드로 올라온 모델을 저장한 사본
+        return load_model_mmap(offload_dir, trust_remote_code=bool(getattr(entry.model.config, "auto_map", None)))
@@ -1,7 +1,7 @@
 """
 데이터 모델 정의
 """
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -45,6 +45,7 @@ class DebateMessage(BaseModel):
     content: str = Field(..., description="댓글 내용")
     current_topic: str = Field(default="", description="현재 주제")
     timestamp: Optional[str] = Field(None, description="타임스탬프")
+    intensity: Optional[float] = Field(None, description="감정 강도 (-1 진정 ~ 1 과열)")
 
 
 class DebateState(BaseModel):
@@ -54,6 +55,14 @@ class DebateState(BaseModel):
     current_topic: str = Field(default="", description="현재 토론 주제")
     topics_covered: List[str] = Field(default_factory=list, description="다뤄진 주제들")
     is_active: bool = Field(default=False, description="토론 진행 중 여부")
+    escalation: Dict[str, float] = Field(
+        default_factory=lambda: {"left": 0.0, "right": 0.0}, description="측별 감정 강도 이동 평균"
+    )
+    topic_started_at: int = Field(default=0, description="현재 주제를 시작한 시점의 메시지 수")
+    end_reason: Optional[str] = Field(None, description="종료 사유 (overheated | agreement | max_messages)")
+    speculative: Optional[Dict[str, Any]] = Field(
+        None, description="추측 디코딩 초안 종류 + 누적 통계 (None이면 일반 생성)"
+    )
 
 
 class DebateStartRequest(BaseModel):
@@ -79,6 +88,14 @@ class DebateMessageResponse(BaseModel):
     state: DebateState = Field(..., description="업데이트된 상태")
 
 
+class DebateBranchesResponse(BaseModel):
+    """다음 발언 후보 (분기) 응답 — /api/debate/commit 으로 하나를 골라 반영"""
+    side: Side = Field(..., description="발언자 성향")
+    candidates: List[str] = Field(..., description="후보 발언들")
+    intensities: List[float] = Field(default_factory=list, description="후보별 감정 강도")
+    state: DebateState = Field(..., description="현재 상태 (아직 반영 전)")
+
+
 class CommentSubmission(BaseModel):
     """댓글 제출 (좌파 또는 우파)"""
     comments: List[str] = Field(..., description="댓글 리스트")
@@ -90,4 +107,6 @@ class CommentStats(BaseModel):
     right_count: int = Field(default=0, description="우파 댓글 수")
     persona_ready: bool = Field(default=False, description="댓글 수집 완료 여부 (5개 이상)")
     personas_generated: bool = Field(default=False, description="페르소나 생성 완료 여부")
+    duplicates_removed: int = Field(default=0, description="근사 중복으로 제외된 댓글 수")
+    dedup_ratio: float = Field(default=0.0, description="제출 댓글 대비 중복 제외 비율")
 
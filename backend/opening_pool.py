@@ -0,0 +1,154 @@
+"""
+첫 발언 사전 생성 풀
+페르소나가 만들어지면 백그라운드에서 (첫 발언 진영, 주제)별 첫 발언을 K개씩 미리 생성해 두고
+토론 첫 턴은 풀에서 바로 꺼내 씁니다. 꺼낸 만큼은 백그라운드에서 다시 채웁니다.
+
+- 상대 진영의 첫 턴은 이미 나온 첫 발언에 답해야 하므로 미리 만들 수 없음 → 첫 발언 진영만 채움
+- 시드 재현 모드 세션은 풀을 쓰지 않음 (풀의 발언은 세션 시드와 무관하게 만들어지므로)
+- 보충 생성은 스케줄러에 낮은 가중치로 제출 → 토론 턴과 같은 공정 큐 / 토큰 버킷을 거침
+"""
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from models import DebateState, Side
+
+
+class OpeningPool:
+    """(진영, 주제)별 첫 발언 풀 + 저우선순위 보충 스레드"""
+
+    def __init__(self, size: int = 4, is_busy: Optional[Callable[[], bool]] = None,
+                 batch_size: Optional[int] = None, submit: Optional[Callable[..., Any]] = None,
+                 candidate_tokens: int = 150):
+        """
+        Args:
+            size: (진영, 주제)당 유지할 첫 발언 수 K
+            is_busy: True를 반환하는 동안 보충을 미룸 (대화형 요청 우선)
+            batch_size: 생성 호출 한 번에 만들 최대 후보 수 (None이면 K개 한 번에, 보통 보정 결과의 batch_size)
+            submit: submit(fn, *args, cost=예상 토큰 수) → fn(*args) 결과, 스케줄러를 거쳐 실행 (없으면 이 스레드에서 바로)
+            candidate_tokens: 후보 하나의 예상 생성 토큰 수 (보충 작업 비용 = 후보 수 × 이 값)
+        """
+        self.size = size
+        self.batch_size = batch_size or size
+        self.is_busy = is_busy or (lambda: False)
+        self.submit = submit or (lambda fn, *args, cost=None: fn(*args))
+        self.candidate_tokens = candidate_tokens
+        self._pools: Dict[Tuple[Side, str], Deque[str]] = {}
+        self._pending = set()
+        self._manager = None
+        self._epoch = 0  # 페르소나가 바뀌면 증가 → 이전 세대 작업/결과 폐기
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[int, Tuple[Side, str]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ==========================================================
+    # 공개 API
+    # ==========================================================
+    def prefill(self, manager, topics: Iterable[str]):
+        """새 페르소나 기준으로 풀을 비우고 (첫 발언 진영, 주제) 보충 예약"""
+        side, _ = manager.plan_turn(DebateState(is_active=True))
+        with self._lock:
+            self._epoch += 1
+            self._manager = manager
+            self._pools.clear()
+            self._pending.clear()
+            for topic in dict.fromkeys(topics):
+                self._pools[(side, topic)] = deque()
+                self._request((side, topic))
+        self._ensure_thread()
+
+    def take(self, side: Side, topic: str) -> Optional[str]:
+        """풀에서 첫 발언 하나 꺼냄 (없으면 None), 꺼낸 자리는 비동기로 보충"""
+        key = (side, topic)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                return None
+            text = pool.popleft() if pool else None
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._request(key)
+        return text
+
+    def invalidate(self):
+        """페르소나가 갱신됐을 때: 이전 페르소나로 만든 발언을 버리고 같은 (진영, 주제)를 다시 채움"""
+        with self._lock:
+            if self._manager is None:
+                return
+            self._epoch += 1
+            keys = list(self._pools)
+            self._pools = {key: deque() for key in keys}
+            self._pending.clear()
+            for key in keys:
+                self._request(key)
+        self._ensure_thread()
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._manager = None
+            self._pools.clear()
+            self._pending.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "batch_size": self.batch_size,
+                "ready": {f"{side.value}:{topic}": len(pool) for (side, topic), pool in self._pools.items()},
+                "pending_refills": len(self._pending),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # ==========================================================
+    # 백그라운드 보충
+    # ==========================================================
+    def _request(self, key: Tuple[Side, str]):
+        # 호출자가 lock 보유
+        if self._manager is not None and key not in self._pending:
+            self._pending.add(key)
+            self._queue.put((self._epoch, key))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._refill_loop, name="opening-pool", daemon=True)
+            self._thread.start()
+
+    def _refill_loop(self):
+        while True:
+            epoch, key = self._queue.get()
+            while self.is_busy():
+                time.sleep(0.2)
+
+            with self._lock:
+                if epoch != self._epoch:
+                    continue
+                manager = self._manager
+                need = min(self.size - len(self._pools.get(key, ())), self.batch_size)
+            if need <= 0:
+                with self._lock:
+                    self._pending.discard(key)
+                continue
+
+            side, topic = key
+            debater = manager.left_debater if side == Side.LEFT else manager.right_debater
+            try:
+                texts = self.submit(debater.generate_candidates, DebateState(current_topic=topic, is_active=True),
+                                    None, need, cost=self.candidate_tokens * need)
+            except Exception as e:
+                print(f"⚠ 첫 발언 사전 생성 실패 ({side.value}, {topic}): {e}")
+                texts = []
+
+            with self._lock:
+                if epoch == self._epoch:
+                    self._pools[key].extend(texts)
+                    self._pending.discard(key)
+                    if texts and len(self._pools[key]) < self.size:
+                        self._request(key)  # 배치 크기만큼씩 나눠 채움
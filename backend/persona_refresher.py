@@ -0,0 +1,163 @@
+"""
+페르소나 백그라운드 갱신
+페르소나를 만든 뒤에도 댓글이 계속 들어오면, 측별로 (댓글 증가량, 키워드 분포 이동)을 보고
+기준을 넘었을 때만 저우선순위 스레드에서 페르소나를 다시 만들어 한 번에 교체합니다.
+
+- 대화형 생성(토론 턴)이 대기 중이면 시작을 미루고, 생성 자체도 스케줄러에 낮은 가중치로 제출
+- 새 페르소나는 다 만든 뒤 한 번에 저장 → 토론 턴은 막히지 않고 다음 턴부터 새 페르소나를 씀
+- 생성 중에 수동 재생성 / 초기화가 있었으면 결과를 버림 (저장소의 compare-and-set)
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+SIDES = ("left", "right")
+
+# 갱신 기준: 새 댓글이 최소 이만큼 쌓이고, (증가율 또는 키워드 이동) 중 하나를 넘으면
+REFRESH_MIN_NEW_COMMENTS = int(os.getenv("COLORWAR_PERSONA_REFRESH_MIN_NEW", "20"))
+REFRESH_GROWTH = float(os.getenv("COLORWAR_PERSONA_REFRESH_GROWTH", "0.5"))
+REFRESH_KEYWORD_DRIFT = float(os.getenv("COLORWAR_PERSONA_REFRESH_DRIFT", "0.3"))
+
+
+class PersonaRefresher:
+    """댓글 풀 변화 감시 + 저우선순위 페르소나 재생성 스레드"""
+
+    def __init__(self, engine, is_busy: Optional[Callable[[], bool]] = None,
+                 on_refresh: Optional[Callable[[str, Dict], None]] = None, interval: float = 30.0,
+                 submit: Optional[Callable[..., Any]] = None,
+                 min_new_comments: int = REFRESH_MIN_NEW_COMMENTS, growth: float = REFRESH_GROWTH,
+                 keyword_drift: float = REFRESH_KEYWORD_DRIFT):
+        """
+        Args:
+            engine: CommentPersonaEngine
+            is_busy: True를 반환하는 동안 재생성을 미룸 (대화형 요청 우선)
+            on_refresh: 교체 직후 호출 (side, 새 페르소나) — 이전 페르소나로 만든 첫 발언 폐기 등
+            interval: 변화 확인 주기 (초), 댓글이 들어오면 notify()로 바로 확인
+            submit: submit(fn, *args) → fn(*args) 결과, 생성을 스케줄러를 거쳐 실행 (없으면 이 스레드에서 바로)
+            min_new_comments / growth / keyword_drift: 갱신 기준
+        """
+        self.engine = engine
+        self.is_busy = is_busy or (lambda: False)
+        self.on_refresh = on_refresh
+        self.interval = interval
+        self.submit = submit or (lambda fn, *args: fn(*args))
+        self.min_new_comments = min_new_comments
+        self.growth = growth
+        self.keyword_drift = keyword_drift
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._refreshing: Optional[str] = None
+        self.refreshes = {side: 0 for side in SIDES}
+        self.discarded = 0
+        self.last_reason: Dict[str, str] = {}
+
+    # ==========================================================
+    # 공개 API
+    # ==========================================================
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="persona-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def notify(self):
+        """댓글이 추가됐을 때 호출 (다음 확인을 앞당김)"""
+        self._wakeup.set()
+
+    def refresh_reason(self, drift: Optional[Dict]) -> Optional[str]:
+        """갱신 기준을 넘었으면 사유 문자열"""
+        if drift is None or drift["new_comments"] < self.min_new_comments:
+            return None
+        if drift["growth"] >= self.growth:
+            return f"댓글 {drift['new_comments']}개 증가 ({drift['growth']:.0%})"
+        if drift["keyword_drift"] >= self.keyword_drift:
+            return f"키워드 분포 이동 {drift['keyword_drift']:.2f}"
+        return None
+
+    def check(self) -> Dict[str, Optional[str]]:
+        """측별 갱신 필요 여부 확인 후 필요한 쪽을 재생성 (스레드 밖에서 직접 호출해도 됨)"""
+        results = {}
+        for side in SIDES:
+            reason = self.refresh_reason(self.engine.persona_drift(side))
+            results[side] = reason
+            if reason:
+                self._refresh(side, reason)
+        return results
+
+    @property
+    def refreshing(self) -> Optional[str]:
+        """지금 다시 만드는 중인 측 (없으면 None)"""
+        return self._refreshing
+
+    def stats(self) -> Dict:
+        drift = {}
+        for side in SIDES:
+            try:
+                drift[side] = self.engine.persona_drift(side)
+            except Exception:
+                drift[side] = None
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "refreshing": self._refreshing,
+            "refreshes": dict(self.refreshes),
+            "discarded": self.discarded,
+            "last_reason": dict(self.last_reason),
+            "thresholds": {"min_new_comments": self.min_new_comments, "growth": self.growth,
+                           "keyword_drift": self.keyword_drift},
+            "drift": drift,
+        }
+
+    # ==========================================================
+    # 내부 구현
+    # ==========================================================
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=self.interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠ 페르소나 갱신 확인 실패: {e}")
+
+    def _refresh(self, side: str, reason: str):
+        while self.is_busy() and not self._stop.is_set():
+            time.sleep(0.2)
+
+        current = self.engine.get_persona(side)
+        built_at = ((current or {}).get("basis") or {}).get("built_at")
+        if built_at is None:
+            return  # 그 사이 초기화됨
+        side_name = "좌파" if side == "left" else "우파"
+        print(f"🔄 {side_name} 페르소나 백그라운드 갱신 시작: {reason}")
+
+        self._refreshing = side
+        try:
+            persona = self.submit(self.engine.build_persona_via_llm, side)
+        except Exception as e:
+            print(f"⚠ {side_name} 페르소나 갱신 생성 실패: {e}")
+            persona = None
+        finally:
+            self._refreshing = None
+        if persona is None or "basis" not in persona:
+            print(f"⚠ {side_name} 페르소나 갱신 실패 → 기존 페르소나 유지")
+            return
+
+        # 생성하는 동안 수동 재생성 / 초기화가 있었으면 버림 (확인과 교체를 저장소에서 한 번에)
+        if not self.engine.store.replace_persona(side, persona, built_at):
+            self.discarded += 1
+            print(f"↩ {side_name} 페르소나 갱신 결과 폐기 (그 사이 페르소나가 바뀜)")
+            return
+
+        self.refreshes[side] += 1
+        self.last_reason[side] = reason
+        print(f"✅ {side_name} 페르소나 교체 완료 (댓글 {persona['basis']['comments']}개 기준)")
+        if self.on_refresh is not None:
+            self.on_refresh(side, persona)
@@ -0,0 +1,398 @@
+"""
+요청 단위 프로파일링 (관리자 전용, 재시작 없이 켜고 끔)
+느린 턴에서 시간이 프롬프트 조립 / 토크나이즈 / generate / 상태 직렬화 중 어디에 쓰이는지 운영 중에 바로 잡기 위한 도구입니다.
+
+    POST /api/admin/profile?count=3&mode=cprofile   (X-Admin-Token 헤더)
+    → 경로가 맞는 다음 요청 3개를 프로파일링해 COLORWAR_PROFILE_DIR 에 저장
+
+요청 하나당 파일
+- {id}.collapsed   : 접힌 스택 (flamegraph.pl / speedscope 에 바로 넣을 수 있음, 단위 µs)
+- {id}.trace.json  : Chrome trace (chrome://tracing / Perfetto) — 요청 / 생성 작업 / 구간(span) 타임라인
+- {id}.pstats      : cProfile 원본 (python -m pstats)
+- {id}.jobN.torch.json : mode=torch 일 때 생성 작업의 torch 연산 타임라인 (Chrome trace)
+
+측정 범위
+- 이벤트 루프 스레드: 요청 처리 전체 (검증 / 세션 로드·저장 / 응답 직렬화). 같은 시간에 처리된 다른 요청도 섞일 수 있음
+  루프의 cProfile은 한 번에 하나만 켬 (3.11은 나중에 켠 프로파일이 앞의 것을 덮어씀)
+  → 이미 측정 중일 때 들어온 요청은 구간 시간만 기록하고 loop_timing_only 로 표시
+- 생성 스레드: profiled()로 감싼 작업 (스케줄러가 요청의 contextvars 를 이어받아 실행)
+켜 둔 요청 수만큼만 동작하고 나머지 요청은 ContextVar 조회 한 번 외에 비용이 없습니다.
+프로세스 단위로 동작하므로 uvicorn --workers N 이면 요청을 받은 워커에서만 캡처됩니다.
+"""
+import asyncio
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "torch")
+DEFAULT_PROFILE_DIR = Path(os.getenv("COLORWAR_CACHE_DIR", Path.home() / ".cache" / "color_war")) / "profiles"
+# 한 번에 켤 수 있는 최대 요청 수 (실수로 큰 값을 넣어 운영 성능이 계속 떨어지는 것 방지)
+MAX_PROFILE_REQUESTS = 50
+# 접힌 스택에서 버릴 깊이 / 시간 (µs)
+MAX_STACK_DEPTH = 64
+MIN_STACK_MICROS = 1
+
+_current: ContextVar[Optional["Capture"]] = ContextVar("colorwar_profile_capture", default=None)
+
+
+# ==========================================================
+# 캡처 (요청 하나)
+# ==========================================================
+class Capture:
+    """프로파일링 중인 요청 하나의 측정 결과"""
+
+    def __init__(self, capture_id: str, mode: str, path: str, output_dir: Path):
+        self.id = capture_id
+        self.mode = mode
+        self.path = path
+        self.output_dir = output_dir
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[Tuple[str, int, float, float, Dict]] = []  # (이름, 스레드, 시작, 끝, 부가정보)
+        self.profiles: List[Tuple[str, cProfile.Profile]] = []      # (스레드 라벨, 프로파일)
+        self.torch_jobs = 0
+        self.files: List[str] = []
+        self.loop_thread: Optional[int] = None  # 요청을 받은 이벤트 루프 스레드 (trace 스레드 이름용)
+        self.loop_timing_only = False  # 루프 cProfile을 못 켬 (다른 요청이 측정 중) → 구간 시간만
+
+    def _record(self, name: str, start: float, end: float, args: Optional[Dict] = None):
+        with self._lock:
+            self.spans.append((name, threading.get_ident(), start, end, args or {}))
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    def run_job(self, label: str, fn: Callable, *args):
+        """
+        생성 스레드에서 fn(*args)을 프로파일러 아래에서 실행
+        torch 모드도 Python 호출은 cProfile로 잡고 (접힌 스택용), torch 프로파일러는 연산 타임라인만 기록
+        (with_stack 파이썬 추적은 한 턴에 수십 초 / 수백 MB라 운영 중 캡처에 쓸 수 없음)
+        """
+        start = time.perf_counter()
+        try:
+            if self.mode == "torch":
+                return self._run_torch(label, fn, *args)
+            return self._run_cprofile(label, fn, *args)
+        finally:
+            self._record(label, start, time.perf_counter())
+
+    def _run_cprofile(self, label: str, fn: Callable, *args):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Python 3.12+: 다른 프로파일러가 이미 켜져 있음 → 구간 시간만 기록
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                self.profiles.append((label, profile))
+
+    def _run_torch(self, label: str, fn: Callable, *args):
+        from torch.profiler import ProfilerActivity, profile
+
+        with self._lock:
+            job = self.torch_jobs
+            self.torch_jobs += 1
+        with profile(activities=[ProfilerActivity.CPU]) as prof:
+            result = self._run_cprofile(label, fn, *args)
+        base = self.output_dir / f"{self.id}.job{job}"
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            prof.export_chrome_trace(f"{base}.torch.json")
+            with self._lock:
+                self.files.append(f"{base.name}.torch.json")
+        except Exception as e:  # 저장 실패로 생성 결과를 버리지 않음
+            print(f"⚠ torch 프로파일 저장 실패 ({self.id}): {e}")
+        return result
+
+    # ------------------------------------------------------
+    # 저장
+    # ------------------------------------------------------
+    def write(self) -> List[str]:
+        """결과 파일 저장 후 파일 이름 목록 반환"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / self.id
+        with self._lock:
+            profiles = list(self.profiles)
+            spans = list(self.spans)
+
+        profiles = [(label, profile) for label, profile in profiles if profile.getstats()]
+        stats = [(label, pstats.Stats(profile)) for label, profile in profiles]
+
+        if stats:
+            merged = pstats.Stats(*[profile for _, profile in profiles])
+            merged.dump_stats(f"{base}.pstats")
+            with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+                for label, s in stats:
+                    for stack, micros in collapse_stats(s.stats):
+                        f.write(f"{label};{stack} {micros}\n")
+            self.files += [f"{self.id}.pstats", f"{self.id}.collapsed"]
+
+        with open(f"{base}.trace.json", "w", encoding="utf-8") as f:
+            json.dump(self._chrome_trace(spans, stats), f, ensure_ascii=False)
+        self.files.append(f"{self.id}.trace.json")
+        return self.files
+
+    def _chrome_trace(self, spans, stats) -> Dict:
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for name, thread, start, end, args in spans:
+            tid = tids.setdefault(thread, len(tids) + 1)
+            events.append({
+                "name": name, "ph": "X", "pid": pid, "tid": tid,
+                "ts": round((start - self.started) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                "args": args,
+            })
+        for thread, tid in tids.items():
+            label = "event-loop" if thread == self.loop_thread else f"thread-{thread}"
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": label}})
+        # 스레드별 누적 시간 상위 함수 (cProfile은 타임스탬프가 없으므로 요약만)
+        summary = {label: top_functions(s.stats) for label, s in stats}
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"path": self.path, "mode": self.mode, "loop_timing_only": self.loop_timing_only,
+                              "top_functions": summary}}
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":  # 내장 함수
+        return name.replace(";", ":")
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+
+def collapse_stats(stats: Dict) -> List[Tuple[str, int]]:
+    """
+    cProfile 호출 그래프 → 접힌 스택 ("a;b;c µs")
+    cProfile은 호출자-피호출자 쌍만 기록하므로, 함수의 자체 시간을 호출 경로별 누적 시간 비율로 나눠 근사합니다.
+    """
+    callees: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, edge_ct) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_ct))
+    roots = [func for func, (_, _, _, _, callers) in stats.items()
+             if not any(c in stats for c in callers)]
+
+    lines: Dict[str, float] = {}
+
+    def visit(func, stack: List[str], scale: float, seen: frozenset):
+        _, _, tt, ct, _ = stats[func]
+        path = stack + [_label(func)]
+        key = ";".join(path)
+        lines[key] = lines.get(key, 0.0) + tt * scale
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for child, edge_ct in callees.get(func, ()):
+            child_ct = stats[child][3]
+            if child in seen or child_ct <= 0:
+                continue
+            child_scale = scale * edge_ct / child_ct
+            if edge_ct * scale * 1e6 < MIN_STACK_MICROS:
+                continue
+            visit(child, path, child_scale, seen | {child})
+
+    for root in roots:
+        visit(root, [], 1.0, frozenset([root]))
+    return [(stack, int(seconds * 1e6)) for stack, seconds in lines.items() if seconds * 1e6 >= MIN_STACK_MICROS]
+
+
+def top_functions(stats: Dict, limit: int = 15) -> List[Dict]:
+    rows = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:limit]
+    return [{"function": _label(func), "calls": nc, "self_ms": round(tt * 1000, 2), "cumulative_ms": round(ct * 1000, 2)}
+            for func, (_, nc, tt, ct, _) in rows]
+
+
+# ==========================================================
+# 프로파일러 (켜기 / 끄기 / 요청 배정)
+# ==========================================================
+class RequestProfiler:
+    """다음 N개 요청 프로파일링 관리"""
+
+    def __init__(self, output_dir: Optional[Path] = None, admin_token: Optional[str] = None):
+        """
+        Args:
+            output_dir: 결과 저장 디렉토리 (기본: COLORWAR_PROFILE_DIR 또는 ~/.cache/color_war/profiles)
+            admin_token: 관리자 토큰 (기본: COLORWAR_ADMIN_TOKEN, 없으면 관리자 기능 꺼짐)
+        """
+        self.output_dir = Path(output_dir or os.getenv("COLORWAR_PROFILE_DIR", DEFAULT_PROFILE_DIR))
+        self.admin_token = admin_token if admin_token is not None else os.getenv("COLORWAR_ADMIN_TOKEN", "")
+        self._lock = threading.Lock()
+        self.mode = "cprofile"
+        self.path_prefix = "/api/debate/"
+        self.remaining = 0
+        self.active = 0
+        self.loop_profile: Optional[cProfile.Profile] = None  # 이벤트 루프에서 켜져 있는 요청 프로파일
+        self._sequence = 0
+        self.captures: List[Dict] = []  # 최근 결과 (최신이 뒤)
+
+    # --- 관리 ---
+    @property
+    def enabled(self) -> bool:
+        return bool(self.admin_token)
+
+    def check_token(self, token: Optional[str]) -> bool:
+        return self.enabled and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def arm(self, count: int, mode: str = "cprofile", path_prefix: str = "/api/debate/") -> Dict:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"알 수 없는 프로파일링 방식: {mode} (선택: {', '.join(PROFILE_MODES)})")
+        if not 1 <= count <= MAX_PROFILE_REQUESTS:
+            raise ValueError(f"count는 1 ~ {MAX_PROFILE_REQUESTS} 사이여야 합니다.")
+        with self._lock:
+            self.mode = mode
+            self.path_prefix = path_prefix
+            self.remaining = count
+        print(f"🔬 프로파일링 켜짐: 다음 {count}개 요청 ({path_prefix}*, {mode}) → {self.output_dir}")
+        return self.status()
+
+    def disarm(self) -> Dict:
+        with self._lock:
+            self.remaining = 0
+        return self.status()
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "path_prefix": self.path_prefix,
+            "remaining": self.remaining,
+            "active": self.active,
+            "output_dir": str(self.output_dir),
+            "captures": self.captures[-20:],
+        }
+
+    # --- 요청 배정 ---
+    def claim(self, path: str) -> Optional[Capture]:
+        if not self.remaining or not path.startswith(self.path_prefix):
+            return None
+        with self._lock:
+            if not self.remaining:
+                return None
+            self.remaining -= 1
+            self.active += 1
+            self._sequence += 1
+            slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+            capture_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{self._sequence:03d}-{slug}"
+        return Capture(capture_id, self.mode, path, self.output_dir)
+
+    def start_loop_profile(self) -> Optional[cProfile.Profile]:
+        """이벤트 루프 스레드의 cProfile 켜기 — 이미 다른 요청이 측정 중이거나 켤 수 없으면 None"""
+        with self._lock:
+            if self.loop_profile is not None:
+                return None
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # Python 3.12+: 다른 프로파일러가 이미 켜져 있음
+                return None
+            self.loop_profile = profile
+            return profile
+
+    def stop_loop_profile(self, profile: cProfile.Profile):
+        with self._lock:
+            profile.disable()
+            if self.loop_profile is profile:
+                self.loop_profile = None
+
+    def finish(self, capture: Capture, elapsed: float, status: Optional[int]):
+        try:
+            files = capture.write()
+        except Exception as e:  # 저장 실패가 응답/서버에 영향 주지 않도록
+            print(f"⚠ 프로파일 저장 실패 ({capture.id}): {e}")
+            files = []
+        finally:
+            with self._lock:
+                self.active -= 1
+        with self._lock:
+            self.captures.append({"id": capture.id, "path": capture.path, "mode": capture.mode,
+                                  "status": status, "elapsed_ms": round(elapsed * 1000, 1),
+                                  "loop_timing_only": capture.loop_timing_only, "files": files})
+            del self.captures[:-100]
+        note = ", 루프는 구간 시간만" if capture.loop_timing_only else ""
+        print(f"🔬 프로파일 저장: {capture.id} ({elapsed * 1000:.0f}ms, 파일 {len(files)}개{note})")
+
+
+# ==========================================================
+# 코드에서 쓰는 진입점 (프로파일링 중이 아니면 바로 통과)
+# ==========================================================
+def profiled(fn: Callable, label: Optional[str] = None) -> Callable:
+    """생성 스레드에서 실행될 작업을 감쌈 — 현재 요청이 프로파일링 중일 때만 측정"""
+    label = label or getattr(fn, "__name__", "job")
+
+    def wrapper(*args):
+        capture = _current.get()
+        if capture is None:
+            return fn(*args)
+        return capture.run_job(label, fn, *args)
+
+    return wrapper
+
+
+@contextmanager
+def span(name: str):
+    """Chrome trace에 남길 구간 (프롬프트 조립 / 생성 / 직렬화 등)"""
+    capture = _current.get()
+    if capture is None:
+        yield
+        return
+    with capture.span(name):
+        yield
+
+
+class ProfilingMiddleware:
+    """ASGI 미들웨어 — 켜져 있을 때 경로가 맞는 요청을 이벤트 루프 스레드에서 cProfile로 측정"""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        capture = self.profiler.claim(scope["path"])
+        if capture is None:
+            return await self.app(scope, receive, send)
+
+        capture.loop_thread = threading.get_ident()
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _current.set(capture)
+        profile = self.profiler.start_loop_profile()
+        capture.loop_timing_only = profile is None
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profile is not None:
+                self.profiler.stop_loop_profile(profile)
+                with capture._lock:
+                    capture.profiles.append(("event-loop", profile))
+            elapsed = time.perf_counter() - start
+            capture._record(f"{scope['method']} {scope['path']}", start, start + elapsed,
+                            {"query": scope.get("query_string", b"").decode("latin-1")})
+            _current.reset(token)
+            # 파일 쓰기 (접힌 스택 계산 포함)는 이벤트 루프 밖에서
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.profiler.finish, capture, elapsed, status.get("code")
+            )
@@ -0,0 +1,85 @@
+"""
+토론 응답 캐시 (선택 사항)
+프롬프트 + 샘플링 파라미터가 완전히 같은 요청은 미리 뽑아둔 후보들을 돌려가며 반환해
+첫 턴처럼 자주 반복되는 문맥을 모델 호출 없이 처리합니다.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class _Entry:
+    __slots__ = ("candidates", "cursor")
+
+    def __init__(self, candidates: List[str]):
+        self.candidates = candidates
+        self.cursor = 0
+
+    def next(self) -> str:
+        text = self.candidates[self.cursor % len(self.candidates)]
+        self.cursor += 1
+        return text
+
+
+class ResponseCache:
+    """키당 후보 여러 개를 저장하는 LRU 캐시 (스레드 안전)"""
+
+    def __init__(self, max_entries: int = 1024, candidates_per_key: int = 4):
+        """
+        Args:
+            max_entries: 최대 키 수 (초과 시 가장 오래 안 쓴 키부터 제거)
+            candidates_per_key: 캐시 미스 때 한 번에 생성해 둘 후보 수
+        """
+        self.max_entries = max_entries
+        self.candidates_per_key = candidates_per_key
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(prompt: str, params: Dict) -> str:
+        payload = json.dumps({"prompt": prompt, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """저장된 후보 중 다음 차례 반환 (없으면 None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.next()
+
+    def put(self, key: str, candidates: List[str]):
+        if not candidates:
+            return
+        with self._lock:
+            entry = _Entry(list(candidates))
+            entry.cursor = 1  # 첫 후보는 방금 미스 요청에 반환됨
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "candidates_per_key": self.candidates_per_key,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
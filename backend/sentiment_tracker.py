@@ -1,18 +1,44 @@
 """
 감정 추적 및 주제 전환 시스템
 토론 진행에 따라 감정 레벨을 추적하고 주제를 자동으로 전환합니다.
+
+발언마다 감정 강도 사전(intensity_lexicon)으로 점수를 매기고 측별 이동 평균(EMA)을 갱신합니다. (LLM 호출 없음)
+- 주제 전환: 양측 평균이 과열되거나, 한참 동안 밋밋하거나, 한 주제가 너무 길어지면
+- 토론 종료: 양측 모두 과열 / 양측 모두 수긍 (최소 발언 수 이후) 또는 최대 발언 수 도달
 """
 import random
-from typing import List, Optional
+from typing import List, Optional, Sequence
+from intensity_lexicon import IntensityScorer, default_scorer
 from models import DebateState, DebateMessage, Side, AnalysisResult
 
+# 주제당 발언 수 (최소: 이보다 짧으면 전환 안 함 / 최대: 이 이상이면 무조건 전환)
+MIN_TOPIC_MESSAGES = 4
+MAX_TOPIC_MESSAGES = 12
+# 양측 평균 강도가 이 이상이면 주제를 돌려 식힘, 양측 모두 절댓값이 이 미만이면 밋밋한 것으로 보고 전환
+TOPIC_HEAT_LEVEL = 0.45
+TOPIC_STALE_LEVEL = 0.05
+# 토론 종료 (최소 발언 수 이후 양측 모두 과열 / 모두 수긍, 또는 최대 발언 수)
+MIN_DEBATE_MESSAGES = 20
+MAX_DEBATE_MESSAGES = 80
+END_HEAT_LEVEL = 0.7
+END_AGREEMENT_LEVEL = -0.3
+
 
 class SentimentTracker:
     """감정 추적 및 주제 전환 관리 클래스"""
     
-    def __init__(self, analysis: AnalysisResult):
+    def __init__(self, analysis: AnalysisResult, rng: Optional[random.Random] = None,
+                 scorer: Optional[IntensityScorer] = None):
+        """
+        Args:
+            analysis: 분석 결과
+            rng: 세션 RNG (시드 고정 시 다음 주제 선택이 재현됨)
+            scorer: 감정 강도 채점기 (없으면 프로세스 공용 사전)
+        """
         self.analysis = analysis
-        self.base_escalation_rate = 0.5  # 기본 감정 상승률
+        self.rng = rng or random.Random()
+        self.scorer = scorer or default_scorer()
+        self.base_escalation_rate = 0.35  # 새 발언이 이동 평균에 반영되는 비율
         self.controversial_keywords = analysis.controversial_keywords
         self.available_topics = self._extract_topics()
     
@@ -33,7 +59,7 @@ class SentimentTracker:
         # 논쟁적 키워드 추가
         topics.extend(self.controversial_keywords[:5])
         
-        return list(set(topics))  # 중복 제거
+        return list(dict.fromkeys(topics))  # 중복 제거 (순서 유지 → 시드 재현 가능)
     
     
     def should_change_topic(self, state: DebateState) -> bool:
@@ -46,22 +72,30 @@ class SentimentTracker:
         Returns:
             bool: 주제 전환 필요 여부
         """
-        # 8-12개 메시지마다 랜덤하게 주제 전환
-        if state.message_count > 0 and state.message_count % random.randint(8, 12) == 0:
+        on_topic = state.message_count - state.topic_started_at
+        if on_topic < MIN_TOPIC_MESSAGES:
+            return False
+        if on_topic >= MAX_TOPIC_MESSAGES:
             return True
-        
-        return False
+
+        left, right = self._levels(state)
+        if (left + right) / 2 >= TOPIC_HEAT_LEVEL:
+            return True
+        # 밋밋한 주제는 최소 길이의 두 배까지만
+        return on_topic >= MIN_TOPIC_MESSAGES * 2 and max(abs(left), abs(right)) < TOPIC_STALE_LEVEL
     
-    def get_next_topic(self, state: DebateState) -> str:
+    def get_next_topic(self, state: DebateState, rng: Optional[random.Random] = None) -> str:
         """
         다음 토론 주제를 선택합니다.
         
         Args:
             state: 현재 토론 상태
+            rng: 이번 턴 RNG (없으면 트래커 RNG)
             
         Returns:
             str: 새로운 주제
         """
+        rng = rng or self.rng
         # 아직 다루지 않은 주제들
         unused_topics = [
             topic for topic in self.available_topics
@@ -70,10 +104,10 @@ class SentimentTracker:
         
         # 사용 가능한 주제가 있으면 선택
         if unused_topics:
-            return random.choice(unused_topics)
+            return rng.choice(unused_topics)
         
         # 모든 주제를 다뤘으면 재사용
-        return random.choice(self.available_topics) if self.available_topics else "일반 정치 이슈"
+        return rng.choice(self.available_topics) if self.available_topics else "일반 정치 이슈"
     
     def initialize_topic(self) -> str:
         """초기 토론 주제 설정"""
@@ -81,33 +115,69 @@ class SentimentTracker:
             return self.available_topics[0]
         return "정치 현안"
     
+    # ------------------------------------------------------
+    # 감정 강도
+    # ------------------------------------------------------
+    def score_texts(self, texts: Sequence[str]) -> List[float]:
+        """문장들의 감정 강도 (한 번의 배치 채점)"""
+        return [round(float(x), 4) for x in self.scorer.score_many(texts)]
+
+    def _levels(self, state: DebateState):
+        return state.escalation.get(Side.LEFT.value, 0.0), state.escalation.get(Side.RIGHT.value, 0.0)
+
+    def _blend(self, state: DebateState, side: Side, intensity: float):
+        """측별 이동 평균 갱신 (발언당 O(1))"""
+        rate = self.base_escalation_rate
+        level = state.escalation.get(side.value, 0.0)
+        state.escalation[side.value] = round((1 - rate) * level + rate * intensity, 4)
+
+    def backfill(self, state: DebateState):
+        """점수 없는 과거 메시지 (이전 버전에서 저장된 세션)를 한 번에 채점하고 이동 평균을 다시 계산"""
+        missing = [m for m in state.messages if m.intensity is None]
+        if not missing:
+            return
+        for message, intensity in zip(missing, self.score_texts([m.content for m in missing])):
+            message.intensity = intensity
+        state.escalation = {Side.LEFT.value: 0.0, Side.RIGHT.value: 0.0}
+        for message in state.messages:
+            self._blend(state, message.side, message.intensity)
+
     def update_state_after_message(
         self, 
         state: DebateState, 
-        message: DebateMessage
+        message: DebateMessage,
+        rng: Optional[random.Random] = None
     ) -> DebateState:
         """
         메시지 발송 후 상태를 업데이트합니다.
         
         Args:
             state: 현재 상태
-            message: 방금 발송된 메시지
+            message: 방금 발송된 메시지 (intensity가 비어 있으면 여기서 채점)
+            rng: 이번 턴 RNG (주제 전환 시 다음 주제 선택)
             
         Returns:
             DebateState: 업데이트된 상태
         """
         # 메시지 히스토리에 추가
+        if message.intensity is None:
+            message.intensity = self.score_texts([message.content])[0]
         state.messages.append(message)
+        self._blend(state, message.side, message.intensity)
         
-        # 주제 전환 확인
+        # 주제 전환 확인 (방금 메시지까지는 이전 주제로 기록, 다음 발언부터 새 주제)
         if self.should_change_topic(state):
-            new_topic = self.get_next_topic(state)
+            new_topic = self.get_next_topic(state, rng)
             if new_topic != state.current_topic:
                 state.topics_covered.append(state.current_topic)
                 state.current_topic = new_topic
-        
-        # 메시지에 현재 주제 반영
-        message.current_topic = state.current_topic
+            state.topic_started_at = state.message_count
+
+        # 종료 확인
+        end_reason = self.end_reason(state)
+        if end_reason:
+            state.is_active = False
+            state.end_reason = end_reason
         
         return state
     
@@ -121,10 +191,19 @@ class SentimentTracker:
         Returns:
             bool: 종료 여부
         """
-        # 50-80개 댓글 후 종료
-        max_messages = random.randint(50, 80)
-        if state.message_count >= max_messages:
-            return True
-        
-        return False
+        return self.end_reason(state) is not None
+
+    def end_reason(self, state: DebateState) -> Optional[str]:
+        """종료 사유 (overheated | agreement | max_messages), 계속하면 None"""
+        if state.message_count >= MAX_DEBATE_MESSAGES:
+            return "max_messages"
+        if state.message_count < MIN_DEBATE_MESSAGES:
+            return None
+
+        left, right = self._levels(state)
+        if min(left, right) >= END_HEAT_LEVEL:
+            return "overheated"
+        if max(left, right) <= END_AGREEMENT_LEVEL:
+            return "agreement"
+        return None
 
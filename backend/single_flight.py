@@ -0,0 +1,77 @@
+"""
+중복 요청 합치기 (single-flight)
+같은 (세션, 작업, 입력 지문) 요청이 처리 중일 때 다시 들어오면 새로 생성하지 않고
+처리 중인 작업의 결과를 함께 기다립니다. (더블클릭 / 재시도로 같은 LLM 작업이 두 번 도는 것 방지)
+
+이벤트 루프 하나 안에서만 합치므로 워커 프로세스마다 따로 동작합니다.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+FlightKey = Tuple[str, str, str]  # (세션, 작업, 입력 지문)
+
+
+def fingerprint(*parts) -> str:
+    """입력값들의 짧은 해시 (JSON으로 못 바꾸는 값은 str)"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class _OpStats:
+    __slots__ = ("leaders", "coalesced", "failures")
+
+    def __init__(self):
+        self.leaders = 0     # 실제로 실행된 요청
+        self.coalesced = 0   # 실행 중인 요청에 합쳐진 요청
+        self.failures = 0    # 예외로 끝난 실행 (합쳐진 요청도 같은 예외를 받음)
+
+
+class SingleFlight:
+    """키별 실행 중 작업 공유 (asyncio 전용)"""
+
+    def __init__(self):
+        self._inflight: Dict[FlightKey, asyncio.Task] = {}
+        self._stats: Dict[str, _OpStats] = {}
+
+    async def run(self, key: FlightKey, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        key로 실행 중인 작업이 있으면 그 결과를, 없으면 fn()을 실행해 결과를 반환
+        먼저 온 요청이 끊겨도 (클라이언트 연결 종료) 작업은 끝까지 실행되어 나머지 요청이 결과를 받습니다.
+        """
+        stats = self._stats.setdefault(key[1], _OpStats())
+        task = self._inflight.get(key)
+        if task is not None:
+            stats.coalesced += 1
+            return await asyncio.shield(task)
+
+        stats.leaders += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t, stats))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: FlightKey, task: asyncio.Task, stats: _OpStats):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:  # exception() 호출로 "미확인 예외" 경고도 방지
+            stats.failures += 1
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict:
+        leaders = sum(s.leaders for s in self._stats.values())
+        coalesced = sum(s.coalesced for s in self._stats.values())
+        return {
+            "in_flight": self.in_flight(),
+            "executed": leaders,
+            "coalesced": coalesced,
+            "coalesced_ratio": round(coalesced / (leaders + coalesced), 4) if leaders + coalesced else 0.0,
+            "operations": {
+                op: {"executed": s.leaders, "coalesced": s.coalesced, "failures": s.failures}
+                for op, s in self._stats.items()
+            },
+        }
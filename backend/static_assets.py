@@ -0,0 +1,186 @@
+"""
+프론트엔드 정적 파일 메모리 제공
+서버 시작 시 frontend/ 파일을 한 번 읽어 내용 해시 파일명 + gzip/brotli 압축본을 미리 만들어 두고,
+요청마다 디스크 접근 / 압축 없이 메모리에서 바로 응답합니다.
+
+- /static/app.<해시>.js : 내용이 바뀌면 이름도 바뀌므로 1년 immutable 캐시
+- / (index.html), /static/app.js : no-cache + ETag (변경 없으면 304)
+- Accept-Encoding 에 따라 br > gzip > 원본 (압축본이 더 작을 때만)
+"""
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성 — 없으면 gzip만 제공
+    brotli = None
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+HASH_LENGTH = 10
+# 이보다 작은 파일은 압축 이득보다 헤더 비용이 큼
+MIN_COMPRESS_BYTES = 256
+
+
+class _Variant:
+    """한 가지 인코딩의 응답 본문 + ETag"""
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+class StaticAsset:
+    def __init__(self, name: str, body: bytes, media_type: str):
+        self.name = name
+        self.media_type = media_type
+        digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+        stem, dot, suffix = name.rpartition(".")
+        self.hashed_name = f"{stem}.{digest}.{suffix}" if dot else f"{name}.{digest}"
+        self.variants: Dict[str, _Variant] = {"identity": _Variant(body, f'"{digest}"')}
+
+        if len(body) >= MIN_COMPRESS_BYTES and _compressible(media_type):
+            compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed["br"] = brotli.compress(body, quality=11)
+            for encoding, data in compressed.items():
+                if len(data) < len(body):
+                    self.variants[encoding] = _Variant(data, f'"{digest}-{encoding}"')
+
+    def select(self, accept_encoding: str) -> str:
+        """Accept-Encoding 에 맞는 인코딩 이름 (br > gzip > identity)"""
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return "identity"
+
+    def sizes(self) -> Dict[str, int]:
+        return {encoding: len(v.body) for encoding, v in self.variants.items()}
+
+
+def _compressible(media_type: str) -> bool:
+    media_type = media_type.split(";")[0]
+    return media_type.startswith("text/") or media_type in ("application/javascript", "application/json", "image/svg+xml")
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    """'gzip, br;q=0.5' → {"gzip": 1.0, "br": 0.5}"""
+    accepted = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return any(t == etag or t == "W/" + etag for t in candidates)
+
+
+class StaticAssetBundle:
+    """frontend/ 디렉토리를 메모리에 올린 정적 파일 묶음"""
+
+    def __init__(self, directory, index_name: str = "index.html", url_prefix: str = "/static/"):
+        """
+        Args:
+            directory: 프론트엔드 디렉토리
+            index_name: 루트(/)로 제공할 HTML (참조 경로를 해시 파일명으로 바꿔서 제공)
+            url_prefix: 정적 파일 URL 접두어
+        """
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix
+        self.index: Optional[StaticAsset] = None
+        self._assets: Dict[str, StaticAsset] = {}   # 원래 이름 / 해시 이름 → 자산
+        self._immutable: set = set()                 # 해시 이름들
+
+        files = sorted(p for p in self.directory.rglob("*") if p.is_file())
+        for path in files:
+            name = path.relative_to(self.directory).as_posix()
+            if name == index_name:
+                continue
+            asset = StaticAsset(name, path.read_bytes(), _media_type(name))
+            self._assets[name] = asset
+            self._assets[asset.hashed_name] = asset
+            self._immutable.add(asset.hashed_name)
+
+        index_path = self.directory / index_name
+        if index_path.exists():
+            html = index_path.read_text(encoding="utf-8")
+            self.index = StaticAsset(index_name, self._rewrite_refs(html).encode("utf-8"), "text/html; charset=utf-8")
+            # /static/index.html 로도 접근 가능 (StaticFiles 시절과 동일)
+            self._assets[index_name] = self.index
+
+    def _rewrite_refs(self, html: str) -> str:
+        """/static/app.js → /static/app.<해시>.js"""
+        for name in sorted(self._source_names(), key=len, reverse=True):
+            asset = self._assets[name]
+            html = re.sub(
+                r'(["\'])' + re.escape(self.url_prefix + name) + r'(["\'?#])',
+                lambda m: m.group(1) + self.url_prefix + asset.hashed_name + m.group(2),
+                html,
+            )
+        return html
+
+    def _source_names(self) -> List[str]:
+        return [name for name, asset in self._assets.items() if name == asset.name]
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        return self._assets.get(name)
+
+    def respond(self, asset: StaticAsset, request_name: str, accept_encoding: str,
+                if_none_match: Optional[str], head: bool = False):
+        """(status, body, headers) — 프레임워크 응답 객체 생성은 호출자 몫"""
+        encoding = asset.select(accept_encoding)
+        variant = asset.variants[encoding]
+        headers = {
+            "Content-Type": asset.media_type,
+            "ETag": variant.etag,
+            "Cache-Control": IMMUTABLE_CACHE if request_name in self._immutable else REVALIDATE_CACHE,
+        }
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if _etag_matches(if_none_match, variant.etag):
+            return 304, b"", headers
+        headers["Content-Length"] = str(len(variant.body))
+        return 200, b"" if head else variant.body, headers
+
+    def stats(self) -> Dict:
+        return {
+            "brotli": brotli is not None,
+            "assets": {
+                asset.name: {"hashed_name": asset.hashed_name, "bytes": asset.sizes()}
+                for name, asset in self._assets.items() if name == asset.name
+            },
+        }
+
+
+def _media_type(name: str) -> str:
+    media_type, _ = mimetypes.guess_type(name)
+    if media_type is None:
+        return "application/octet-stream"
+    if media_type == "text/javascript":
+        media_type = "application/javascript"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        return f"{media_type}; charset=utf-8"
+    return media_type
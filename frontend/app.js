@@ -4,10 +4,16 @@
 
 const API_BASE = window.location.origin;
 
+// 탭마다 별도 토론 세션 (서버가 세션 간 공정하게 생성 순서를 배분)
+const SESSION_ID = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : `s-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+const SESSION_QUERY = `session_id=${encodeURIComponent(SESSION_ID)}`;
+
 // 전역 상태
 let debateState = null;
 let autoMode = false;
 let autoInterval = null;
+let renderedCount = 0; // 화면에 그린 토론 메시지 수 (응답 / 푸시 중복 방지)
+let lastStatsKey = null;
 
 // DOM 요소
 const elements = {
@@ -55,23 +61,71 @@ function setupEventListeners() {
     elements.restartBtn.addEventListener('click', handleRestart);
 }
 
-// 서버 상태 확인
+// 서버 상태 표시
+function showServerStatus(status) {
+    elements.serverStatus.innerHTML = `
+        ✓ 서버 연결됨 | 
+        ${status.device === 'cuda' ? '🎮 GPU' : '💻 CPU'} 모드 | 
+        페르소나: ${status.persona_ready ? '✓ 준비됨' : '⏳ 대기중'}${status.persona_refreshing ? ' (🔄 갱신 중)' : ''}
+    `;
+    elements.serverStatus.className = 'server-status online';
+}
+
+function showServerOffline() {
+    elements.serverStatus.innerHTML = '✗ 서버 연결 실패 - backend/main.py를 실행하세요';
+    elements.serverStatus.className = 'server-status offline';
+}
+
+// 서버 상태 구독 (SSE) — 바뀔 때만 서버가 보내줌, 끊기면 브라우저가 자동 재연결
+function subscribeServerEvents() {
+    if (!window.EventSource) {
+        // 구형 브라우저: 폴링
+        checkServerStatus();
+        setInterval(checkServerStatus, 10000);
+        return;
+    }
+    const source = new EventSource(`${API_BASE}/api/events?${SESSION_QUERY}`);
+    source.addEventListener('status', (event) => {
+        const status = JSON.parse(event.data);
+        showServerStatus(status);
+        updateStatsDisplay({
+            left_count: status.left_count,
+            right_count: status.right_count,
+            persona_ready: status.comments_ready
+        });
+    });
+    source.addEventListener('debate', (event) => handleDebateEvent(JSON.parse(event.data)));
+    source.onerror = showServerOffline;
+}
+
+// 폴링 (EventSource 미지원 시)
 async function checkServerStatus() {
     try {
         const response = await fetch(`${API_BASE}/api/health`);
         const health = await response.json();
-        
-        elements.serverStatus.innerHTML = `
-            ✓ 서버 연결됨 | 
-            ${health.cuda_available ? '🎮 GPU' : '💻 CPU'} 모드 | 
-            페르소나: ${health.persona_ready ? '✓ 준비됨' : '⏳ 대기중'}
-        `;
-        elements.serverStatus.className = 'server-status online';
-        
-        updateStats();
+        showServerStatus(health);
+        updateStatsDisplay(health.persona_stats);
     } catch (error) {
-        elements.serverStatus.innerHTML = '✗ 서버 연결 실패 - backend/main.py를 실행하세요';
-        elements.serverStatus.className = 'server-status offline';
+        showServerOffline();
+    }
+}
+
+// 이 세션 토론 이벤트 (다른 탭 / 자동 진행 응답보다 먼저 도착한 경우 포함)
+// 이벤트에서 토론 상태 필드만 (type / message 등 이벤트 자체 필드는 상태에 섞지 않음)
+function debateFields(event) {
+    const { message_count, current_topic, is_active, end_reason } = event;
+    return { message_count, current_topic, is_active, end_reason };
+}
+
+function handleDebateEvent(event) {
+    if (event.type === 'message') {
+        applyDebateMessage(event.message, debateFields(event));
+        if (!event.is_active) {
+            handleDebateEnd();
+        }
+    } else if (event.type === 'ended' && debateState && debateState.is_active) {
+        debateState = { ...debateState, ...debateFields(event) };
+        handleDebateEnd();
     }
 }
 
@@ -117,18 +171,13 @@ async function submitComments(side) {
     }
 }
 
-// 통계 업데이트
-async function updateStats() {
-    try {
-        const response = await fetch(`${API_BASE}/api/comments/stats`);
-        const stats = await response.json();
-        updateStatsDisplay(stats);
-    } catch (error) {
-        console.error('통계 조회 실패:', error);
-    }
-}
-
 function updateStatsDisplay(stats) {
+    // 같은 내용이면 다시 그리지 않음 (스크롤 반복 방지)
+    const key = `${stats.left_count}/${stats.right_count}/${stats.persona_ready}`;
+    if (key === lastStatsKey) {
+        return;
+    }
+    lastStatsKey = key;
     elements.leftCount.textContent = stats.left_count;
     elements.rightCount.textContent = stats.right_count;
     
@@ -225,13 +274,17 @@ function displayAnalysisResult(result) {
 // 토론 시작
 async function startDebate() {
     try {
-        const response = await fetch(`${API_BASE}/api/debate/start`, {
+        // 페이지 주소의 ?speculative=ngram|model 을 그대로 전달 (추측 디코딩 세션)
+        const speculative = new URLSearchParams(window.location.search).get('speculative');
+        const query = speculative ? `${SESSION_QUERY}&speculative=${encodeURIComponent(speculative)}` : SESSION_QUERY;
+        const response = await fetch(`${API_BASE}/api/debate/start?${query}`, {
             method: 'POST'
         });
         
         if (response.ok) {
             const data = await response.json();
             debateState = data.state;
+            renderedCount = 0;
             
             elements.startDebateBtn.style.display = 'none';
             elements.pauseBtn.style.display = 'inline-block';
@@ -274,16 +327,13 @@ function stopAutoFight() {
 // 다음 메시지 생성
 async function generateNextMessage() {
     try {
-        const response = await fetch(`${API_BASE}/api/debate/next`, {
+        const response = await fetch(`${API_BASE}/api/debate/next?${SESSION_QUERY}`, {
             method: 'POST'
         });
         
         if (response.ok) {
             const data = await response.json();
-            debateState = data.state;
-            
-            addMessageToUI(data.message);
-            updateDebateUI();
+            applyDebateMessage(data.message, data.state);
             
             if (!debateState.is_active) {
                 handleDebateEnd();
@@ -294,6 +344,16 @@ async function generateNextMessage() {
     }
 }
 
+// 새 메시지만 그림 (message_count 기준)
+function applyDebateMessage(message, state) {
+    debateState = { ...(debateState || {}), ...state };
+    if (state.message_count > renderedCount) {
+        renderedCount = state.message_count;
+        addMessageToUI(message);
+    }
+    updateDebateUI();
+}
+
 function addMessageToUI(message) {
     // 첫 메시지인 경우 로딩 메시지 제거
     const loadingMsg = elements.debateMessages.querySelector('.info-message');
@@ -345,6 +405,9 @@ function handleStop() {
 
 function handleDebateEnd() {
     stopAutoFight();
+    if (elements.debateEndMessage.style.display === 'block') {
+        return;
+    }
     elements.totalMessages.textContent = debateState?.message_count || 0;
     elements.debateEndMessage.style.display = 'block';
     elements.pauseBtn.style.display = 'none';
@@ -355,7 +418,7 @@ async function handleRestart() {
     stopAutoFight();
     
     try {
-        await fetch(`${API_BASE}/api/debate/reset`, { method: 'POST' });
+        await fetch(`${API_BASE}/api/debate/reset?${SESSION_QUERY}`, { method: 'POST' });
         await fetch(`${API_BASE}/api/comments/reset`, { method: 'POST' });
         
         location.reload();
@@ -367,8 +430,7 @@ async function handleRestart() {
 // 페이지 로드 시 초기화
 document.addEventListener('DOMContentLoaded', () => {
     setupEventListeners();
-    checkServerStatus();
-    setInterval(checkServerStatus, 10000); // 10초마다 상태 확인
+    subscribeServerEvents(); // 상태는 서버가 바뀔 때만 푸시
     console.log('정치 댓글 AI 시뮬레이터 (로컬 LLM) 로드 완료');
 });
 
@@ -0,0 +1,207 @@
+"""
+비동기 부하 테스트 스크립트
+여러 사용자가 동시에 전체 흐름(댓글 제출 → 페르소나 생성 → 토론 시작 → 다음 발언 N회)을
+진행하는 상황을 흉내 내고 엔드포인트별 지연 시간 분포와 오류율을 출력합니다.
+
+사용 예:
+    # 실행 중인 서버 대상
+    python load_test.py --users 20 --arrival-rate 2 --turns 5
+
+    # 서버 없이 프로세스 내 앱 + 스텁 모델로 실행
+    python load_test.py --offline --users 50 --arrival-rate 20
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+BASE_URL = "http://localhost:8000"
+
+LEFT_COMMENTS = [
+    "진보적 개혁이 필요합니다",
+    "복지 예산을 대폭 늘려야 해요",
+    "평등한 사회를 만들어야 합니다",
+    "인권을 최우선으로 생각해야 합니다",
+    "환경 보호가 시급합니다",
+    "노동자의 권리를 보장해야 합니다",
+    "재벌 개혁이 필요합니다",
+]
+RIGHT_COMMENTS = [
+    "경제 성장이 최우선입니다",
+    "안보가 가장 중요합니다",
+    "재정 건전성을 지켜야 합니다",
+    "전통적 가치를 존중해야 합니다",
+    "자유 시장 경제를 유지해야 합니다",
+    "법과 질서가 중요합니다",
+    "국가 안전이 우선입니다",
+]
+
+
+class Recorder:
+    """엔드포인트별 (지연 시간, 성공 여부) 기록"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, method: str, path: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            ok = response.status_code < 400
+            if not ok:
+                self.errors[path][str(response.status_code)] += 1
+        except httpx.HTTPError as e:
+            response = None
+            ok = False
+            self.errors[path][type(e).__name__] += 1
+        self.samples[path].append((time.perf_counter() - started, ok))
+        return response
+
+
+def make_comments(base: List[str], user: int, count: int) -> List[str]:
+    # 중복 제거 필터에 전부 걸리지 않도록 사용자마다 조금씩 다른 댓글
+    return [f"{base[i % len(base)]} ({user}번 시청자 {i + 1}번째 의견)" for i in range(count)]
+
+
+async def user_flow(client: httpx.AsyncClient, recorder: Recorder, user: int, args):
+    await recorder.call(client, "POST", "/api/comments/left",
+                        json={"comments": make_comments(LEFT_COMMENTS, user, args.comments)})
+    await recorder.call(client, "POST", "/api/comments/right",
+                        json={"comments": make_comments(RIGHT_COMMENTS, user, args.comments)})
+
+    if random.random() < args.persona_ratio:
+        await recorder.call(client, "POST", "/api/comments/generate-persona")
+
+    session_id = f"load-{user}-{uuid.uuid4().hex[:8]}"
+    response = await recorder.call(client, "POST", "/api/debate/start", params={"session_id": session_id})
+    if response is None or response.status_code >= 400:
+        return
+
+    for _ in range(args.turns):
+        response = await recorder.call(client, "POST", "/api/debate/next", params={"session_id": session_id})
+        if response is None or response.status_code >= 400:
+            break
+        if args.think_time:
+            await asyncio.sleep(random.expovariate(1.0 / args.think_time))
+
+    await recorder.call(client, "POST", "/api/debate/reset", params={"session_id": session_id})
+
+
+async def run(client: httpx.AsyncClient, args) -> Tuple[Recorder, float]:
+    # 첫 사용자가 오기 전에 페르소나를 한 번 만들어 둠 (토론 시작 전제 조건, 통계 제외)
+    await user_flow(client, Recorder(), 0, argparse.Namespace(**{**vars(args), "turns": 0, "persona_ratio": 1.0}))
+
+    recorder = Recorder()
+    tasks = []
+    started = time.perf_counter()
+    for user in range(1, args.users + 1):
+        tasks.append(asyncio.create_task(user_flow(client, recorder, user, args)))
+        if args.arrival_rate > 0:
+            # 포아송 도착: 도착 간격 ~ 지수분포
+            await asyncio.sleep(random.expovariate(args.arrival_rate))
+    await asyncio.gather(*tasks)
+    return recorder, time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def print_histogram(latencies: List[float], bins: int = 10, width: int = 40):
+    low, high = latencies[0], latencies[-1]
+    step = (high - low) / bins or 1e-9
+    counts = [0] * bins
+    for value in latencies:
+        counts[min(bins - 1, int((value - low) / step))] += 1
+    peak = max(counts)
+    for i, count in enumerate(counts):
+        bar = "█" * round(width * count / peak) if peak else ""
+        print(f"    {(low + i * step) * 1000:9.1f}ms | {bar} {count}")
+
+
+def report(recorder: Recorder, elapsed: float):
+    print(f"\n{'=' * 60}")
+    print("  부하 테스트 결과")
+    print(f"{'=' * 60}")
+
+    total = sum(len(s) for s in recorder.samples.values())
+    print(f"총 요청: {total}개 / {elapsed:.2f}초 ({total / elapsed if elapsed else 0:.1f} req/s)")
+
+    for path, samples in recorder.samples.items():
+        latencies = sorted(latency for latency, _ in samples)
+        failed = sum(1 for _, ok in samples if not ok)
+        print(f"\n▶ {path}")
+        print(f"  요청 {len(samples)}개 | 오류율 {failed / len(samples) * 100:.1f}%"
+              + (f" {dict(recorder.errors[path])}" if failed else ""))
+        print("  p50 {:.1f}ms | p90 {:.1f}ms | p99 {:.1f}ms | max {:.1f}ms".format(
+            *(percentile(latencies, q) * 1000 for q in (0.5, 0.9, 0.99, 1.0))
+        ))
+        print_histogram(latencies)
+
+
+def load_offline_app():
+    """스텁 모델로 백엔드 앱을 프로세스 안에서 띄움"""
+    os.environ.setdefault("COLORWAR_LLM_BACKEND", "stub")
+    os.environ.setdefault("COLORWAR_INFERENCE_WORKERS", "0")
+    root = Path(__file__).parent
+    sys.path.insert(0, str(root / "backend"))
+    sys.path.insert(0, str(root))
+    import main
+    return main.app
+
+
+async def amain(args):
+    if args.offline:
+        app = load_offline_app()
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://colorwar.local"
+    else:
+        transport = None
+        base_url = args.base_url
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with contextlib.AsyncExitStack() as stack:
+        if args.offline:
+            # ASGITransport는 lifespan을 보내지 않으므로 startup/shutdown을 직접 실행 (서버와 같은 상태로 측정)
+            await stack.enter_async_context(app.router.lifespan_context(app))
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(base_url=base_url, transport=transport, timeout=args.timeout, limits=limits)
+        )
+        recorder, elapsed = await run(client, args)
+    report(recorder, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="정치 댓글 전쟁 시뮬레이터 비동기 부하 테스트")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--offline", action="store_true", help="서버 없이 프로세스 내 앱 + 스텁 모델로 실행")
+    parser.add_argument("--users", type=int, default=20, help="동시 사용자 수")
+    parser.add_argument("--arrival-rate", type=float, default=5.0, help="초당 사용자 도착률 (0이면 한꺼번에)")
+    parser.add_argument("--turns", type=int, default=5, help="사용자당 다음 발언 요청 수")
+    parser.add_argument("--comments", type=int, default=7, help="사용자당 진영별 댓글 수")
+    parser.add_argument("--persona-ratio", type=float, default=0.1, help="페르소나 재생성을 요청하는 사용자 비율")
+    parser.add_argument("--think-time", type=float, default=0.0, help="턴 사이 평균 대기 시간(초)")
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(amain(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+댓글 중복 제거 (MinHash + LSH)
+복붙/살짝 수정된 스팸 댓글을 수집 단계에서 걸러냅니다.
+문자 n-gram(shingle) 기반이라 한국어 띄어쓰기/조사 변형에도 강합니다.
+"""
+
+import hashlib
+import random
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+
+def _shingles(text: str, k: int) -> Set[bytes]:
+    """문자 k-gram 집합 (짧은 댓글은 전체 문자열 하나)"""
+    if len(text) <= k:
+        return {text.encode("utf-8")}
+    return {text[i:i + k].encode("utf-8") for i in range(len(text) - k + 1)}
+
+
+def _hash32(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=4).digest(), "little")
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """임계값 (1/b)^(1/r) 에 가장 가까운 (밴드 수, 밴드당 행 수) 선택"""
+    best, best_err = (num_perm, 1), float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+class NearDuplicateFilter:
+    """MinHash 시그니처 + LSH 밴드 인덱스 기반 근사 중복 필터"""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            threshold: 추정 Jaccard 유사도가 이 값 이상이면 중복으로 판단
+            num_perm: MinHash 순열 개수 (클수록 정확, 느림)
+            shingle_size: 문자 n-gram 길이
+        """
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"threshold는 (0, 1] 범위여야 합니다: {threshold}")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        self.reset()
+
+    def reset(self):
+        self._exact: Set[str] = set()
+        self._signatures: List[Tuple[int, ...]] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(self.bands)]
+        self.seen_count = 0
+        self.duplicate_count = 0
+
+    # ==========================================================
+    # MinHash
+    # ==========================================================
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [_hash32(s) for s in _shingles(_normalize(text), self.shingle_size)]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, sig: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows]
+
+    @staticmethod
+    def _similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+    # ==========================================================
+    # 필터링
+    # ==========================================================
+    def is_duplicate(self, text: str, sig: Optional[Tuple[int, ...]] = None) -> bool:
+        if _normalize(text) in self._exact:
+            return True
+        sig = sig or self.signature(text)
+        checked: Set[int] = set()
+        for band, key in self._band_keys(sig):
+            for idx in self._buckets[band].get(key, ()):
+                if idx in checked:
+                    continue
+                checked.add(idx)
+                if self._similarity(sig, self._signatures[idx]) >= self.threshold:
+                    return True
+        return False
+
+    def add(self, text: str) -> bool:
+        """새 댓글이면 인덱스에 추가하고 True, 중복이면 False"""
+        self.seen_count += 1
+        sig = self.signature(text)
+        if self.is_duplicate(text, sig):
+            self.duplicate_count += 1
+            return False
+
+        self._index(text, sig)
+        return True
+
+    def remember(self, comments: List[str]):
+        """이미 걸러진 댓글을 통계 없이 인덱스에만 추가 (다른 워커가 저장한 댓글 동기화)"""
+        for text in comments:
+            self._index(text, self.signature(text))
+
+    def _index(self, text: str, sig: Tuple[int, ...]):
+        idx = len(self._signatures)
+        self._signatures.append(sig)
+        self._exact.add(_normalize(text))
+        for band, key in self._band_keys(sig):
+            self._buckets[band].setdefault(key, []).append(idx)
+
+    def filter(self, comments: List[str]) -> List[str]:
+        return [c for c in comments if self.add(c)]
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.duplicate_count / self.seen_count if self.seen_count else 0.0
@@ -5,32 +5,74 @@ skt/kogpt2-base-v2 기반, CPU 전용, 메모리 안전 모드 + JSON 파싱 보
 """
 
 from typing import List, Dict, Optional
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-import torch, json, re
+import json, re, random, threading, time
 from collections import Counter
 
+from model.comment_dedup import NearDuplicateFilter
+from model.comment_sampler import sample_representative
+from model.generation import generate, derive_seed
+from model.llm_loader import DEFAULT_MODEL_ID, load_text_generation, default_backend
+from model.prompt_budget import PromptBuilder, TokenCounter, context_length
+from model.state_store import InMemoryStateStore, StateStore
+
+# 페르소나 프롬프트에 넣을 대표 댓글 수 / 토큰 예산
+PERSONA_SAMPLE_SIZE = 15
+PERSONA_SAMPLE_TOKEN_BUDGET = 400
+PERSONA_MAX_NEW_TOKENS = 300
+# 페르소나 기준 시점 키워드 분포 (상위 N개) — 이후 댓글 변화(키워드 이동) 측정용
+BASIS_TOP_KEYWORDS = 30
+
+
+def extract_keywords(text: str) -> List[str]:
+    """한글 2글자 이상 단어"""
+    return [w for w in re.findall(r'[가-힣]+', text) if len(w) >= 2]
+
+
+def keyword_drift(basis: Dict[str, float], current: Dict[str, float]) -> float:
+    """두 키워드 분포(비율)의 총변동 거리 (0: 같음 ~ 1: 완전히 다름)"""
+    return 0.5 * sum(abs(basis.get(w, 0.0) - current.get(w, 0.0)) for w in set(basis) | set(current))
+
 
 class CommentPersonaEngine:
     """댓글 기반 페르소나 학습 엔진 (CPU 경량 버전)"""
 
-    def __init__(self):
+    def __init__(self, dedup_threshold: Optional[float] = 0.8, backend: Optional[str] = None, governor=None,
+                 store: Optional[StateStore] = None):
+        """
+        Args:
+            dedup_threshold: 근사 중복 판정 유사도 (None이면 중복 제거 안 함)
+            backend: 추론 백엔드 "torch" | "onnx" | "tiny" | "stub" (None이면 COLORWAR_LLM_BACKEND)
+            governor: 메모리 예산 관리자 (선택, 주어지면 유휴 시 모델이 오프로드될 수 있음)
+            store: 댓글 풀 / 페르소나 저장소 (없으면 프로세스 내부, 여러 워커면 RedisStateStore)
+        """
         # ---------------------------------------
-        # 기본 상태 초기화
+        # 기본 상태 초기화 (댓글/페르소나는 저장소에)
         # ---------------------------------------
-        self.left_comments: List[str] = []
-        self.right_comments: List[str] = []
-        self.left_persona: Optional[Dict] = None
-        self.right_persona: Optional[Dict] = None
+        self.store = store or InMemoryStateStore()
+
+        # ✅ 수집 단계 근사 중복 제거 (MinHash/LSH)
+        # 인덱스는 워커마다 따로 두고, 추가 전에 저장소에서 다른 워커가 넣은 댓글만큼 따라잡음
+        self.left_dedup = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+        self.right_dedup = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+        self._dedup_synced = {"left": 0, "right": 0}
+        self._pool_epoch = self.store.pool_epoch()
+
+        # 측별 누적 키워드 빈도 (추가분만 반영, 페르소나 이후 변화 측정용)
+        self._keyword_lock = threading.Lock()
+        self._keywords = {"left": Counter(), "right": Counter()}
+        self._keywords_synced = {"left": 0, "right": 0}
 
         # ---------------------------------------
         # ✅ CPU 전용 경량 모델 설정
         # ---------------------------------------
-        model_id = "skt/kogpt2-base-v2"  # ✅ 공개 + 경량 + 한국어 지원
-        print(f"🚀 페르소나 생성 LLM 로딩 중: {model_id}...")
+        model_id = DEFAULT_MODEL_ID  # ✅ 공개 + 경량 + 한국어 지원
+        self.backend = backend or default_backend()
+        self.governor = governor
+        print(f"🚀 페르소나 생성 LLM 로딩 중: {model_id} (백엔드: {self.backend})...")
 
         self.device = "cpu"
         self.device_map = None
-        self.dtype = torch.float32
+        self.dtype = "float32"
 
         print(f"디바이스: {self.device.upper()} (경량 CPU 모드)")
 
@@ -38,44 +80,155 @@ class CommentPersonaEngine:
         # ✅ 모델 및 토크나이저 로드 (안전)
         # ---------------------------------------
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(model_id)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_id,
-                torch_dtype=self.dtype,
-                device_map=self.device_map,
-                low_cpu_mem_usage=True
-            ).to(self.device)
-
-            self.llm = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device=-1  # ✅ CPU 강제
-            )
+            self.model, self.tokenizer, self.llm = load_text_generation(model_id, self.backend, governor)
+            if governor is not None:
+                self.model = None  # 가중치 참조는 관리자만 보유 (오프로드 시 실제로 해제되도록)
 
             print("✓ 페르소나 생성 LLM 로딩 완료! (CPU 경량 모드)\n")
 
         except Exception as e:
             print(f"❌ 모델 로딩 실패: {e}")
-            self.model, self.llm = None, None
+            self.model, self.tokenizer, self.llm = None, None, None
+
+        # 댓글/발언별 토큰 수 캐시 (추가 시점에 배치로 계산, 프롬프트 조립 시 재사용)
+        self.token_counter = TokenCounter(self.tokenizer)
 
     # ==========================================================
     # 댓글 수집
     # ==========================================================
-    def add_left_comments(self, comments: List[str]):
-        valid = [c.strip() for c in comments if c.strip()]
-        self.left_comments.extend(valid)
-        print(f"좌파 댓글 {len(valid)}개 추가 (총 {len(self.left_comments)}개)")
+    def add_left_comments(self, comments: List[str]) -> int:
+        return self._add_comments("left", comments)
 
-    def add_right_comments(self, comments: List[str]):
+    def add_right_comments(self, comments: List[str]) -> int:
+        return self._add_comments("right", comments)
+
+    def _add_comments(self, side: str, comments: List[str]) -> int:
+        """중복을 걸러 저장소에 추가하고 총 개수 반환"""
         valid = [c.strip() for c in comments if c.strip()]
-        self.right_comments.extend(valid)
-        print(f"우파 댓글 {len(valid)}개 추가 (총 {len(self.right_comments)}개)")
+        dedup = self._sync_dedup(side)
+        unique = dedup.filter(valid) if dedup else valid
+        self.token_counter.count_many(unique)
+        total = self.store.append_comments(side, unique)
+        if total == self._dedup_synced[side] + len(unique):
+            self._dedup_synced[side] = total  # 그 사이 다른 워커가 넣은 게 없으면 다음 동기화 생략
+        self.store.incr_counter("seen", len(valid))
+        self.store.incr_counter("duplicates", len(valid) - len(unique))
+
+        side_name = "좌파" if side == "left" else "우파"
+        print(f"{side_name} 댓글 {len(unique)}개 추가, 중복 {len(valid) - len(unique)}개 제외 (총 {total}개)")
+        return total
+
+    def _sync_dedup(self, side: str) -> Optional[NearDuplicateFilter]:
+        """다른 워커가 저장소에 넣은 댓글을 로컬 중복 인덱스에 반영 (초기화되었으면 인덱스도 비움)"""
+        epoch = self.store.pool_epoch()
+        if epoch != self._pool_epoch:
+            self._reset_dedup()
+            self._pool_epoch = epoch
+        dedup = self.left_dedup if side == "left" else self.right_dedup
+        if dedup is not None:
+            missing = self.store.get_comments(side, start=self._dedup_synced[side])
+            dedup.remember(missing)
+            self._dedup_synced[side] += len(missing)
+        return dedup
+
+    def _reset_dedup(self):
+        for f in (self.left_dedup, self.right_dedup):
+            if f:
+                f.reset()
+        self._dedup_synced = {"left": 0, "right": 0}
+        with self._keyword_lock:
+            self._keywords = {"left": Counter(), "right": Counter()}
+            self._keywords_synced = {"left": 0, "right": 0}
+
+    # ==========================================================
+    # 키워드 통계 / 페르소나 이후 변화
+    # ==========================================================
+    def _sync_keywords(self, side: str) -> int:
+        """저장소에 새로 들어온 댓글만 키워드 빈도에 반영하고 반영된 댓글 수 반환"""
+        epoch = self.store.pool_epoch()
+        if epoch != self._pool_epoch:
+            self._reset_dedup()
+            self._pool_epoch = epoch
+        with self._keyword_lock:
+            new = self.store.get_comments(side, start=self._keywords_synced[side])
+            counter = self._keywords[side]
+            for comment in new:
+                counter.update(extract_keywords(comment))
+            self._keywords_synced[side] += len(new)
+            return self._keywords_synced[side]
+
+    def keyword_shares(self, side: str, top: int = BASIS_TOP_KEYWORDS) -> Dict[str, float]:
+        """상위 키워드 비율 (상위 top개 합 = 1)"""
+        self._sync_keywords(side)
+        with self._keyword_lock:
+            common = self._keywords[side].most_common(top)
+        total = sum(n for _, n in common)
+        return {w: round(n / total, 5) for w, n in common} if total else {}
+
+    def persona_basis(self, side: str) -> Dict:
+        """페르소나를 만든 시점의 댓글 수 / 키워드 분포"""
+        count = self._sync_keywords(side)
+        return {"comments": count, "keywords": self.keyword_shares(side), "built_at": time.time()}
+
+    def persona_drift(self, side: str) -> Optional[Dict]:
+        """현재 페르소나 이후 댓글 풀 변화 (페르소나가 없거나 기준 정보가 없으면 None)"""
+        persona = self.get_persona(side)
+        basis = persona.get("basis") if persona else None
+        if not basis:
+            return None
+        count = self._sync_keywords(side)
+        new = max(0, count - basis["comments"])
+        return {
+            "comments": count,
+            "new_comments": new,
+            "growth": round(new / max(1, basis["comments"]), 4),
+            "keyword_drift": round(keyword_drift(basis["keywords"], self.keyword_shares(side)), 4),
+            "built_at": basis.get("built_at"),
+        }
+
+    @property
+    def left_comments(self) -> List[str]:
+        return self.store.get_comments("left")
+
+    @property
+    def right_comments(self) -> List[str]:
+        return self.store.get_comments("right")
+
+    @property
+    def left_persona(self) -> Optional[Dict]:
+        return self.store.get_persona("left")
+
+    @left_persona.setter
+    def left_persona(self, persona: Optional[Dict]):
+        self.store.set_persona("left", persona)
+
+    @property
+    def right_persona(self) -> Optional[Dict]:
+        return self.store.get_persona("right")
+
+    @right_persona.setter
+    def right_persona(self, persona: Optional[Dict]):
+        self.store.set_persona("right", persona)
+
+    def comment_count(self, side: str) -> int:
+        return self.store.count_comments(side)
 
     # ==========================================================
     # LLM 기반 페르소나 생성
     # ==========================================================
-    def generate_persona_via_llm(self, side: str) -> Optional[Dict]:
+    def generate_persona_via_llm(self, side: str, rng: Optional[random.Random] = None) -> Optional[Dict]:
+        """rng가 있으면 샘플링/생성 시드를 고정해 같은 페르소나를 재현"""
+        persona = self.build_persona_via_llm(side, rng)
+        if persona is not None and "basis" in persona:
+            self.store.set_persona(side, persona)
+        return persona
+
+    def build_persona_via_llm(self, side: str, rng: Optional[random.Random] = None) -> Optional[Dict]:
+        """
+        페르소나를 생성만 하고 저장하지 않음 (백그라운드 갱신이 다 만든 뒤 한 번에 교체할 수 있도록)
+        LLM 생성/파싱에 성공하면 기준 정보(basis)가 붙고, 예외로 실패하면 basis 없는 기본 페르소나
+        """
+        basis = self.persona_basis(side)
         comments = self.left_comments if side == "left" else self.right_comments
         if not comments or len(comments) < 5:
             print(f"[{side}] 댓글 부족: {len(comments)}개")
@@ -86,31 +239,39 @@ class CommentPersonaEngine:
         print(f"🤖 {side_name} 페르소나 생성 시작... (댓글 {len(comments)}개)")
         print(f"{'='*60}\n")
 
-        prompt = f"""다음은 {side_name} 성향의 정치 뉴스 댓글입니다.
+        # 지시문/출력 예시는 항상 온전히, 댓글은 남은 예산 안에서만
+        prompt = (
+            PromptBuilder(self.token_counter, context_length(self.llm) - PERSONA_MAX_NEW_TOKENS)
+            .text(f"""다음은 {side_name} 성향의 정치 뉴스 댓글입니다.
 말투, 감정, 가치관을 분석해 JSON으로 요약하세요.
 
 댓글:
-{chr(10).join(comments[:15])}
-
+""")
+            .items(self.sample_comments(side, seed=derive_seed(rng) or 0), budget=PERSONA_SAMPLE_TOKEN_BUDGET)
+            .text("""
 JSON 형식으로만, 다른 문장 없이 정확한 JSON만 출력하세요.
 출력 예시:
-{{
+{
   "summary": "한 문장 요약",
   "values": ["핵심가치1", "핵심가치2"],
   "tone": ["말투특징1", "말투특징2"],
   "emotion": "감정스타일",
   "keywords": ["키워드1", "키워드2", "키워드3"],
   "quote_examples": ["예시1", "예시2"]
-}}"""
+}""")
+            .build()
+        )
 
         try:
             if not self.llm:
                 raise RuntimeError("LLM이 초기화되지 않았습니다.")
 
             print("⏳ LLM 처리 중...")
-            result = self.llm(
+            result = generate(
+                self.llm,
                 prompt,
-                max_new_tokens=300,
+                seed=derive_seed(rng),
+                max_new_tokens=PERSONA_MAX_NEW_TOKENS,
                 temperature=0.7,
                 do_sample=True,
                 pad_token_id=self.tokenizer.eos_token_id
@@ -135,16 +296,24 @@ JSON 형식으로만, 다른 문장 없이 정확한 JSON만 출력하세요.
                         persona = self._create_default_persona(side, comments)
 
             print(f"✅ {side_name} 페르소나 생성 완료!")
-            if side == "left":
-                self.left_persona = persona
-            else:
-                self.right_persona = persona
+            persona["basis"] = basis
             return persona
 
         except Exception as e:
             print(f"❌ 페르소나 생성 실패: {e}")
             return self._create_default_persona(side, comments)
 
+    def sample_comments(self, side: str, seed: int = 0) -> List[str]:
+        """군집 기반 대표 댓글 샘플 (토큰 예산 내)"""
+        comments = self.left_comments if side == "left" else self.right_comments
+        return sample_representative(
+            comments,
+            k=PERSONA_SAMPLE_SIZE,
+            token_budget=PERSONA_SAMPLE_TOKEN_BUDGET,
+            count_tokens=self.token_counter.count,
+            seed=seed,
+        )
+
     # ==========================================================
     # 기본 페르소나 생성 (LLM 실패 시)
     # ==========================================================
@@ -168,14 +337,23 @@ JSON 형식으로만, 다른 문장 없이 정확한 JSON만 출력하세요.
     # ==========================================================
     def get_stats(self):
         return {
-            "left_count": len(self.left_comments),
-            "right_count": len(self.right_comments),
+            "left_count": self.comment_count("left"),
+            "right_count": self.comment_count("right"),
             "persona_ready": self.comments_ready(),
             "personas_generated": self.personas_generated(),
+            "duplicates_removed": self._duplicates_removed(),
+            "dedup_ratio": round(self._dedup_ratio(), 4),
         }
 
+    def _duplicates_removed(self) -> int:
+        return self.store.get_counter("duplicates")
+
+    def _dedup_ratio(self) -> float:
+        seen = self.store.get_counter("seen")
+        return self._duplicates_removed() / seen if seen else 0.0
+
     def comments_ready(self) -> bool:
-        return len(self.left_comments) >= 5 and len(self.right_comments) >= 5
+        return self.comment_count("left") >= 5 and self.comment_count("right") >= 5
 
     def personas_generated(self) -> bool:
         return self.left_persona is not None and self.right_persona is not None
@@ -208,6 +386,6 @@ JSON 형식으로만, 다른 문장 없이 정확한 JSON만 출력하세요.
         return prompt
 
     def reset(self):
-        self.left_comments, self.right_comments = [], []
-        self.left_persona, self.right_persona = None, None
+        self._pool_epoch = self.store.reset_pool()
+        self._reset_dedup()
         print("모든 댓글 및 페르소나 초기화 완료")
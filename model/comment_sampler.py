@@ -0,0 +1,115 @@
+"""
+대표 댓글 샘플링
+페르소나 프롬프트에 넣을 댓글을 "먼저 온 순서"가 아니라
+해시 n-gram 벡터 k-means 군집으로 골고루 뽑습니다. (댓글 수에 선형 시간)
+"""
+
+import random
+import zlib
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+def approx_token_count(text: str) -> int:
+    """토크나이저가 없을 때 쓰는 대략적인 토큰 수 (한국어 ≈ 2글자/토큰)"""
+    return len(text) // 2 + 1
+
+
+def reservoir_sample(items: List[str], k: int, rng: random.Random) -> List[str]:
+    """한 번의 순회로 k개 균등 추출 (Algorithm R)"""
+    reservoir = list(items[:k])
+    for i in range(k, len(items)):
+        j = rng.randint(0, i)
+        if j < k:
+            reservoir[j] = items[i]
+    return reservoir
+
+
+def hashed_ngram_vectors(texts: List[str], dim: int = 512, ngram_range=(2, 3)) -> np.ndarray:
+    """문자 n-gram 해싱 트릭 벡터 (L2 정규화)"""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        compact = "".join(text.split())
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            for i in range(len(compact) - n + 1):
+                vectors[row, zlib.crc32(compact[i:i + n].encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def kmeans(vectors: np.ndarray, k: int, rng: random.Random, iterations: int = 8) -> np.ndarray:
+    """k-means++ 초기화 + Lloyd 반복, 각 행의 군집 번호 반환"""
+    n = len(vectors)
+    centers = [vectors[rng.randrange(n)]]
+    closest = np.sum((vectors - centers[0]) ** 2, axis=1)
+    for _ in range(1, k):
+        total = float(closest.sum())
+        if total <= 0:
+            break
+        idx = int(np.searchsorted(np.cumsum(closest), rng.random() * total))
+        centers.append(vectors[min(idx, n - 1)])
+        closest = np.minimum(closest, np.sum((vectors - centers[-1]) ** 2, axis=1))
+    centroids = np.stack(centers)
+
+    labels = None
+    for _ in range(iterations):
+        # ||x - c||² 에서 행마다 같은 ||x||² 항은 생략
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * vectors @ centroids.T
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(len(centroids)):
+            members = vectors[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return labels
+
+
+def sample_representative(
+    comments: List[str],
+    k: int = 15,
+    token_budget: int = 400,
+    count_tokens: Optional[Callable[[str], int]] = None,
+    max_pool: int = 2000,
+    seed: int = 0,
+) -> List[str]:
+    """
+    군집별 대표 댓글을 큰 군집부터 골라 토큰 예산 안에서 반환합니다.
+
+    Args:
+        comments: 한 진영의 전체 댓글
+        k: 최대 샘플 수 (= 군집 수)
+        token_budget: 선택된 댓글들의 총 토큰 상한
+        count_tokens: 토큰 수 계산 함수 (없으면 근사치)
+        max_pool: 군집화 전 저장소 샘플링으로 줄일 최대 댓글 수
+        seed: 재현 가능한 샘플링용 시드
+    """
+    count_tokens = count_tokens or approx_token_count
+    if len(comments) <= k:
+        pool = list(comments)
+        picks = pool
+    else:
+        rng = random.Random(seed)
+        pool = reservoir_sample(comments, max_pool, rng) if len(comments) > max_pool else list(comments)
+        vectors = hashed_ngram_vectors(pool)
+        labels = kmeans(vectors, k, rng)
+
+        picks = []
+        clusters = sorted(set(labels.tolist()), key=lambda c: -int((labels == c).sum()))
+        for c in clusters:
+            members = np.flatnonzero(labels == c)
+            centroid = vectors[members].mean(axis=0)
+            best = members[int(np.argmax(vectors[members] @ centroid))]
+            picks.append(pool[best])
+
+    selected, used = [], 0
+    for text in picks:
+        tokens = count_tokens(text)
+        if used + tokens > token_budget:
+            continue
+        selected.append(text)
+        used += tokens
+    return selected
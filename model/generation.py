@@ -0,0 +1,76 @@
+"""
+LLM 생성 호출 헬퍼 (시드 재현 모드)
+시드가 주어지면 호출마다 별도 torch.Generator로 샘플링하므로
+같은 입력 + 같은 시드 → 토큰 단위로 같은 결과가 나옵니다.
+(torch 전역 RNG를 쓰지 않아 동시에 도는 시드 없는 생성의 영향을 받지 않음)
+"""
+
+import copy
+import random
+from typing import Optional
+
+
+def derive_seed(rng: Optional[random.Random]) -> Optional[int]:
+    """세션 RNG에서 이번 생성에 쓸 시드를 하나 뽑음 (RNG 없으면 None)"""
+    return rng.randrange(2 ** 32) if rng else None
+
+
+def generate(llm, prompt: str, seed: Optional[int] = None, **kwargs):
+    """
+    llm(prompt, **kwargs) 호출, seed가 있으면 재현 가능하게 실행
+    (워커 프로세스 풀처럼 supports_seed 인 백엔드는 시드를 그대로 전달)
+    """
+    if getattr(llm, "supports_seed", False):
+        return llm(prompt, seed=seed, **kwargs)
+    model = getattr(llm, "model", None)
+    if seed is None or model is None or not _sampling_config(model, kwargs).do_sample:
+        return llm(prompt, **kwargs)  # 시드 없음 / 스텁 / greedy → RNG 무관
+
+    from transformers import LogitsProcessorList
+
+    processors = LogitsProcessorList(kwargs.pop("logits_processor", None) or [])
+    processors.append(SeededSampler(seed, _sampling_config(model, kwargs)))
+    return llm(prompt, logits_processor=processors, **kwargs)
+
+
+def sampling_warpers(config):
+    """HF 샘플링과 같은 순서의 분포 변환 (temperature → top_k → top_p)"""
+    from transformers import LogitsProcessorList, TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper
+
+    warpers = LogitsProcessorList()
+    if config.temperature is not None and config.temperature != 1.0:
+        warpers.append(TemperatureLogitsWarper(config.temperature))
+    if config.top_k is not None and config.top_k != 0:
+        warpers.append(TopKLogitsWarper(top_k=config.top_k, min_tokens_to_keep=1))
+    if config.top_p is not None and config.top_p < 1.0:
+        warpers.append(TopPLogitsWarper(top_p=config.top_p, min_tokens_to_keep=1))
+    return warpers
+
+
+def _sampling_config(model, kwargs: dict):
+    """모델 generation_config 기본값 + 호출 옵션 (HF generate와 같은 병합)"""
+    config = copy.deepcopy(model.generation_config)
+    config.update(**{k: v for k, v in kwargs.items() if hasattr(config, k)})
+    return config
+
+
+class SeededSampler:
+    """
+    전용 Generator로 다음 토큰을 미리 뽑고 나머지를 -inf로 가리는 logits processor
+    HF는 사용자 processor 다음에 temperature / top_k / top_p 를 적용하므로 여기서 같은 변환을 먼저 적용해 뽑고,
+    남은 토큰이 하나뿐이라 이후 HF의 전역 RNG 샘플링 결과는 항상 그 토큰입니다. (분포는 HF 샘플링과 같음)
+    """
+
+    def __init__(self, seed: int, config):
+        import torch
+
+        self.generator = torch.Generator().manual_seed(seed)
+        self.warpers = sampling_warpers(config)
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        probs = torch.softmax(self.warpers(input_ids, scores).float(), dim=-1)
+        picked = torch.multinomial(probs.cpu(), 1, generator=self.generator).to(scores.device)
+        masked = torch.full_like(scores, float("-inf"))
+        return masked.scatter(-1, picked, 0.0)
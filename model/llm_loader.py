@@ -0,0 +1,124 @@
+"""
+생성 모델 로더
+페르소나 엔진 / 토론자 / 분석기가 모두 같은 방식으로 text-generation 파이프라인을 만들도록 모은 곳.
+반환되는 파이프라인은 llm(prompt, **kwargs)[i]["generated_text"] 형태로 호출합니다.
+
+백엔드 (COLORWAR_LLM_BACKEND):
+- torch: HF eager PyTorch (기본)
+- onnx : ONNX Runtime CPU 실행 (past-key-value 포함 ONNX로 1회 내보낸 뒤 디스크 캐시 재사용)
+- tiny : 무작위 초기화된 초소형 GPT-2 (CPU CI 벤치마크용, 모델 비용 없이 파이프라인 오버헤드 측정)
+- stub : 모델 없이 결정적 문장을 돌려주는 스텁 (테스트 / 부하 테스트용)
+
+torch / transformers는 실제로 모델을 올릴 때만 import 하므로 stub 백엔드는 즉시 기동됩니다.
+torch 모델을 올릴 때는 호스트별 스레드 보정 결과(model.thread_calibration)를 적용합니다.
+허브 저장소의 사용자 정의 모델 코드는 trust_remote_code=True 를 넘긴 호출(분석기)에서만 실행합니다.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+DEFAULT_MODEL_ID = "skt/kogpt2-base-v2"
+TINY_MODEL_ID = os.getenv("COLORWAR_TINY_MODEL", "hf-internal-testing/tiny-random-gpt2")
+BACKENDS = ("torch", "onnx", "tiny", "stub")
+CACHE_DIR = Path(os.getenv("COLORWAR_CACHE_DIR", Path.home() / ".cache" / "color_war"))
+
+
+def default_backend() -> str:
+    return os.getenv("COLORWAR_LLM_BACKEND", "torch")
+
+
+def _load_torch(model_id: str, low_memory: bool = False, quantize: Optional[str] = None,
+                trust_remote_code: bool = False):
+    if low_memory or quantize:
+        from model.mmap_weights import load_model_mmap, resolve_safetensors_dir
+        return load_model_mmap(resolve_safetensors_dir(model_id), quantize, trust_remote_code=trust_remote_code)
+
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    return AutoModelForCausalLM.from_pretrained(
+        model_id,
+        torch_dtype=torch.float32,
+        device_map=None,
+        low_cpu_mem_usage=True,
+        trust_remote_code=trust_remote_code
+    ).to("cpu")
+
+
+def _load_onnx(model_id: str, trust_remote_code: bool = False):
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise RuntimeError("ONNX 백엔드는 optimum[onnxruntime] 설치가 필요합니다.") from e
+
+    onnx_dir = CACHE_DIR / "onnx" / model_id.replace("/", "--")
+    if (onnx_dir / "model.onnx").exists():
+        return ORTModelForCausalLM.from_pretrained(onnx_dir, use_cache=True, provider="CPUExecutionProvider")
+
+    print(f"📦 ONNX 내보내기 (최초 1회): {model_id} → {onnx_dir}")
+    model = ORTModelForCausalLM.from_pretrained(model_id, export=True, use_cache=True, provider="CPUExecutionProvider",
+                                                trust_remote_code=trust_remote_code)
+    model.save_pretrained(onnx_dir)
+    return model
+
+
+def load_text_generation(model_id: str = DEFAULT_MODEL_ID, backend: Optional[str] = None, governor=None,
+                         low_memory: bool = False, quantize: Optional[str] = None,
+                         trust_remote_code: bool = False) -> Tuple:
+    """
+    (model, tokenizer, pipeline) 반환
+
+    Args:
+        model_id: HF 모델 ID
+        backend: "torch" | "onnx" | "tiny" | "stub" (None이면 COLORWAR_LLM_BACKEND, 기본 torch)
+        governor: 메모리 예산 관리자 (MemoryGovernor, 선택)
+                  주어지면 예산 안에서 로딩하고 같은 (모델, 백엔드)는 한 벌만 올려 공유
+        low_memory: torch/tiny 백엔드에서 safetensors를 mmap 해 복사 없이 로딩
+        quantize: "int8" | "int4" 로딩하면서 선형 계층 가중치 양자화 (low_memory 포함)
+        trust_remote_code: 모델 저장소의 사용자 정의 코드 실행 허용 (토크나이저 / 모델 모두)
+    """
+    backend = backend or default_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 백엔드: {backend} (선택: {', '.join(BACKENDS)})")
+
+    if backend == "tiny":
+        model_id = TINY_MODEL_ID
+    if backend == "stub":
+        model_id = "stub"  # 어떤 모델 ID로 불려도 같은 스텁 (크기 예측에 실제 모델 값이 쓰이지 않도록)
+
+    if governor is not None:
+        variant = f"{model_id}+{quantize}" if quantize else model_id
+        name = f"{variant}@{backend}" + ("+mmap" if low_memory and not quantize else "")
+        return governor.load(name, variant, lambda: load_text_generation(
+            model_id, backend, low_memory=low_memory, quantize=quantize, trust_remote_code=trust_remote_code
+        ))
+
+    if backend == "stub":
+        from model.stub_llm import StubTextGenerationPipeline
+        llm = StubTextGenerationPipeline()
+        return None, llm.tokenizer, llm
+
+    from transformers import AutoTokenizer, pipeline
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id, trust_remote_code=trust_remote_code)
+    if backend == "onnx":
+        model = _load_onnx(model_id, trust_remote_code)
+    else:
+        model = _load_torch(model_id, low_memory, quantize, trust_remote_code)
+    if backend != "onnx":
+        from model.thread_calibration import apply_calibration
+        apply_calibration(model_id, backend)
+    pipeline_kwargs = {}
+    if backend != "onnx":
+        # 후보 n개 생성 시 프롬프트 prefill 1회 공유
+        from model.shared_prefix import SharedPrefixTextGenerationPipeline
+        pipeline_kwargs["pipeline_class"] = SharedPrefixTextGenerationPipeline
+    llm = pipeline(
+        "text-generation",
+        model=model,
+        tokenizer=tokenizer,
+        device=-1,  # ✅ CPU 강제
+        **pipeline_kwargs
+    )
+    return model, tokenizer, llm
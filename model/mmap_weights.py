@@ -0,0 +1,240 @@
+"""
+safetensors 가중치 메모리 매핑 로더
+파일을 mmap 한 뒤 텐서를 그 버퍼 위에 바로 올려 (zero-copy)
+여러 프로세스가 같은 파일을 열면 OS 페이지 캐시 한 벌만 사용합니다.
+
+양자화와 함께 쓰면 층마다 (mmap 가중치 읽기 → 양자화 → 원본 페이지 반납) 순으로 진행해
+float 원본 전체가 한꺼번에 상주하지 않습니다.
+
+반정밀도(fp16 / bf16) 체크포인트는 변환하지 않고 그 dtype 그대로 매핑해 연산합니다.
+양자화 계층은 float32 입력을 받으므로 양자화할 때만 남은 반정밀도 텐서(임베딩, 정규화 등)를
+float32로 복사하고, 그 크기(익명 메모리, 프로세스 간 공유 안 됨)를 model.mmap_stats 에 기록합니다.
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import torch
+from transformers import AutoConfig, AutoModelForCausalLM
+from transformers.modeling_utils import no_init_weights
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def load_safetensors_mmap(path, spans: Optional[Dict[str, Tuple[mmap.mmap, int, int]]] = None) -> Dict[str, torch.Tensor]:
+    """
+    safetensors 파일을 복사 없이 텐서 딕셔너리로 매핑합니다.
+    ACCESS_COPY(copy-on-write)라 읽기만 하면 페이지가 프로세스 간 공유됩니다.
+
+    Args:
+        spans: 주어지면 텐서 이름 → (버퍼, 시작, 끝) 바이트 위치를 기록 (release_pages 용)
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    header_size = struct.unpack("<Q", buffer[:8])[0]
+    header = json.loads(buffer[8:8 + header_size])
+    base = 8 + header_size
+
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        count = (end - start) // torch.tensor([], dtype=dtype).element_size()
+        flat = torch.frombuffer(buffer, dtype=dtype, count=count, offset=base + start)
+        tensors[name] = flat.view(info["shape"]) if info["shape"] else flat.view(())
+        if spans is not None:
+            spans[name] = (buffer, base + start, base + end)
+    return tensors
+
+
+def release_pages(span: Tuple[mmap.mmap, int, int]):
+    """더 이상 읽지 않을 텐서의 mmap 페이지를 커널에 반납 (다시 읽으면 파일에서 재적재)"""
+    buffer, start, end = span
+    page = mmap.PAGESIZE
+    start = -(-start // page) * page  # 다른 텐서와 걸친 페이지는 남김
+    end = end // page * page
+    if end > start and hasattr(buffer, "madvise"):
+        buffer.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def resolve_safetensors_dir(model_id: str) -> Path:
+    """
+    모델의 safetensors 디렉토리 반환
+    허브에 .bin 체크포인트만 있으면 샤드 하나씩 safetensors로 변환해 캐시 (최초 1회)
+    """
+    local = Path(model_id)
+    if not local.is_dir():
+        from huggingface_hub import list_repo_files, snapshot_download
+
+        files = list_repo_files(model_id)
+        weights = "*.safetensors" if any(f.endswith(".safetensors") for f in files) else "*.bin"
+        local = Path(snapshot_download(model_id, allow_patterns=["*.json", "*.model", "*.txt", "*.py", weights]))
+
+    if any(local.glob("*.safetensors")):
+        return local
+
+    from model.llm_loader import CACHE_DIR
+
+    out = CACHE_DIR / "safetensors" / model_id.strip("/").replace("/", "--")
+    if any(out.glob("*.safetensors")):
+        return out
+
+    from safetensors.torch import save_file
+
+    print(f"📦 safetensors 변환 (최초 1회): {model_id} → {out}")
+    out.mkdir(parents=True, exist_ok=True)
+    for shard in sorted(local.glob("*.bin")):
+        # mmap=True: 샤드를 통째로 읽지 않고 매핑해서 그대로 다시 씀
+        state = torch.load(shard, map_location="cpu", mmap=True, weights_only=True)
+        seen, tensors = set(), {}
+        for name, tensor in state.items():
+            ptr = tensor.untyped_storage().data_ptr()
+            tensors[name] = tensor.contiguous() if ptr not in seen else tensor.clone()  # 공유 텐서는 복제
+            seen.add(ptr)
+        save_file(tensors, out / f"{shard.stem}.safetensors", metadata={"format": "pt"})
+        del state, tensors
+    for extra in local.iterdir():
+        if extra.suffix in (".json", ".model", ".txt", ".py") and not extra.name.endswith("index.json"):
+            shutil.copy(extra, out / extra.name)
+    return out
+
+
+def weights_key(model) -> str:
+    """설정 + 리비전 + 가중치 구성(이름/모양/dtype) 해시 — 모델, 리비전, dtype이 바뀌면 다른 키"""
+    config = model.config
+    # save_pretrained가 채워 넣는 항목은 제외 (저장 전후 같은 키, dtype은 layout에 포함)
+    settings = {k: v for k, v in config.to_dict().items()
+                if not k.startswith("_") and k not in ("transformers_version", "architectures", "torch_dtype")}
+    layout = [(name, tuple(t.shape), str(t.dtype)) for name, t in model.state_dict().items()]
+    payload = json.dumps({
+        "config": settings,
+        "revision": getattr(config, "_commit_hash", None),
+        "layout": layout,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def export_model(model, model_dir, tokenizer=None, **save_kwargs) -> Path:
+    """
+    모델(+ 토크나이저)을 safetensors로 저장 (이미 있으면 그대로 사용)
+    임시 디렉토리에 다 쓴 뒤 이름을 바꿔 넣으므로, 디렉토리가 있으면 항상 완성된 사본입니다.
+    """
+    model_dir = Path(model_dir)
+    if model_dir.exists():
+        return model_dir
+
+    tmp_dir = model_dir.with_name(f"{model_dir.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    try:
+        model.save_pretrained(tmp_dir, safe_serialization=True, **save_kwargs)
+        if tokenizer is not None:
+            tokenizer.save_pretrained(tmp_dir)
+        os.replace(tmp_dir, model_dir)
+    except OSError:
+        if not model_dir.exists():
+            raise
+        # 다른 프로세스가 먼저 같은 사본을 넣음
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return model_dir
+
+
+def load_model_mmap(model_dir, quantize: Optional[str] = None, trust_remote_code: bool = False) -> torch.nn.Module:
+    """
+    save_pretrained(safe_serialization=True) 로 저장된 디렉토리에서
+    파라미터가 mmap 버퍼를 직접 가리키는 모델을 만듭니다.
+
+    Args:
+        quantize: "int8" | "int4" 이면 선형 계층을 한 층씩 양자화하고 원본 페이지를 반납
+        trust_remote_code: 디렉토리의 사용자 정의 모델 코드 실행 허용
+    """
+    model_dir = Path(model_dir)
+    config = AutoConfig.from_pretrained(model_dir, trust_remote_code=trust_remote_code)
+    state, spans = {}, {}
+    for shard in sorted(model_dir.glob("*.safetensors")):
+        state.update(load_safetensors_mmap(shard, spans))
+
+    # 연산 dtype = 체크포인트 dtype (양자화하면 양자화 계층에 맞춰 float32)
+    compute_dtype = torch.float32 if quantize else _checkpoint_dtype(state)
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=compute_dtype, trust_remote_code=trust_remote_code)
+
+    # assign=True: 랜덤 초기화 텐서에 복사하지 않고 mmap 텐서로 교체
+    result = model.load_state_dict(state, strict=False, assign=True)
+    _check_keys(model, config, result.missing_keys, result.unexpected_keys, model_dir)
+    model.tie_weights()
+    del state
+
+    if quantize:
+        from model.weight_quant import quantize_weights
+
+        def _release(module_name: str):
+            for suffix in (".weight", ".bias"):
+                span = spans.get(module_name + suffix)
+                if span:
+                    release_pages(span)
+
+        quantize_weights(model, quantize, on_replaced=_release)
+
+    # 연산 dtype과 다른 텐서만 변환 (양자화 후 남은 반정밀도 텐서) → 이 부분은 익명 메모리에 복사됨
+    upcast_bytes = 0
+    for param in model.parameters():
+        if param.is_floating_point() and param.dtype != compute_dtype:
+            param.data = param.data.to(compute_dtype)
+            upcast_bytes += param.numel() * param.element_size()
+    model.mmap_stats = {
+        "compute_dtype": str(compute_dtype).replace("torch.", ""),
+        "upcast_mb": round(upcast_bytes / 2 ** 20, 1),
+    }
+    return model.eval()
+
+
+def _check_keys(model, config, missing, unexpected, model_dir: Path):
+    """
+    no_init_weights 로 만든 모델이라 체크포인트에 없는 파라미터는 초기화되지 않은 채 남음
+    → 묶인 가중치(tie_word_embeddings의 lm_head 등)와 모델이 무시하도록 지정한 키 외에는 거절
+    """
+    tied = set(getattr(model, "_tied_weights_keys", None) or []) if getattr(config, "tie_word_embeddings", True) else set()
+    ignore_missing = getattr(model, "_keys_to_ignore_on_load_missing", None) or []
+    ignore_unexpected = getattr(model, "_keys_to_ignore_on_load_unexpected", None) or []
+    buffers = {name for name, _ in model.named_buffers()}  # 예전 체크포인트에 저장된 마스크 버퍼 등
+
+    missing = [k for k in missing if k not in tied and not any(re.search(p, k) for p in ignore_missing)]
+    unexpected = [k for k in unexpected
+                  if k not in buffers and not any(re.search(p, k) for p in ignore_unexpected)]
+    if missing or unexpected:
+        raise ValueError(
+            f"{model_dir}: 체크포인트와 모델 구조가 맞지 않음 "
+            f"(없는 키 {len(missing)}개 {missing[:5]}, 남는 키 {len(unexpected)}개 {unexpected[:5]})"
+        )
+
+
+def _checkpoint_dtype(state: Dict[str, torch.Tensor]) -> torch.dtype:
+    """가장 많은 float 원소가 쓰는 dtype (float 텐서가 없으면 float32)"""
+    totals: Dict[torch.dtype, int] = {}
+    for tensor in state.values():
+        if tensor.is_floating_point():
+            totals[tensor.dtype] = totals.get(tensor.dtype, 0) + tensor.numel()
+    return max(totals, key=totals.get) if totals else torch.float32
@@ -0,0 +1,189 @@
+"""
+토큰 예산 기반 프롬프트 조립
+댓글/발언은 들어올 때 한 번 (배치로) 토큰 수를 세어 캐시해 두고,
+프롬프트를 만들 때는 고정 문구(지시문)를 먼저 확보한 뒤 남은 예산 안에서 섹션별로 항목을 채웁니다.
+→ 긴 입력 때문에 끝의 지시문이 잘리거나, 필요 이상으로 긴 prefill을 하지 않음
+
+토큰 수는 항목별 합으로 계산하므로 이어 붙일 때 경계에서 병합되는 토큰만큼 (항목당 0~1개) 오차가 있습니다.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence
+
+from model.comment_sampler import approx_token_count
+
+DEFAULT_CONTEXT_TOKENS = 1024
+
+
+class TokenCounter:
+    """텍스트별 토큰 수 캐시 (LRU, 스레드 안전) — 미스는 fast tokenizer 배치 호출로 계산"""
+
+    def __init__(self, tokenizer=None, max_entries: int = 50000):
+        """
+        Args:
+            tokenizer: HF 토크나이저 (없으면 글자 수 기반 근사치)
+            max_entries: 캐시할 최대 텍스트 수
+        """
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        """여러 텍스트의 토큰 수 (캐시에 없는 것만 한 번에 토크나이즈)"""
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                cached = self._cache.get(text)
+                if cached is None:
+                    missing.setdefault(text, []).append(i)
+                else:
+                    self._cache.move_to_end(text)
+                    counts[i] = cached
+            self.hits += len(texts) - sum(len(v) for v in missing.values())
+            self.misses += len(missing)
+
+        if missing:
+            fresh = self._tokenize(list(missing))
+            with self._lock:
+                for text, n in zip(missing, fresh):
+                    for i in missing[text]:
+                        counts[i] = n
+                    self._cache[text] = n
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return counts
+
+    def _tokenize(self, texts: List[str]) -> List[int]:
+        if self.tokenizer is None:
+            return [approx_token_count(t) for t in texts]
+        try:
+            ids = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        except TypeError:
+            ids = [self.tokenizer.encode(t) for t in texts]
+        return [len(x) for x in ids]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+def context_length(llm, default: int = DEFAULT_CONTEXT_TOKENS) -> int:
+    """파이프라인의 모델 최대 위치 수 (모르면 default)"""
+    config = getattr(getattr(llm, "model", None), "config", None)
+    for attr in ("max_position_embeddings", "n_positions"):
+        value = getattr(config, attr, None)
+        if value:
+            return int(value)
+    limit = getattr(getattr(llm, "tokenizer", None), "model_max_length", None)
+    if isinstance(limit, int) and 0 < limit < 1_000_000:
+        return limit
+    return default
+
+
+class _Section:
+    def __init__(self, text: Optional[str] = None, items: Sequence[str] = (), budget: Optional[int] = None,
+                 prefix: str = "", labels: Optional[Sequence[str]] = None, sep: str = "\n",
+                 newest_first: bool = False, numbered: bool = False):
+        self.text = text
+        self.items = list(items)
+        self.budget = budget
+        self.labels = list(labels) if labels is not None else [prefix] * len(self.items)
+        self.sep = sep
+        self.newest_first = newest_first
+        self.numbered = numbered
+        self.selected: List[str] = []
+
+
+class PromptBuilder:
+    """
+    고정 문구 + 예산 섹션으로 프롬프트 조립
+
+        prompt = (PromptBuilder(counter, max_tokens=700)
+                  .text("다음은 댓글입니다.\\n")
+                  .items(comments, budget=400, prefix="- ")
+                  .text("\\n위 댓글을 요약하세요.")
+                  .build())
+
+    고정 문구는 항상 전부 들어가고, items 섹션은 선언 순서대로
+    min(섹션 예산, 남은 전체 예산) 안에서 채워집니다.
+    """
+
+    def __init__(self, counter: TokenCounter, max_tokens: int):
+        self.counter = counter
+        self.max_tokens = max_tokens
+        self._sections: List[_Section] = []
+        self.used_tokens = 0
+        self.dropped = 0  # 예산 때문에 빠진 항목 수
+
+    def text(self, text: str) -> "PromptBuilder":
+        self._sections.append(_Section(text=text))
+        return self
+
+    def items(self, items: Iterable[str], budget: Optional[int] = None, prefix: str = "",
+              labels: Optional[Sequence[str]] = None, sep: str = "\n",
+              newest_first: bool = False, numbered: bool = False) -> "PromptBuilder":
+        """
+        Args:
+            budget: 이 섹션의 토큰 상한 (None이면 남은 전체 예산)
+            prefix: 항목 앞에 붙일 문자열 ("- " 등)
+            labels: 항목별 접두어 ("나: ", "상대: " 등, 주면 prefix 대신 사용)
+                    항목 본문과 따로 세므로 본문 토큰 수는 캐시를 그대로 씀
+            newest_first: True면 뒤(최신)부터 채우고 처음 안 들어가는 항목에서 멈춤 (대화 기록처럼 연속성 유지)
+                          False면 앞부터 채우되 안 들어가는 항목만 건너뜀
+            numbered: "1. " 식 번호 (선택된 항목 기준)
+        """
+        self._sections.append(_Section(items=items, budget=budget, prefix=prefix, labels=labels, sep=sep,
+                                       newest_first=newest_first, numbered=numbered))
+        return self
+
+    def build(self) -> str:
+        fixed = [s for s in self._sections if s.text is not None]
+        used = sum(self.counter.count_many([s.text for s in fixed])) if fixed else 0
+
+        for section in self._sections:
+            if section.text is None:
+                used += self._fill(section, self.max_tokens - used)
+
+        self.used_tokens = used
+        parts = []
+        for section in self._sections:
+            if section.text is not None:
+                parts.append(section.text)
+            elif section.selected:
+                parts.append(section.sep.join(section.selected) + section.sep)
+        return "".join(parts)
+
+    def _fill(self, section: _Section, remaining: int) -> int:
+        limit = remaining if section.budget is None else min(section.budget, remaining)
+        counts = self.counter.count_many(section.items)
+        number = "1. " if section.numbered else ""
+        label_tokens = {
+            label: (self.counter.count(label + number) if label + number else 0) + (1 if section.sep else 0)
+            for label in set(section.labels)
+        }
+
+        order = range(len(section.items) - 1, -1, -1) if section.newest_first else range(len(section.items))
+        chosen, used = [], 0
+        for i in order:
+            cost = counts[i] + label_tokens[section.labels[i]]
+            if used + cost > limit:
+                if section.newest_first:
+                    break
+                continue
+            chosen.append(i)
+            used += cost
+        chosen.sort()
+        self.dropped += len(section.items) - len(chosen)
+
+        section.selected = [
+            f"{section.labels[i]}{n + 1}. {section.items[i]}" if section.numbered else f"{section.labels[i]}{section.items[i]}"
+            for n, i in enumerate(chosen)
+        ]
+        return used
@@ -0,0 +1,55 @@
+"""
+프롬프트 prefill 공유 text-generation 파이프라인
+num_return_sequences=n 이면 HF 기본 동작은 프롬프트를 n번 복제한 배치로 prefill 하지만,
+여기서는 프롬프트를 한 번만 통과시킨 KV 캐시를 n개로 복제한 뒤 이어서 샘플링합니다.
+(긴 프롬프트 + 짧은 응답인 토론 턴에서 후보 n개 비용이 거의 1개 수준)
+"""
+
+import torch
+from transformers import DynamicCache, TextGenerationPipeline
+
+
+class SharedPrefixTextGenerationPipeline(TextGenerationPipeline):
+    """llm(prompt, num_return_sequences=n, ...) 호출 형식은 그대로, 내부만 prefill 1회"""
+
+    def __call__(self, text_inputs, **kwargs):
+        n = kwargs.get("num_return_sequences", 1)
+        if n <= 1 or not isinstance(text_inputs, str):
+            return super().__call__(text_inputs, **kwargs)
+        try:
+            return self._generate_shared_prefix(text_inputs, n, dict(kwargs))
+        except (AttributeError, NotImplementedError, TypeError, ValueError) as e:
+            # KV 캐시를 지원하지 않는 모델 등 → 기본 경로
+            print(f"⚠ prefill 공유 생성 실패, 기본 경로로 전환: {e}")
+            return super().__call__(text_inputs, **kwargs)
+
+    def _generate_shared_prefix(self, prompt: str, n: int, kwargs: dict):
+        kwargs.pop("num_return_sequences")
+        return_full_text = kwargs.pop("return_full_text", True)
+
+        input_ids = self.tokenizer(prompt, return_tensors="pt")["input_ids"].to(self.model.device)
+        if input_ids.shape[1] < 2:
+            raise ValueError("프롬프트가 너무 짧음")
+
+        with torch.inference_mode():
+            # 마지막 토큰은 generate가 처리하도록 남기고 그 앞까지만 prefill
+            prefix = self.model(input_ids=input_ids[:, :-1], use_cache=True)
+            cache = prefix.past_key_values
+            if isinstance(cache, DynamicCache):
+                cache.batch_repeat_interleave(n)
+                if not getattr(self.model, "_supports_cache_class", False):
+                    cache = cache.to_legacy_cache()
+            else:
+                # 구형 (key, value) 튜플 캐시 (GPT-2 등)
+                cache = tuple(tuple(t.repeat_interleave(n, dim=0) for t in layer) for layer in cache)
+
+            batch_ids = input_ids.repeat(n, 1)
+            outputs = self.model.generate(
+                input_ids=batch_ids,
+                attention_mask=torch.ones_like(batch_ids),
+                past_key_values=cache,
+                **kwargs,
+            )
+
+        texts = self.tokenizer.batch_decode(outputs[:, input_ids.shape[1]:], skip_special_tokens=True)
+        return [{"generated_text": prompt + text if return_full_text else text} for text in texts]
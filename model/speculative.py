@@ -0,0 +1,467 @@
+"""
+추측 디코딩 (speculative decoding)
+작은 초안(draft)이 다음 토큰 몇 개를 제안하면 본 모델(kogpt2)이 한 번의 forward로 검증합니다.
+CPU에서는 토큰당 지연이 forward 1회에 묶이므로, 초안이 맞는 만큼 forward 횟수가 줄어듭니다.
+
+- 초안 종류
+  - ngram: 해당 측 댓글 풀 + 지금 프롬프트/생성 중인 문장의 토큰 n-gram (모델 비용 없음)
+  - model: 같은 토크나이저를 쓰는 작은 모델 (증류/가지치기한 kogpt2 등)
+- 출력 분포는 본 모델과 같음
+  - 샘플링: 초안 토큰 x를 min(1, p(x)/q(x)) 확률로 수락, 거절되면 max(p - q, 0)에서 다시 뽑음
+  - greedy: 본 모델 argmax와 같은 동안만 수락
+  p는 파이프라인과 같은 temperature / top_k / top_p (모델 generation_config 기본값 포함)를 적용한 분포
+- 같은 시드면 같은 결과가 나오지만, 일반 generate와 같은 시드의 결과가 토큰 단위로 같지는 않음 (분포만 같음)
+
+수락률 / forward당 토큰 수 / 일반 생성 대비 속도는 stats()와 세션 상태(state.speculative)로 확인합니다.
+메모리 관리 대상 파이프라인이면 generate 호출마다 본/초안 모델을 관리자에게서 잡고 (오프로드됐으면 다시 올림) 끝나면 놓습니다.
+
+사용 예 (일반 생성과 속도 비교):
+    python -m model.speculative --model skt/kogpt2-base-v2 --comments comments.txt --runs 5
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+from model.generation import sampling_warpers
+
+DRAFT_KINDS = ("ngram", "model")
+# 한 번에 제안할 초안 토큰 수
+NUM_DRAFT_TOKENS = int(os.getenv("COLORWAR_SPECULATIVE_TOKENS", "4"))
+# n-gram 초안 최대 차수 (문맥 n-1 토큰), 지금 문장에서 나온 n-gram 가중치, 제안 최소 확률
+NGRAM_ORDER = int(os.getenv("COLORWAR_SPECULATIVE_NGRAM_ORDER", "3"))
+LOCAL_NGRAM_WEIGHT = 2.0
+NGRAM_MIN_PROB = float(os.getenv("COLORWAR_SPECULATIVE_MIN_PROB", "0.3"))
+
+# 지원하지 않는 생성 옵션 (켜져 있으면 일반 generate로 처리)
+_UNSUPPORTED = {
+    "repetition_penalty": 1.0, "no_repeat_ngram_size": 0, "bad_words_ids": None, "min_length": 0,
+    "min_new_tokens": None, "num_beams": 1, "typical_p": 1.0, "epsilon_cutoff": 0.0, "eta_cutoff": 0.0,
+}
+
+
+def model_holder(source) -> Callable[[], ContextManager]:
+    """
+    모델을 쓰는 동안 잡아 두는 함수 (호출할 때마다 그 시점의 모델을 내줌)
+    메모리 관리 대상 파이프라인이면 hold() (사용 중 표시 + 오프로드됐으면 다시 올린 모델),
+    torch 모듈이면 그대로, 그 밖의 파이프라인이면 그때의 .model
+    """
+    if hasattr(source, "hold"):
+        return source.hold
+    if isinstance(source, torch.nn.Module):
+        return lambda: nullcontext(source)
+    return lambda: nullcontext(getattr(source, "model", None))
+
+
+# ==========================================================
+# 초안
+# ==========================================================
+class NgramDraft:
+    """댓글 풀 + 지금 문장 토큰 n-gram 초안"""
+
+    name = "ngram"
+
+    def __init__(self, tokenizer, corpus: Optional[Callable[[str], Sequence[str]]] = None,
+                 order: int = NGRAM_ORDER, min_prob: float = NGRAM_MIN_PROB):
+        """
+        Args:
+            corpus: key(측) → 댓글 목록 (개수가 바뀌었을 때만 다시 색인)
+            order: 최대 차수 (문맥 order-1 토큰부터 1토큰까지 줄여가며 찾음)
+            min_prob: 가장 유력한 다음 토큰 확률이 이보다 낮으면 제안을 멈춤 (검증 낭비 방지)
+        """
+        self.tokenizer = tokenizer
+        self.corpus = corpus
+        self.order = max(order, 2)
+        self.min_prob = min_prob
+        self._tables: Dict[str, Tuple[int, Dict[tuple, Counter]]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, prompt_ids: List[int], key: Optional[str], vocab_size: int):
+        yield _NgramSession(self, self._table(key), vocab_size)
+
+    def _table(self, key: Optional[str]) -> Dict[tuple, Counter]:
+        if self.corpus is None or key is None:
+            return {}
+        texts = self.corpus(key)
+        with self._lock:
+            cached = self._tables.get(key)
+            if cached is not None and cached[0] == len(texts):
+                return cached[1]
+        table: Dict[tuple, Counter] = defaultdict(Counter)
+        for ids in self.tokenizer(list(texts))["input_ids"] if texts else []:
+            _index(table, ids, self.order, 0)
+        with self._lock:
+            self._tables[key] = (len(texts), table)
+        return table
+
+
+class _NgramSession:
+    def __init__(self, draft: NgramDraft, pool: Dict[tuple, Counter], vocab_size: int):
+        self.draft = draft
+        self.pool = pool
+        self.local: Dict[tuple, Counter] = defaultdict(Counter)
+        self.indexed = 0
+        self.vocab_size = vocab_size
+
+    def propose(self, tokens: List[int], k: int, sample: bool, warp, generator) -> Tuple[List[int], List[torch.Tensor]]:
+        self.indexed = _index(self.local, tokens, self.draft.order, self.indexed)
+        context = list(tokens)
+        drafts, q_rows = [], []
+        for _ in range(k):
+            counts = self._lookup(context)
+            if not counts:
+                break
+            q = torch.zeros(self.vocab_size)
+            ids = torch.tensor(list(counts.keys()))
+            q[ids] = torch.tensor(list(counts.values()), dtype=torch.float32)
+            q /= q.sum()
+            if q.max().item() < self.draft.min_prob:
+                break
+            token = _pick(q, sample, generator)
+            drafts.append(token)
+            q_rows.append(q)
+            context.append(token)
+        return drafts, q_rows
+
+    def _lookup(self, context: List[int]) -> Optional[Counter]:
+        for n in range(self.draft.order - 1, 0, -1):
+            if len(context) < n:
+                continue
+            ctx = tuple(context[-n:])
+            local, pool = self.local.get(ctx), self.pool.get(ctx)
+            if local or pool:
+                merged = Counter()
+                for token, count in (local or {}).items():
+                    merged[token] += count * LOCAL_NGRAM_WEIGHT
+                for token, count in (pool or {}).items():
+                    merged[token] += count
+                return merged
+        return None
+
+
+def _index(table: Dict[tuple, Counter], ids: Sequence[int], order: int, start: int) -> int:
+    """ids[start:] 위치에서 끝나는 n-gram 추가, 색인한 길이 반환"""
+    for i in range(max(start, 1), len(ids)):
+        for n in range(1, order):
+            if i - n < 0:
+                break
+            table[tuple(ids[i - n:i])][ids[i]] += 1
+    return len(ids)
+
+
+class ModelDraft:
+    """같은 토크나이저를 쓰는 작은 모델 초안 (KV 캐시 유지)"""
+
+    name = "model"
+
+    def __init__(self, model):
+        """
+        Args:
+            model: torch 모델 또는 그 파이프라인 (메모리 관리 대상이면 세션마다 관리자에게서 잡음)
+        """
+        self._hold = model_holder(model)
+
+    @contextmanager
+    def session(self, prompt_ids: List[int], key: Optional[str], vocab_size: int):
+        with self._hold() as model:
+            yield _ModelSession(model, vocab_size)
+
+
+class _ModelSession:
+    def __init__(self, model, vocab_size: int):
+        self.model = model
+        self.vocab_size = vocab_size
+        self.cache = None
+        self.cached: List[int] = []  # 캐시에 들어 있는 토큰
+
+    def propose(self, tokens: List[int], k: int, sample: bool, warp, generator) -> Tuple[List[int], List[torch.Tensor]]:
+        # 캐시와 공통인 앞부분만 남기고 나머지를 이어서 통과 (마지막 토큰은 항상 새로 통과)
+        common = 0
+        limit = min(len(self.cached), len(tokens) - 1)
+        while common < limit and self.cached[common] == tokens[common]:
+            common += 1
+        self.cache = _crop(self.cache, common)
+        feed = tokens[common:]
+        drafts, q_rows = [], []
+        with torch.inference_mode():
+            for step in range(k):
+                out = self.model(input_ids=torch.tensor([feed]), past_key_values=self.cache, use_cache=True)
+                self.cache = out.past_key_values
+                self.cached = (self.cached[:common] if step == 0 else self.cached) + feed
+                logits = _fit_vocab(out.logits[0, -1:].float(), self.vocab_size)
+                seq = torch.tensor([self.cached])
+                q = torch.softmax(warp(seq, logits), dim=-1)[0] if sample else torch.softmax(logits, dim=-1)[0]
+                token = _pick(q, sample, generator)
+                drafts.append(token)
+                q_rows.append(q)
+                feed = [token]
+        return drafts, q_rows
+
+
+# ==========================================================
+# 검증
+# ==========================================================
+class SpeculativeDecoder:
+    """초안 제안 + 본 모델 1회 forward 검증 루프 (배치 1)"""
+
+    def __init__(self, model, tokenizer, draft, num_draft_tokens: int = NUM_DRAFT_TOKENS):
+        """
+        Args:
+            model: 본 torch 모델 또는 그 파이프라인 (메모리 관리 대상이면 generate마다 관리자에게서 잡음)
+            draft: NgramDraft | ModelDraft
+        """
+        self._hold = model_holder(model)
+        self.tokenizer = tokenizer
+        self.draft = draft
+        self.num_draft_tokens = max(num_draft_tokens, 1)
+        self._lock = threading.Lock()
+        self.totals = new_stats(draft.name)
+        self._baseline = [0, 0.0]  # 일반 생성 (토큰 수, 초)
+
+    @classmethod
+    def for_pipeline(cls, llm, kind: str = "ngram", corpus: Optional[Callable[[str], Sequence[str]]] = None,
+                     draft_model_id: Optional[str] = None, backend: Optional[str] = None, governor=None):
+        """
+        text-generation 파이프라인에서 디코더 생성
+        torch 모델이 아닌 경우(스텁, ONNX, 워커 프로세스 풀) ValueError
+        """
+        with model_holder(llm)() as model:
+            if not isinstance(model, torch.nn.Module) or getattr(llm, "tokenizer", None) is None:
+                raise ValueError("추측 디코딩은 프로세스 안 torch 모델(torch / tiny 백엔드)에서만 사용할 수 있습니다.")
+        if kind == "ngram":
+            return cls(llm, llm.tokenizer, NgramDraft(llm.tokenizer, corpus))
+        if kind != "model":
+            raise ValueError(f"알 수 없는 초안 종류: {kind} (선택: {', '.join(DRAFT_KINDS)})")
+        if not draft_model_id:
+            raise ValueError("model 초안은 COLORWAR_SPECULATIVE_DRAFT_MODEL 설정이 필요합니다.")
+
+        from model.llm_loader import load_text_generation
+        # 관리자가 있으면 초안 모델도 관리 대상 파이프라인으로 받아 호출마다 다시 확인
+        _, draft_tokenizer, draft_llm = load_text_generation(draft_model_id, backend, governor=governor)
+        with model_holder(draft_llm)() as draft_model:
+            usable = isinstance(draft_model, torch.nn.Module) and draft_tokenizer.get_vocab() == llm.tokenizer.get_vocab()
+        if not usable:
+            raise ValueError(f"초안 모델 {draft_model_id}은 본 모델과 같은 토크나이저의 torch 모델이어야 합니다.")
+        return cls(llm, llm.tokenizer, ModelDraft(draft_llm))
+
+    def generate(self, prompt: str, key: Optional[str] = None, seed: Optional[int] = None,
+                 **params) -> Tuple[str, Dict]:
+        """
+        (프롬프트 + 생성 문장, 이번 호출 통계)
+        params: 파이프라인 호출과 같은 생성 옵션 (max_new_tokens, do_sample, temperature, top_p, ...)
+        """
+        with self._hold() as model:
+            return self._generate(model, prompt, key, seed, params)
+
+    def _generate(self, model, prompt: str, key: Optional[str], seed: Optional[int], params: Dict) -> Tuple[str, Dict]:
+        config = copy.deepcopy(model.generation_config)
+        config.update(**{k: v for k, v in params.items() if k != "pad_token_id"})
+        for name, default in _UNSUPPORTED.items():
+            if getattr(config, name, default) not in (default, None):
+                raise ValueError(f"추측 디코딩이 지원하지 않는 생성 옵션: {name}")
+
+        sample = bool(config.do_sample)
+        warp = sampling_warpers(config) if sample else None
+        eos = config.eos_token_id
+        eos_ids = set(eos if isinstance(eos, list) else [eos]) if eos is not None else set()
+        generator = torch.Generator().manual_seed(seed) if seed is not None else None
+        max_new = config.max_new_tokens or 20
+
+        prompt_ids = self.tokenizer(prompt)["input_ids"]
+        if not prompt_ids:
+            raise ValueError("빈 프롬프트")
+        vocab_size = model.config.vocab_size
+        stats = new_stats(self.draft.name)
+        started = time.perf_counter()
+
+        tokens = list(prompt_ids)
+        with self.draft.session(prompt_ids, key, vocab_size) as session, torch.inference_mode():
+            # 마지막 프롬프트 토큰은 첫 검증 forward에서 함께 통과
+            cache = None
+            if len(tokens) > 1:
+                cache = model(input_ids=torch.tensor([tokens[:-1]]), use_cache=True).past_key_values
+            generated = 0
+            num_draft = self.num_draft_tokens
+            while generated < max_new:
+                draft_started = time.perf_counter()
+                k = min(num_draft, max_new - generated - 1)
+                drafts, q_rows = session.propose(tokens, k, sample, warp, generator) if k > 0 else ([], [])
+                stats["draft_seconds"] += time.perf_counter() - draft_started
+
+                base = len(tokens) - 1  # 캐시에 들어 있는 길이
+                out = model(input_ids=torch.tensor([[tokens[-1]] + drafts]), past_key_values=cache, use_cache=True)
+                logits = out.logits[0, :, :vocab_size].float()
+                accepted, next_token = self._verify(tokens, drafts, q_rows, logits, sample, warp, generator)
+                cache = _crop(out.past_key_values, base + 1 + accepted)
+
+                new = drafts[:accepted] + [next_token]
+                # 초안 길이 조정 (HF assisted generation과 같은 방식): 다 맞으면 +2, 틀리면 -1
+                if drafts:
+                    num_draft = min(num_draft + 2, self.num_draft_tokens * 2) if accepted == len(drafts) \
+                        else max(num_draft - 1, 1)
+                stats["forwards"] += 1
+                stats["drafted"] += len(drafts)
+                stats["accepted"] += accepted
+                stop = False
+                for i, token in enumerate(new):
+                    if token in eos_ids:
+                        new, stop = new[:i + 1], True
+                        break
+                tokens.extend(new)
+                generated += len(new)
+                if stop:
+                    break
+
+        stats["tokens"] = generated
+        stats["seconds"] = time.perf_counter() - started
+        with self._lock:
+            merge_stats(self.totals, stats)
+        text = self.tokenizer.decode(tokens[len(prompt_ids):], skip_special_tokens=True)
+        return prompt + text, stats
+
+    @staticmethod
+    def _verify(tokens: List[int], drafts: List[int], q_rows: List[torch.Tensor], logits: torch.Tensor,
+                sample: bool, warp, generator) -> Tuple[int, int]:
+        """(수락한 초안 수, 이어서 붙일 토큰) — logits[i]는 초안 i번째 위치의 본 모델 분포"""
+        if not sample:
+            best = logits.argmax(dim=-1).tolist()
+            accepted = 0
+            while accepted < len(drafts) and drafts[accepted] == best[accepted]:
+                accepted += 1
+            return accepted, best[accepted]
+
+        seq = torch.tensor([tokens + drafts]).expand(logits.shape[0], -1)
+        probs = torch.softmax(warp(seq, logits), dim=-1)
+        for i, token in enumerate(drafts):
+            p, q = probs[i], q_rows[i]
+            if torch.rand(1, generator=generator).item() * q[token].item() < p[token].item():
+                continue
+            residual = torch.clamp(p - q, min=0)
+            total = residual.sum()
+            return i, _pick(residual / total if total > 0 else p, True, generator)
+        return len(drafts), _pick(probs[len(drafts)], True, generator)
+
+    # ==========================================================
+    # 통계
+    # ==========================================================
+    def record_baseline(self, prompt: str, generated_text: str, seconds: float):
+        """일반 generate 한 번의 (생성 토큰 수, 시간) — 속도 비교 기준"""
+        tokens = len(self.tokenizer(generated_text[len(prompt):])["input_ids"])
+        if tokens:
+            with self._lock:
+                self._baseline[0] += tokens
+                self._baseline[1] += seconds
+
+    def baseline_ms_per_token(self) -> Optional[float]:
+        tokens, seconds = self._baseline
+        return seconds * 1000 / tokens if tokens else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            totals = dict(self.totals)
+        return {**summarize(totals, self.baseline_ms_per_token()), "num_draft_tokens": self.num_draft_tokens}
+
+
+def new_stats(draft: str) -> Dict:
+    return {"draft": draft, "drafted": 0, "accepted": 0, "forwards": 0, "tokens": 0,
+            "seconds": 0.0, "draft_seconds": 0.0}
+
+
+def merge_stats(total: Dict, run: Dict) -> Dict:
+    for name in ("drafted", "accepted", "forwards", "tokens", "seconds", "draft_seconds"):
+        total[name] = total.get(name, 0) + run[name]
+    return total
+
+
+def summarize(stats: Dict, baseline_ms_per_token: Optional[float] = None) -> Dict:
+    """누적 통계 + 수락률 / forward당 토큰 / 토큰당 지연 / 일반 생성 대비 속도"""
+    tokens, seconds = stats.get("tokens", 0), stats.get("seconds", 0.0)
+    ms_per_token = seconds * 1000 / tokens if tokens else None
+    return {
+        **stats,
+        "seconds": round(seconds, 3),
+        "draft_seconds": round(stats.get("draft_seconds", 0.0), 3),
+        "acceptance_rate": round(stats["accepted"] / stats["drafted"], 3) if stats.get("drafted") else None,
+        "tokens_per_forward": round(tokens / stats["forwards"], 2) if stats.get("forwards") else None,
+        "ms_per_token": round(ms_per_token, 2) if ms_per_token else None,
+        "speedup": round(baseline_ms_per_token / ms_per_token, 2)
+        if ms_per_token and baseline_ms_per_token else None,
+    }
+
+
+def _fit_vocab(logits: torch.Tensor, vocab_size: int) -> torch.Tensor:
+    """초안 모델 로짓 폭을 본 모델 어휘 크기에 맞춤 (남는 칸은 -inf)"""
+    if logits.shape[-1] >= vocab_size:
+        return logits[..., :vocab_size]
+    pad = logits.new_full((*logits.shape[:-1], vocab_size - logits.shape[-1]), float("-inf"))
+    return torch.cat([logits, pad], dim=-1)
+
+
+def _pick(probs: torch.Tensor, sample: bool, generator) -> int:
+    if not sample:
+        return int(probs.argmax().item())
+    return int(torch.multinomial(probs, 1, generator=generator).item())
+
+
+def _crop(cache, length: int):
+    """KV 캐시를 앞 length 토큰까지로 자름 (DynamicCache / 구형 튜플 캐시)"""
+    if cache is None:
+        return None
+    if length <= 0:
+        return None
+    if hasattr(cache, "crop"):
+        cache.crop(length)
+        return cache
+    return tuple(tuple(t[:, :, :length] for t in layer) for layer in cache)
+
+
+# ==========================================================
+# CLI: 일반 생성 대비 속도 측정
+# ==========================================================
+def main():
+    import argparse
+    from model.llm_loader import DEFAULT_MODEL_ID, load_text_generation
+
+    parser = argparse.ArgumentParser(description="추측 디코딩 수락률 / 속도 측정")
+    parser.add_argument("--model", default=DEFAULT_MODEL_ID)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--draft", choices=DRAFT_KINDS, default="ngram")
+    parser.add_argument("--draft-model", default=os.getenv("COLORWAR_SPECULATIVE_DRAFT_MODEL"))
+    parser.add_argument("--comments", help="n-gram 초안용 댓글 파일 (한 줄에 하나)")
+    parser.add_argument("--prompt", default="현재 주제: 정치적 공정성\n\n상대: 이 사안에 대해 너의 생각은 뭐야?\n나:")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--greedy", action="store_true")
+    args = parser.parse_args()
+
+    comments: List[str] = []
+    if args.comments:
+        with open(args.comments, encoding="utf-8") as f:
+            comments = [line.strip() for line in f if line.strip()]
+    _, tokenizer, llm = load_text_generation(args.model, args.backend)
+    decoder = SpeculativeDecoder.for_pipeline(llm, args.draft, corpus=lambda key: comments,
+                                              draft_model_id=args.draft_model, backend=args.backend)
+    params = dict(max_new_tokens=args.max_new_tokens, pad_token_id=tokenizer.eos_token_id)
+    params.update(do_sample=False) if args.greedy else params.update(do_sample=True, temperature=0.8, top_p=0.9)
+
+    llm(args.prompt, **params)  # 워밍업
+    for seed in range(args.runs):
+        torch.manual_seed(seed)
+        started = time.perf_counter()
+        text = llm(args.prompt, **params)[0]["generated_text"]
+        decoder.record_baseline(args.prompt, text, time.perf_counter() - started)
+        decoder.generate(args.prompt, key="cli", seed=seed, **params)
+
+    import json
+    print(json.dumps(decoder.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+서버 상태 저장소 (댓글 풀 / 페르소나 / 토론 세션)
+uvicorn --workers N 이나 여러 인스턴스가 같은 댓글과 토론을 보도록 상태를 프로세스 밖으로 뺍니다.
+
+- memory: 프로세스 안 dict (기본값, 단일 워커)
+- redis : Redis 프로토콜 서버 (redis-py 호환 클라이언트를 주입하거나 URL로 생성)
+
+토론 세션은 버전 번호로 낙관적 동시성 제어를 합니다.
+읽은 버전과 저장 시점의 버전이 다르면 StateConflictError — 다른 워커가 먼저 토론을 진행한 경우입니다.
+"""
+
+import json
+import os
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+STATE_BACKENDS = ("memory", "redis")
+SIDES = ("left", "right")
+# 이보다 긴 직렬화 결과만 zlib 압축 (짧으면 압축 헤더가 더 큼)
+COMPRESS_MIN_BYTES = 512
+# 토론 기록 형식 버전 (0: 발언별 감정 강도 없음, 1: 모든 발언에 감정 강도 포함)
+RECORD_SCHEMA = 1
+
+
+class StateConflictError(RuntimeError):
+    """읽은 뒤 다른 요청이 먼저 세션을 수정함"""
+
+
+# ==========================================================
+# 직렬화 (공백 없는 JSON, 길면 zlib) — 첫 바이트로 형식 구분
+# ==========================================================
+def encode(obj) -> bytes:
+    raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(raw, 6)
+    return b"j" + raw
+
+
+def decode(blob):
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        blob = blob.encode("utf-8")  # decode_responses=True 클라이언트 (압축본은 읽을 수 없으므로 권장하지 않음)
+    kind, body = blob[:1], blob[1:]
+    if kind == b"z":
+        body = zlib.decompress(body)
+    return json.loads(body.decode("utf-8"))
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _built_at(persona: Optional[Dict]):
+    """페르소나를 만든 시각 (기준 정보가 없으면 None) — 페르소나 교체 비교 기준"""
+    return ((persona or {}).get("basis") or {}).get("built_at")
+
+
+class DebateRecord:
+    """토론 세션 하나 (상태 dict + 시드 + 고르기 전 분기 후보 + 버전 + 형식 버전)"""
+
+    def __init__(self, state: Dict, seed: Optional[int] = None,
+                 pending: Optional[Tuple[int, str, List[str]]] = None, version: int = 0,
+                 schema: int = RECORD_SCHEMA):
+        self.state = state
+        self.seed = seed
+        self.pending = pending  # (생성 시점 message_count, 발언자, 후보들)
+        self.version = version  # 0이면 아직 저장된 적 없음
+        self.schema = schema  # RECORD_SCHEMA 보다 작으면 불러올 때 변환 필요
+
+    def to_blob(self) -> bytes:
+        return encode({"s": self.state, "seed": self.seed, "p": self.pending, "v": self.schema})
+
+    @classmethod
+    def from_blob(cls, blob, version: int) -> "DebateRecord":
+        data = decode(blob)
+        pending = tuple(data["p"]) if data.get("p") else None
+        return cls(data["s"], data.get("seed"), pending, version, schema=data.get("v", 0))
+
+
+# ==========================================================
+# 인터페이스
+# ==========================================================
+class StateStore(ABC):
+    """상태 저장소 공통 인터페이스"""
+
+    name = "base"
+
+    # --- 댓글 풀 ---
+    @abstractmethod
+    def append_comments(self, side: str, comments: List[str]) -> int:
+        """댓글 추가 후 총 개수"""
+
+    @abstractmethod
+    def get_comments(self, side: str, start: int = 0) -> List[str]:
+        ...
+
+    @abstractmethod
+    def count_comments(self, side: str) -> int:
+        ...
+
+    # --- 페르소나 ---
+    @abstractmethod
+    def get_persona(self, side: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def set_persona(self, side: str, persona: Optional[Dict]):
+        ...
+
+    @abstractmethod
+    def replace_persona(self, side: str, persona: Dict, expected_built_at) -> bool:
+        """
+        저장된 페르소나의 basis.built_at 이 expected_built_at 일 때만 교체 (compare-and-set)
+        그 사이 다른 요청/워커가 페르소나를 바꿨거나 지웠으면 False
+        """
+
+    # --- 카운터 (중복 제거 통계 등) ---
+    @abstractmethod
+    def incr_counter(self, name: str, amount: int = 1) -> int:
+        ...
+
+    @abstractmethod
+    def get_counter(self, name: str) -> int:
+        ...
+
+    @abstractmethod
+    def reset_pool(self) -> int:
+        """댓글/페르소나/카운터 삭제 후 새 세대 번호 (다른 워커가 로컬 인덱스를 비우는 기준)"""
+
+    @abstractmethod
+    def pool_epoch(self) -> int:
+        ...
+
+    # --- 토론 세션 ---
+    @abstractmethod
+    def load_debate(self, session_id: str) -> Optional[DebateRecord]:
+        ...
+
+    @abstractmethod
+    def save_debate(self, session_id: str, record: DebateRecord, force: bool = False) -> int:
+        """
+        record.version 이 저장된 버전과 같을 때만 저장하고 새 버전을 돌려줌 (record.version도 갱신)
+        force=True 면 버전 무시 (새 토론 시작)
+        """
+
+    @abstractmethod
+    def delete_debate(self, session_id: str):
+        ...
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+
+# ==========================================================
+# 프로세스 내부 구현
+# ==========================================================
+class InMemoryStateStore(StateStore):
+    """단일 프로세스용 (토론 세션은 직렬화해 보관 → 저장 전 수정이 다른 요청에 새지 않음)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._comments: Dict[str, List[str]] = {side: [] for side in SIDES}
+        self._personas: Dict[str, Optional[Dict]] = {side: None for side in SIDES}
+        self._counters: Dict[str, int] = {}
+        self._epoch = 0
+        self._debates: Dict[str, Tuple[int, bytes]] = {}
+
+    def append_comments(self, side, comments):
+        with self._lock:
+            self._comments[side].extend(comments)
+            return len(self._comments[side])
+
+    def get_comments(self, side, start=0):
+        with self._lock:
+            return self._comments[side][start:]
+
+    def count_comments(self, side):
+        return len(self._comments[side])
+
+    def get_persona(self, side):
+        with self._lock:
+            return self._personas[side]
+
+    def set_persona(self, side, persona):
+        with self._lock:
+            self._personas[side] = persona
+
+    def replace_persona(self, side, persona, expected_built_at):
+        with self._lock:
+            if _built_at(self._personas[side]) != expected_built_at:
+                return False
+            self._personas[side] = persona
+            return True
+
+    def incr_counter(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            return self._counters[name]
+
+    def get_counter(self, name):
+        return self._counters.get(name, 0)
+
+    def reset_pool(self):
+        with self._lock:
+            self._comments = {side: [] for side in SIDES}
+            self._personas = {side: None for side in SIDES}
+            self._counters = {}
+            self._epoch += 1
+            return self._epoch
+
+    def pool_epoch(self):
+        return self._epoch
+
+    def load_debate(self, session_id):
+        with self._lock:
+            stored = self._debates.get(session_id)
+        if stored is None:
+            return None
+        version, blob = stored
+        return DebateRecord.from_blob(blob, version)
+
+    def save_debate(self, session_id, record, force=False):
+        blob = record.to_blob()
+        with self._lock:
+            current = self._debates.get(session_id, (0, None))[0]
+            if not force and current != record.version:
+                raise StateConflictError(f"세션 {session_id}: 버전 {record.version} → 현재 {current}")
+            record.version = current + 1
+            self._debates[session_id] = (record.version, blob)
+        return record.version
+
+    def delete_debate(self, session_id):
+        with self._lock:
+            self._debates.pop(session_id, None)
+
+    def stats(self):
+        return {"backend": self.name, "sessions": len(self._debates)}
+
+
+# ==========================================================
+# Redis 구현
+# ==========================================================
+class RedisStateStore(StateStore):
+    """
+    Redis 프로토콜 저장소 (redis-py 호환 클라이언트)
+
+    키 구조 (prefix 기본 "colorwar:"):
+      comments:{side}  LIST    댓글
+      persona:{side}   STRING  페르소나 (직렬화)
+      counter:{name}   STRING  정수 카운터 (이름 목록은 counters SET)
+      epoch            STRING  댓글 풀 세대 번호
+      debate:{id}      HASH    v=버전, d=직렬화된 세션
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = "colorwar:"):
+        """
+        Args:
+            client: redis-py 호환 클라이언트 (테스트용 대역 주입 가능, decode_responses=False)
+            url: client가 없을 때 접속 URL (redis://host:port/db)
+            prefix: 키 접두어 (여러 배포가 한 서버를 나눠 쓸 때)
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("redis 상태 저장소를 쓰려면 `pip install redis` 가 필요합니다.") from e
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, *parts: str) -> str:
+        return self.prefix + ":".join(parts)
+
+    def append_comments(self, side, comments):
+        if not comments:
+            return self.count_comments(side)
+        return int(self.client.rpush(self._key("comments", side), *comments))
+
+    def get_comments(self, side, start=0):
+        return [_text(c) for c in self.client.lrange(self._key("comments", side), start, -1)]
+
+    def count_comments(self, side):
+        return int(self.client.llen(self._key("comments", side)))
+
+    def get_persona(self, side):
+        return decode(self.client.get(self._key("persona", side)))
+
+    def set_persona(self, side, persona):
+        key = self._key("persona", side)
+        if persona is None:
+            self.client.delete(key)
+        else:
+            self.client.set(key, encode(persona))
+
+    def replace_persona(self, side, persona, expected_built_at):
+        key = self._key("persona", side)
+        # WATCH → 현재 built_at 확인 → MULTI/EXEC (그 사이 다른 워커가 쓰면 EXEC 실패 → 교체 안 함)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if _built_at(decode(pipe.get(key))) != expected_built_at:
+                    return False
+                pipe.multi()
+                pipe.set(key, encode(persona))
+                pipe.execute()
+            except Exception as e:
+                if type(e).__name__ == "WatchError":
+                    return False
+                raise
+        return True
+
+    def incr_counter(self, name, amount=1):
+        pipe = self.client.pipeline()
+        pipe.sadd(self._key("counters"), name)
+        pipe.incrby(self._key("counter", name), amount)
+        return int(pipe.execute()[-1])
+
+    def get_counter(self, name):
+        value = self.client.get(self._key("counter", name))
+        return int(value) if value is not None else 0
+
+    def reset_pool(self):
+        counters = [self._key("counter", _text(n)) for n in self.client.smembers(self._key("counters"))]
+        pipe = self.client.pipeline()
+        pipe.delete(*[self._key(kind, side) for kind in ("comments", "persona") for side in SIDES],
+                    self._key("counters"), *counters)
+        pipe.incr(self._key("epoch"))
+        return int(pipe.execute()[-1])
+
+    def pool_epoch(self):
+        value = self.client.get(self._key("epoch"))
+        return int(value) if value is not None else 0
+
+    def load_debate(self, session_id):
+        version, blob = self.client.hmget(self._key("debate", session_id), "v", "d")
+        if blob is None:
+            return None
+        return DebateRecord.from_blob(blob, int(version))
+
+    def save_debate(self, session_id, record, force=False):
+        key = self._key("debate", session_id)
+        blob = record.to_blob()
+        # WATCH → 버전 확인 → MULTI/EXEC (그 사이 다른 워커가 쓰면 EXEC 실패)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.hget(key, "v")
+                current = int(current) if current is not None else 0
+                if not force and current != record.version:
+                    raise StateConflictError(f"세션 {session_id}: 버전 {record.version} → 현재 {current}")
+                pipe.multi()
+                pipe.hset(key, mapping={"v": current + 1, "d": blob})
+                pipe.execute()
+            except StateConflictError:
+                raise
+            except Exception as e:
+                if type(e).__name__ == "WatchError":
+                    raise StateConflictError(f"세션 {session_id}: 저장 중 다른 요청이 먼저 수정") from e
+                raise
+        record.version = current + 1
+        return record.version
+
+    def delete_debate(self, session_id):
+        self.client.delete(self._key("debate", session_id))
+
+    def stats(self):
+        return {"backend": self.name, "prefix": self.prefix}
+
+
+def create_state_store(backend: Optional[str] = None, url: Optional[str] = None, client=None) -> StateStore:
+    """
+    COLORWAR_STATE_BACKEND (memory | redis), COLORWAR_REDIS_URL 기준으로 저장소 생성
+    """
+    backend = backend or os.getenv("COLORWAR_STATE_BACKEND", "memory")
+    if backend not in STATE_BACKENDS:
+        raise ValueError(f"알 수 없는 상태 저장소: {backend} (선택: {', '.join(STATE_BACKENDS)})")
+    if backend == "redis":
+        return RedisStateStore(
+            client=client,
+            url=url or os.getenv("COLORWAR_REDIS_URL"),
+            prefix=os.getenv("COLORWAR_STATE_PREFIX", "colorwar:"),
+        )
+    return InMemoryStateStore()
@@ -0,0 +1,71 @@
+"""
+스텁 생성 모델 (테스트 / 부하 테스트용)
+모델 다운로드 없이 text-generation pipeline과 같은 모양의 결과를 즉시 돌려줍니다.
+같은 프롬프트 + 같은 시드 → 같은 출력 (결정적)
+"""
+
+import hashlib
+import os
+import time
+from typing import Dict, List
+
+_PHRASES = [
+    "그건 좀 아닌 것 같은데요.",
+    "팩트부터 확인하고 말씀하시죠.",
+    "국민들이 다 보고 있습니다.",
+    "그래서 대안이 뭔데요?",
+    "언론 보도 좀 제대로 보세요.",
+    "이번만큼은 동의하기 어렵네요.",
+    "현실을 좀 보시라고요.",
+    "예전에도 똑같은 소리 했잖아요.",
+]
+
+
+class StubTokenizer:
+    """글자 단위 토크나이저 흉내 (토큰 수 계산용)"""
+
+    eos_token_id = 0
+    pad_token_id = 0
+
+    def encode(self, text: str, **kwargs) -> List[int]:
+        return [ord(ch) for ch in text]
+
+    def __call__(self, text, **kwargs) -> Dict:
+        if isinstance(text, list):
+            return {"input_ids": [self.encode(t) for t in text]}
+        return {"input_ids": self.encode(text)}
+
+    def decode(self, ids, **kwargs) -> str:
+        return "".join(chr(i) for i in ids if i)
+
+
+class StubTextGenerationPipeline:
+    """llm(prompt, **kwargs)[i]["generated_text"] 형태로 결정적 문장 반환"""
+
+    supports_seed = True  # 출력이 프롬프트 + 시드로 정해지므로 torch RNG 고정 불필요
+
+    def __init__(self, latency_ms: float = None):
+        """
+        Args:
+            latency_ms: 호출당 가짜 지연 (None이면 COLORWAR_STUB_LATENCY_MS, 기본 0)
+        """
+        self.tokenizer = StubTokenizer()
+        if latency_ms is None:
+            latency_ms = float(os.getenv("COLORWAR_STUB_LATENCY_MS", "0"))
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+
+    def _completion(self, prompt: str, index: int, seed: int = None) -> str:
+        key = f"{prompt}|{index}" if seed is None else f"{prompt}|{seed}|{index}"
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        picks = [_PHRASES[b % len(_PHRASES)] for b in digest[:2]]
+        return " " + " ".join(picks)
+
+    def __call__(self, prompt: str, num_return_sequences: int = 1, seed: int = None, **kwargs) -> List[Dict]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [
+            {"generated_text": prompt + self._completion(prompt, i, seed)}
+            for i in range(num_return_sequences)
+        ]
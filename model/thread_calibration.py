@@ -0,0 +1,266 @@
+"""
+torch 스레드 / 워커 / 배치 자동 보정
+호스트마다 코어 수가 달라 torch 기본 스레드 수로는 과다 구독되거나 코어가 놀기 쉬워서,
+올라간 모델로 직접 생성 속도를 재 보고 가장 좋은 설정을 호스트별로 저장해 둡니다.
+
+    python -m model.thread_calibration --model skt/kogpt2-base-v2
+    COLORWAR_CALIBRATE=1 python main.py      # 서버 시작 시 (저장된 결과가 없으면) 보정
+
+측정 항목
+- 스레드 수별 단일 요청 지연 (대화형 경로: 페르소나 생성 / 토론 응답) → threads
+- 워커 수 × 워커당 스레드 × 배치 크기별 처리량 → workers, threads_per_worker, batch_size
+  (워커 프로세스는 같은 모델을 동시에 호출하는 스레드로 근사 — torch.set_num_threads는 프로세스 전역이라
+   모든 워커 스레드가 같은 값을 공유하고 가중치/캐시도 한 벌만 씀. 결과의 worker_measurement에 기록)
+
+저장된 결과는 load_text_generation이 torch 모델을 올릴 때 자동 적용되고,
+COLORWAR_TORCH_THREADS 가 있으면 그 값이 우선합니다.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from model.llm_loader import CACHE_DIR
+
+CALIBRATION_FILE = Path(os.getenv("COLORWAR_CALIBRATION_FILE", CACHE_DIR / "calibration.json"))
+CALIBRATION_PROMPT = "다음은 정치 뉴스 댓글입니다. 최근 정책에 대해 어떻게 생각하시나요?\n댓글:"
+DEFAULT_BATCH_SIZES = (1, 2, 4)
+
+_applied_lock = threading.Lock()
+_interop_set = False
+
+
+def host_key(model_id: str, backend: str) -> str:
+    """호스트 + 코어 수 + 모델 + 백엔드 (같은 이미지가 다른 크기의 머신에 떠도 따로 저장)"""
+    return f"{socket.gethostname()}/{os.cpu_count()}cpu/{platform.machine()}/{model_id}@{backend}"
+
+
+def _power_of_two_steps(limit: int) -> List[int]:
+    steps, n = [], 1
+    while n < limit:
+        steps.append(n)
+        n *= 2
+    steps.append(limit)
+    return sorted(set(steps))
+
+
+def thread_candidates(cpu_count: Optional[int] = None) -> List[int]:
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return sorted(set(_power_of_two_steps(cpu_count) + [max(1, cpu_count // 2)]))
+
+
+def worker_candidates(cpu_count: Optional[int] = None, max_workers: int = 16) -> List[int]:
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return _power_of_two_steps(min(cpu_count, max_workers))
+
+
+# ==========================================================
+# 저장 / 적용
+# ==========================================================
+def load_calibration(model_id: str, backend: str, path: Path = CALIBRATION_FILE) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get(host_key(model_id, backend))
+    except (OSError, ValueError):
+        return None
+
+
+def save_calibration(model_id: str, backend: str, result: Dict, path: Path = CALIBRATION_FILE):
+    """호스트 키별로 병합 저장 (임시 파일 → rename)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data[host_key(model_id, backend)] = result
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def apply_threads(threads: int, interop_threads: Optional[int] = None):
+    import torch
+
+    global _interop_set
+    with _applied_lock:
+        torch.set_num_threads(threads)
+        if interop_threads and not _interop_set:
+            try:
+                torch.set_num_interop_threads(interop_threads)  # 병렬 작업 시작 전 한 번만 가능
+            except RuntimeError:
+                pass
+            _interop_set = True
+
+
+def apply_calibration(model_id: str, backend: str) -> Optional[Dict]:
+    """
+    COLORWAR_TORCH_THREADS → 저장된 보정 결과 순으로 torch 스레드 설정 (둘 다 없으면 torch 기본값 유지)
+    """
+    override = os.getenv("COLORWAR_TORCH_THREADS")
+    if override:
+        apply_threads(int(override), 1)
+        return {"threads": int(override), "source": "env"}
+
+    result = load_calibration(model_id, backend)
+    if result is None:
+        return None
+    apply_threads(result["threads"], result.get("interop_threads"))
+    print(f"🧵 보정된 스레드 설정 적용: {result['threads']}개 (워커 {result['workers']}개 × {result['threads_per_worker']}, "
+          f"배치 {result['batch_size']})")
+    return result
+
+
+def calibrated_workers(model_id: str, backend: str) -> Optional[int]:
+    result = load_calibration(model_id, backend)
+    return result["workers"] if result else None
+
+
+# ==========================================================
+# 측정
+# ==========================================================
+def _generate_once(model, inputs, batch_size: int, max_new_tokens: int, pad_token_id):
+    import torch
+
+    with torch.inference_mode():
+        model.generate(
+            **inputs,
+            do_sample=True,
+            top_p=0.9,
+            max_new_tokens=max_new_tokens,
+            min_new_tokens=max_new_tokens,  # 조기 종료 없이 같은 토큰 수로 비교
+            num_return_sequences=batch_size,
+            pad_token_id=pad_token_id,
+        )
+
+
+def _measure(model, inputs, workers: int, threads: int, batch_size: int, max_new_tokens: int,
+             pad_token_id, repeats: int) -> Dict:
+    apply_threads(threads)
+    _generate_once(model, inputs, batch_size, max_new_tokens, pad_token_id)  # 워밍업
+
+    latencies = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def job():
+            t = time.perf_counter()
+            _generate_once(model, inputs, batch_size, max_new_tokens, pad_token_id)
+            latencies.append(time.perf_counter() - t)
+        for f in [pool.submit(job) for _ in range(workers * repeats)]:
+            f.result()
+    wall = time.perf_counter() - started
+
+    tokens = workers * repeats * batch_size * max_new_tokens
+    return {
+        "workers": workers,
+        "threads_per_worker": threads,
+        "batch_size": batch_size,
+        "latency_sec": round(sorted(latencies)[len(latencies) // 2], 4),
+        "tokens_per_sec": round(tokens / wall, 2),
+    }
+
+
+def calibrate(llm, thread_counts: Optional[List[int]] = None, worker_counts: Optional[List[int]] = None,
+              batch_sizes=DEFAULT_BATCH_SIZES, max_new_tokens: int = 16, repeats: int = 2,
+              prompt: str = CALIBRATION_PROMPT) -> Dict:
+    """
+    올라간 파이프라인(llm.model / llm.tokenizer)으로 설정 조합을 측정해 가장 좋은 설정 반환
+
+    - threads: 워커 1개, 배치 1 에서 지연이 가장 짧은 스레드 수 (서버 프로세스 안 생성에 적용)
+    - workers / threads_per_worker / batch_size: 초당 토큰이 가장 많은 조합
+    """
+    model, tokenizer = llm.model, llm.tokenizer
+    if model is None or not hasattr(model, "generate"):
+        raise RuntimeError("보정하려면 torch 모델이 올라가 있어야 합니다.")
+
+    import torch
+
+    cpu_count = os.cpu_count() or 1
+    default_threads = torch.get_num_threads()
+    inputs = tokenizer(prompt, return_tensors="pt")
+    pad_token_id = tokenizer.eos_token_id
+
+    results = []
+    # 1) 단일 요청 지연 — 스레드 수만 바꿔 가며
+    for threads in thread_counts or thread_candidates(cpu_count):
+        r = _measure(model, inputs, 1, threads, 1, max_new_tokens, pad_token_id, repeats)
+        results.append(r)
+        print(f"  스레드 {threads:>3} : {r['latency_sec'] * 1000:7.0f}ms/요청, {r['tokens_per_sec']:7.1f} tok/s")
+
+    # 2) 처리량 — 워커 수 × (코어 / 워커) 스레드 × 배치
+    for workers in worker_counts or worker_candidates(cpu_count):
+        threads = max(1, cpu_count // workers)
+        for batch_size in batch_sizes:
+            if workers == 1 and batch_size == 1 and any(
+                    r["workers"] == 1 and r["threads_per_worker"] == threads and r["batch_size"] == 1 for r in results):
+                continue
+            r = _measure(model, inputs, workers, threads, batch_size, max_new_tokens, pad_token_id, repeats)
+            results.append(r)
+            print(f"  워커 {workers:>2} × 스레드 {threads:>3}, 배치 {batch_size}: {r['tokens_per_sec']:7.1f} tok/s "
+                  f"({r['latency_sec'] * 1000:.0f}ms/호출)")
+
+    single = [r for r in results if r["workers"] == 1 and r["batch_size"] == 1]
+    fastest = min(single, key=lambda r: r["latency_sec"])
+    busiest = max(results, key=lambda r: r["tokens_per_sec"])
+    baseline = next((r for r in single if r["threads_per_worker"] == default_threads), None)
+    apply_threads(fastest["threads_per_worker"])
+
+    return {
+        "threads": fastest["threads_per_worker"],
+        "interop_threads": 1,
+        "workers": busiest["workers"],
+        "threads_per_worker": busiest["threads_per_worker"],
+        "batch_size": busiest["batch_size"],
+        "latency_sec": fastest["latency_sec"],
+        "tokens_per_sec": busiest["tokens_per_sec"],
+        "default_threads": default_threads,
+        "default_latency_sec": baseline["latency_sec"] if baseline else None,
+        "max_new_tokens": max_new_tokens,
+        # 워커 조합은 실제 프로세스가 아니라 한 프로세스 안의 스레드로 측정한 근사치
+        "worker_measurement": "threads_in_one_process (torch.set_num_threads shared by all workers)",
+        "measured_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def calibrate_and_save(llm, model_id: str, backend: str, **kwargs) -> Dict:
+    print(f"🧪 스레드/배치 보정 시작: {model_id}@{backend} (CPU {os.cpu_count()}개)")
+    result = calibrate(llm, **kwargs)
+    save_calibration(model_id, backend, result)
+    print(f"✓ 보정 완료: 대화형 스레드 {result['threads']}개 ({result['latency_sec'] * 1000:.0f}ms/요청, "
+          f"기본 {result['default_threads']}개"
+          + (f" {result['default_latency_sec'] * 1000:.0f}ms" if result["default_latency_sec"] else "") + "), "
+          f"최대 처리량 워커 {result['workers']} × 스레드 {result['threads_per_worker']}, 배치 {result['batch_size']} "
+          f"→ {result['tokens_per_sec']} tok/s")
+    print(f"   저장: {CALIBRATION_FILE}")
+    return result
+
+
+if __name__ == "__main__":
+    from model.llm_loader import DEFAULT_MODEL_ID, TINY_MODEL_ID, load_text_generation
+
+    parser = argparse.ArgumentParser(description="torch 스레드 / 워커 / 배치 보정")
+    parser.add_argument("--model", default=DEFAULT_MODEL_ID)
+    parser.add_argument("--backend", choices=["torch", "tiny"], default="torch")
+    parser.add_argument("--threads", type=int, nargs="*", help="측정할 스레드 수 (기본: 1, 2, 4, ..., 코어 수)")
+    parser.add_argument("--workers", type=int, nargs="*", help="측정할 워커 수 (기본: 1, 2, 4, ...)")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--max-new-tokens", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=2)
+    args = parser.parse_args()
+
+    model_id = TINY_MODEL_ID if args.backend == "tiny" else args.model
+    _, _, llm = load_text_generation(args.model, args.backend)
+    calibrate_and_save(
+        llm, model_id, args.backend,
+        thread_counts=args.threads, worker_counts=args.workers, batch_sizes=args.batch_sizes,
+        max_new_tokens=args.max_new_tokens, repeats=args.repeats,
+    )
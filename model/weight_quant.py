@@ -0,0 +1,130 @@
+"""
+로딩 시 가중치 양자화 (CPU)
+선형 계층을 한 층씩 바꿔 끼우므로 원본 float 가중치 전체가 한꺼번에 메모리에 올라오지 않습니다.
+
+- int8: torch 동적 양자화 Linear (int8 가중치 + 실행 시 활성값 양자화, fbgemm/qnnpack 커널)
+- int4: 그룹별 스케일을 둔 4bit 가중치 전용 양자화
+        (torch CPU int4 행렬곱 커널이 있으면 사용, 없으면 순전파 때 한 층씩 float로 복원)
+"""
+
+from typing import Callable, Optional
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+QUANT_MODES = ("int8", "int4")
+
+
+class Int4Linear(nn.Module):
+    """4bit 대칭 양자화 가중치 (바이트당 2개씩 패킹) + 그룹별 float 스케일"""
+
+    def __init__(self, weight: torch.Tensor, bias: Optional[torch.Tensor], group_size: int = 128):
+        super().__init__()
+        out_features, in_features = weight.shape
+        self.in_features = in_features
+        self.out_features = out_features
+        self.group_size = group_size
+
+        padded = -in_features % group_size
+        w = F.pad(weight.float(), (0, padded)).view(out_features, -1, group_size)
+        scales = w.abs().amax(dim=-1, keepdim=True).clamp(min=1e-8) / 7
+        q = (torch.round(w / scales).clamp(-8, 7) + 8).to(torch.uint8).view(out_features, -1)
+        scales = scales.squeeze(-1).to(torch.float32)
+
+        self.use_kernel = False
+        if not padded and hasattr(torch.ops.aten, "_weight_int4pack_mm_for_cpu"):
+            try:
+                packed = torch.ops.aten._convert_weight_to_int4pack_for_cpu(q.to(torch.int32), 2)
+                # 커널 형식: [그룹 수, 출력, (스케일, 영점)], 대칭이라 영점 0
+                scales = torch.stack([scales.t(), torch.zeros_like(scales.t())], dim=-1).contiguous()
+                self.use_kernel = True
+            except RuntimeError:
+                pass
+        if not self.use_kernel:
+            if q.shape[1] % 2:
+                q = F.pad(q, (0, 1), value=8)
+            packed = q[:, 0::2] | (q[:, 1::2] << 4)
+
+        self.register_buffer("packed", packed)
+        self.register_buffer("scales", scales)
+        self.bias = nn.Parameter(bias.detach().float().clone(), requires_grad=False) if bias is not None else None
+
+    def dequantize(self) -> torch.Tensor:
+        q = torch.stack([self.packed & 0x0F, self.packed >> 4], dim=-1).view(self.out_features, -1)
+        groups = self.scales.shape[1]
+        w = (q[:, :groups * self.group_size].to(torch.float32) - 8).view(self.out_features, groups, self.group_size)
+        w = (w * self.scales.unsqueeze(-1)).view(self.out_features, -1)
+        return w[:, :self.in_features]
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = x.to(torch.float32)
+        if not self.use_kernel:
+            return F.linear(x, self.dequantize(), self.bias)
+        out = torch.ops.aten._weight_int4pack_mm_for_cpu(
+            x.reshape(-1, self.in_features).contiguous(), self.packed, self.group_size, self.scales
+        ).view(*x.shape[:-1], self.out_features)
+        return out + self.bias if self.bias is not None else out
+
+    def extra_repr(self) -> str:
+        return f"in_features={self.in_features}, out_features={self.out_features}, group_size={self.group_size}"
+
+
+def _linear_weight(module: nn.Module):
+    """(weight[out, in], bias) 또는 None — GPT-2 Conv1D는 가중치가 [in, out]이라 전치"""
+    if isinstance(module, nn.Linear):
+        return module.weight, module.bias
+    try:
+        from transformers.pytorch_utils import Conv1D
+    except ImportError:
+        return None
+    if isinstance(module, Conv1D):
+        return module.weight.t(), module.bias
+    return None
+
+
+def _quantize_one(weight: torch.Tensor, bias: Optional[torch.Tensor], mode: str, group_size: int) -> nn.Module:
+    if mode == "int4":
+        return Int4Linear(weight, bias, group_size)
+
+    linear = nn.Linear(weight.shape[1], weight.shape[0], bias=bias is not None)
+    linear.weight = nn.Parameter(weight.detach().float(), requires_grad=False)
+    if bias is not None:
+        linear.bias = nn.Parameter(bias.detach().float(), requires_grad=False)
+    linear.qconfig = torch.ao.quantization.default_dynamic_qconfig
+    return torch.ao.nn.quantized.dynamic.Linear.from_float(linear)
+
+
+def quantize_weights(model: nn.Module, mode: str, group_size: int = 128, skip=("lm_head",),
+                     on_replaced: Optional[Callable[[str], None]] = None) -> nn.Module:
+    """
+    선형 계층을 한 층씩 양자화 계층으로 교체
+
+    Args:
+        mode: "int8" | "int4"
+        group_size: int4 스케일 그룹 크기
+        skip: 교체하지 않을 모듈 이름 (출력층은 임베딩과 묶여 있는 경우가 많음)
+        on_replaced: 교체 직후 호출 (원본 가중치 모듈 이름 전달 → mmap 페이지 반납 등)
+    """
+    if mode not in QUANT_MODES:
+        raise ValueError(f"알 수 없는 양자화 방식: {mode} (선택: {', '.join(QUANT_MODES)})")
+
+    targets = []
+    for name, module in model.named_modules():
+        if any(name == s or name.endswith("." + s) for s in skip):
+            continue
+        if _linear_weight(module) is not None:
+            targets.append(name)
+
+    with torch.no_grad():
+        for name in targets:
+            parent_name, _, child_name = name.rpartition(".")
+            parent = model.get_submodule(parent_name) if parent_name else model
+            weight, bias = _linear_weight(getattr(parent, child_name))
+            setattr(parent, child_name, _quantize_one(weight, bias, mode, group_size))
+            del weight, bias
+            if on_replaced:
+                on_replaced(name)
+
+    model.weight_quantization = mode
+    return model
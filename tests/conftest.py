@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT))
+
+# 모델 없이 결정적 문장을 돌려주는 스텁 백엔드로 (main import 전에)
+os.environ.setdefault("COLORWAR_LLM_BACKEND", "stub")
+os.environ.setdefault("COLORWAR_PERSONA_REFRESH", "0")
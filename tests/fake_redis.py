@@ -0,0 +1,162 @@
+"""
+테스트용 프로세스 내부 Redis 대역 (redis-py 클라이언트 API 중 RedisStateStore가 쓰는 부분만)
+
+- 값은 decode_responses=False 클라이언트처럼 bytes로 돌려줌
+- 키마다 쓰기 버전을 두고 WATCH한 키가 EXEC 전에 바뀌면 WatchError (redis-py와 같은 이름)
+- WATCH 후 MULTI 전까지는 즉시 실행, MULTI 이후(또는 WATCH 없는 파이프라인)는 모았다가 EXEC에서 원자적으로 실행
+"""
+
+import threading
+from collections import defaultdict
+
+
+class WatchError(Exception):
+    """WATCH한 키가 EXEC 전에 수정됨"""
+
+
+def _bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+class FakeRedis:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = {}
+        self._versions = defaultdict(int)
+        self.on_multi = None  # MULTI 직후 호출할 함수 (경합 재현용)
+
+    def _touch(self, key):
+        self._versions[key] += 1
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    # --- 문자열 ---
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = _bytes(value)
+            self._touch(key)
+            return True
+
+    def incrby(self, key, amount=1):
+        with self._lock:
+            value = int(self._data.get(key, b"0")) + amount
+            self._data[key] = _bytes(value)
+            self._touch(key)
+            return value
+
+    def incr(self, key):
+        return self.incrby(key, 1)
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    removed += 1
+                    self._touch(key)
+            return removed
+
+    # --- 리스트 ---
+    def rpush(self, key, *values):
+        with self._lock:
+            items = self._data.setdefault(key, [])
+            items.extend(_bytes(v) for v in values)
+            self._touch(key)
+            return len(items)
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            items = self._data.get(key, [])
+            return items[start:None if end == -1 else end + 1]
+
+    def llen(self, key):
+        with self._lock:
+            return len(self._data.get(key, []))
+
+    # --- 집합 ---
+    def sadd(self, key, *members):
+        with self._lock:
+            items = self._data.setdefault(key, set())
+            before = len(items)
+            items.update(_bytes(m) for m in members)
+            self._touch(key)
+            return len(items) - before
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._data.get(key, set()))
+
+    # --- 해시 ---
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            fields = self._data.setdefault(key, {})
+            updates = dict(mapping or {})
+            if field is not None:
+                updates[field] = value
+            added = sum(1 for f in updates if _bytes(f) not in fields)
+            fields.update({_bytes(f): _bytes(v) for f, v in updates.items()})
+            self._touch(key)
+            return added
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._data.get(key, {}).get(_bytes(field))
+
+    def hmget(self, key, *fields):
+        with self._lock:
+            values = self._data.get(key, {})
+            return [values.get(_bytes(f)) for f in fields]
+
+
+class FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self._watched = {}
+        self._immediate = False
+        self._queue = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def reset(self):
+        self._watched, self._immediate, self._queue = {}, False, []
+
+    def watch(self, *keys):
+        with self.client._lock:
+            self._watched.update({k: self.client._versions[k] for k in keys})
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+        if self.client.on_multi:
+            self.client.on_multi()
+
+    def execute(self):
+        with self.client._lock:
+            try:
+                if any(self.client._versions[k] != v for k, v in self._watched.items()):
+                    raise WatchError("watched key changed")
+                return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self._queue]
+            finally:
+                self.reset()
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            if self._immediate:
+                return command(*args, **kwargs)
+            self._queue.append((name, args, kwargs))
+            return self
+
+        return call
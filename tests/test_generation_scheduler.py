@@ -0,0 +1,52 @@
+"""
+생성 스케줄러 테스트 (가중 DRR + 토큰 버킷)
+"""
+
+import asyncio
+
+import pytest
+
+from generation_scheduler import GenerationScheduler
+
+
+def _run_all(scheduler, jobs):
+    """(세션 ID, 이름, 비용) 목록을 한꺼번에 제출하고 완료된 순서대로 이름 반환"""
+    finished = []
+
+    async def main():
+        async def one(session_id, name, cost):
+            await scheduler.submit(session_id, finished.append, name, cost=cost)
+
+        await asyncio.wait_for(asyncio.gather(*(one(*job) for job in jobs)), timeout=10)
+
+    asyncio.run(main())
+    return finished
+
+
+@pytest.mark.parametrize("tokens_per_second", [None, 2000.0])
+def test_job_larger_than_burst_runs_without_starving_others(tokens_per_second):
+    scheduler = GenerationScheduler(quantum=10, tokens_per_second=tokens_per_second, burst_tokens=20)
+    big_cost = 100  # 몫 2개(20)와 버킷 최대치(20)를 모두 넘는 작업
+    assert big_cost > scheduler.burst_tokens and big_cost > 2 * scheduler.quantum
+
+    jobs = [("big", "big", big_cost)] + [("small", f"small-{i}", 5) for i in range(6)]
+    finished = _run_all(scheduler, jobs)
+
+    assert sorted(finished) == sorted(name for _, name, _ in jobs)
+    # 큰 작업이 몫을 모으는 동안 작은 작업들이 먼저 차례를 받음
+    assert finished.index("big") > 0
+    assert finished[0].startswith("small")
+
+    stats = scheduler.stats()
+    assert stats["big"]["tokens_used"] == big_cost
+    assert stats["small"]["completed"] == 6
+
+
+def test_rate_limited_big_job_leaves_debt_for_its_own_session_only():
+    scheduler = GenerationScheduler(quantum=10, tokens_per_second=2000.0, burst_tokens=20)
+    jobs = [("big", "big-1", 100), ("big", "big-2", 5)] + [("small", f"small-{i}", 5) for i in range(4)]
+    finished = _run_all(scheduler, jobs)
+
+    # 큰 작업의 초과분(빚)은 같은 세션의 다음 작업만 늦추고 다른 세션 작업은 모두 그보다 먼저 끝남
+    assert finished.index("big-2") == len(finished) - 1
+    assert all(finished.index(f"small-{i}") < finished.index("big-2") for i in range(4))
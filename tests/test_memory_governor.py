@@ -0,0 +1,86 @@
+"""
+모델 메모리 관리자 테스트 (작은 GPT-2를 설정으로 바로 만들어 mmap 오프로드 확인)
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from memory_governor import MemoryGovernor
+from model.mmap_weights import weights_key
+
+
+def _tiny_model():
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(n_layer=1, n_embd=16, n_head=2, vocab_size=64, n_positions=32)
+    return transformers.GPT2LMHeadModel(config).eval()
+
+
+def _loader(model):
+    return lambda: (model, None, SimpleNamespace(model=model))
+
+
+def _logits(model):
+    with torch.no_grad():
+        return model(torch.tensor([[1, 2, 3, 4]])).logits
+
+
+def test_mmap_offload_writes_keyed_copy_atomically(tmp_path):
+    governor = MemoryGovernor(offload_mode="mmap", cache_dir=tmp_path)
+    model = _tiny_model()
+    expected = _logits(model)
+    _, _, llm = governor.load("tiny", "tiny", _loader(model))
+
+    # 이름만 같은 미완성 디렉토리 (이전 버전의 오프로드 위치, 중단된 저장)는 쓰지 않음
+    (governor.cache_dir / "tiny").mkdir(parents=True)
+    (governor.cache_dir / "tiny" / "config.json").write_text("{}")
+
+    governor.offload("tiny")
+    assert governor.stats()["models"][0]["state"] == "mapped"
+    assert sorted(p.name for p in governor.cache_dir.iterdir()) == ["tiny", f"tiny-{weights_key(model)}"]
+
+    with llm.hold() as mapped:
+        assert torch.allclose(_logits(mapped), expected)
+
+
+def test_key_changes_with_dtype():
+    model = _tiny_model()
+    assert weights_key(model) != weights_key(_tiny_model().half())
+
+
+def test_offload_does_not_hold_lock_while_saving(tmp_path, monkeypatch):
+    governor = MemoryGovernor(offload_mode="mmap", cache_dir=tmp_path)
+    model = _tiny_model()
+    governor.load("tiny", "tiny", _loader(model))
+
+    saving, proceed = threading.Event(), threading.Event()
+    save_pretrained = model.save_pretrained
+
+    def slow_save(*args, **kwargs):
+        saving.set()
+        assert proceed.wait(5)
+        return save_pretrained(*args, **kwargs)
+
+    monkeypatch.setattr(model, "save_pretrained", slow_save)
+    worker = threading.Thread(target=governor.offload, args=("tiny",))
+    worker.start()
+    assert saving.wait(5)
+
+    # 저장 중에도 다른 호출은 lock을 얻음, 오프로드 중인 모델은 그동안 내주지 않음
+    assert governor.stats()["models"][0]["state"] == "offloading"
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(governor.acquire("tiny")))
+    waiter.start()
+    waiter.join(0.2)
+    assert not acquired
+
+    proceed.set()
+    worker.join(5)
+    waiter.join(5)
+    assert acquired and acquired[0].file_backed
+    governor.release("tiny")
+
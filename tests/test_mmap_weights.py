@@ -0,0 +1,50 @@
+"""
+safetensors mmap 로더 테스트 (작은 GPT-2를 설정으로 바로 만들어 저장)
+"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+from safetensors.torch import load_file, save_file
+
+from model.mmap_weights import load_model_mmap
+
+
+def _save_tiny(path, **config):
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(n_layer=1, n_embd=16, n_head=2, vocab_size=64, n_positions=32, **config)
+    model = transformers.GPT2LMHeadModel(config).eval()
+    model.save_pretrained(path, safe_serialization=True)
+    return model
+
+
+def _rewrite(path, fn):
+    shard = path / "model.safetensors"
+    save_file(fn(load_file(shard)), shard, metadata={"format": "pt"})
+
+
+def test_tied_lm_head_may_be_missing(tmp_path):
+    model = _save_tiny(tmp_path)
+    assert "lm_head.weight" not in load_file(tmp_path / "model.safetensors")
+
+    mapped = load_model_mmap(tmp_path)
+    ids = torch.tensor([[1, 2, 3]])
+    with torch.no_grad():
+        assert torch.allclose(mapped(ids).logits, model(ids).logits)
+
+
+def test_renamed_keys_are_rejected(tmp_path):
+    _save_tiny(tmp_path)
+    _rewrite(tmp_path, lambda state: {k.replace("transformer.h.0.", "transformer.block.0."): v for k, v in state.items()})
+
+    with pytest.raises(ValueError, match="transformer.h.0"):
+        load_model_mmap(tmp_path)
+
+
+def test_untied_lm_head_must_be_present(tmp_path):
+    _save_tiny(tmp_path, tie_word_embeddings=False)
+    _rewrite(tmp_path, lambda state: {k: v for k, v in state.items() if k != "lm_head.weight"})
+
+    with pytest.raises(ValueError, match="lm_head.weight"):
+        load_model_mmap(tmp_path)
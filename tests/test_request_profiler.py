@@ -0,0 +1,51 @@
+"""
+요청 프로파일러 테스트 (이벤트 루프 cProfile은 한 번에 하나만)
+"""
+
+import asyncio
+import json
+
+from request_profiler import ProfilingMiddleware, RequestProfiler
+
+
+def test_overlapping_captures_profile_loop_once(tmp_path):
+    profiler = RequestProfiler(output_dir=tmp_path, admin_token="secret")
+    profiler.arm(2, path_prefix="/api/")
+    both_started = asyncio.Event()
+    started = []
+
+    async def app(scope, receive, send):
+        started.append(scope["path"])
+        if len(started) == 2:
+            both_started.set()
+        await both_started.wait()  # 두 요청이 동시에 처리 중인 상태
+        sum(i * i for i in range(10000))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = ProfilingMiddleware(app, profiler)
+
+    async def request(path):
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        await middleware({"type": "http", "method": "POST", "path": path}, receive, send)
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(request("/api/a"), request("/api/b")), timeout=10)
+
+    asyncio.run(main())
+
+    captures = profiler.status()["captures"]
+    assert len(captures) == 2
+    assert sorted(c["loop_timing_only"] for c in captures) == [False, True]
+    assert profiler.loop_profile is None and profiler.active == 0
+
+    for capture in captures:
+        trace = json.loads((tmp_path / f"{capture['id']}.trace.json").read_text(encoding="utf-8"))
+        assert trace["otherData"]["loop_timing_only"] == capture["loop_timing_only"]
+        assert any(e["ph"] == "X" for e in trace["traceEvents"])  # 구간 시간은 둘 다 기록
+        assert (tmp_path / f"{capture['id']}.pstats").exists() != capture["loop_timing_only"]
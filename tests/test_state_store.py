@@ -0,0 +1,204 @@
+"""
+상태 저장소 테스트 (RedisStateStore는 프로세스 내부 대역 FakeRedis로)
+"""
+
+import json
+
+import pytest
+
+from fake_redis import FakeRedis
+from model.state_store import (
+    COMPRESS_MIN_BYTES, RECORD_SCHEMA, DebateRecord, InMemoryStateStore, RedisStateStore, StateConflictError,
+    StateStore, decode, encode,
+)
+
+LEFT = ["복지 확대가 필요하다", "재벌 개혁이 먼저다", "노동자 권리를 지켜야 한다", "부자 감세는 안 된다", "공공의료를 늘려야 한다"]
+RIGHT = ["감세가 경제를 살린다", "규제를 풀어야 기업이 산다", "안보가 최우선이다", "포퓰리즘 복지는 망국", "원전을 다시 늘려야"]
+
+
+@pytest.fixture
+def redis_client():
+    return FakeRedis()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request, redis_client):
+    return InMemoryStateStore() if request.param == "memory" else RedisStateStore(client=redis_client)
+
+
+def test_state_store_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+
+# ----------------------------------------------------------
+# 직렬화
+# ----------------------------------------------------------
+def test_encode_compresses_only_long_payloads():
+    short = {"a": 1}
+    long = {"messages": ["긴 발언입니다. " * 10] * 20}
+    assert encode(short)[:1] == b"j"
+    assert encode(long)[:1] == b"z"
+    assert len(encode(long)) < len(long["messages"][0].encode("utf-8")) * 20
+    assert decode(encode(short)) == short
+    assert decode(encode(long)) == long
+
+
+def test_debate_record_round_trip_through_redis(redis_client):
+    store = RedisStateStore(client=redis_client)
+    messages = [{"side": "left" if i % 2 else "right", "content": f"{i}번째 발언입니다. " * 8} for i in range(12)]
+    record = DebateRecord({"message_count": 12, "messages": messages, "is_active": True},
+                          seed=42, pending=(12, "left", ["후보 하나", "후보 둘"]))
+    assert len(json.dumps(record.state, ensure_ascii=False).encode("utf-8")) > COMPRESS_MIN_BYTES
+
+    assert store.save_debate("s1", record) == 1
+    blob = redis_client.hget(store._key("debate", "s1"), "d")
+    assert blob[:1] == b"z"
+
+    loaded = store.load_debate("s1")
+    assert loaded.state == record.state
+    assert loaded.seed == 42
+    assert loaded.pending == (12, "left", ["후보 하나", "후보 둘"])
+    assert loaded.version == 1
+
+
+def test_legacy_record_is_backfilled_once(monkeypatch, store):
+    import main
+
+    # 형식 버전이 없던 시절의 기록 (발언별 감정 강도 없음)
+    messages = [{"side": "left", "content": "복지를 늘려야 합니다!!"}, {"side": "right", "content": "세금은 어쩌고요"}]
+    legacy = encode({"s": {"message_count": 2, "messages": messages, "is_active": True}, "seed": None, "p": None})
+    assert DebateRecord.from_blob(legacy, 1).schema == 0
+    store.save_debate("old", DebateRecord.from_blob(legacy, 0), force=True)
+
+    calls = []
+    backfill = main.legacy_tracker.backfill
+    monkeypatch.setattr(main, "state_store", store)
+    monkeypatch.setattr(main.legacy_tracker, "backfill", lambda state: (calls.append(1), backfill(state)))
+
+    record, state = main._load_session("old")
+    assert calls and all(m.intensity is not None for m in state.messages)
+    main._save_session("old", record, state)
+
+    record, state = main._load_session("old")
+    assert len(calls) == 1
+    assert record.schema == RECORD_SCHEMA
+    assert all(m.intensity is not None for m in state.messages)
+
+
+# ----------------------------------------------------------
+# 낙관적 동시성 제어
+# ----------------------------------------------------------
+def test_stale_version_conflicts(store):
+    store.save_debate("s1", DebateRecord({"message_count": 0}), force=True)
+    first, second = store.load_debate("s1"), store.load_debate("s1")
+
+    first.state["message_count"] = 1
+    assert store.save_debate("s1", first) == 2
+    second.state["message_count"] = 1
+    with pytest.raises(StateConflictError):
+        store.save_debate("s1", second)
+
+    assert store.load_debate("s1").version == 2
+    assert store.save_debate("s1", second, force=True) == 3
+
+
+def test_write_between_watch_and_exec_conflicts(redis_client):
+    store = RedisStateStore(client=redis_client)
+    other = RedisStateStore(client=redis_client)
+    store.save_debate("s1", DebateRecord({"message_count": 0}))
+    record = store.load_debate("s1")
+
+    # 버전 확인(WATCH) 뒤 EXEC 전에 다른 워커가 같은 세션을 저장
+    def race():
+        redis_client.on_multi = None
+        other.save_debate("s1", other.load_debate("s1"))
+
+    redis_client.on_multi = race
+    with pytest.raises(StateConflictError):
+        store.save_debate("s1", record)
+    assert store.load_debate("s1").version == 2
+
+
+def test_api_returns_409_on_concurrent_save(monkeypatch, redis_client):
+    from fastapi.testclient import TestClient
+    import main
+
+    store = RedisStateStore(client=redis_client)
+    monkeypatch.setattr(main, "state_store", store)
+    with TestClient(main.app) as client:
+        client.post("/api/comments/left", json={"comments": LEFT})
+        client.post("/api/comments/right", json={"comments": RIGHT})
+        assert client.post("/api/comments/generate-persona").status_code == 200
+        assert client.post("/api/debate/start", params={"session_id": "race"}).status_code == 200
+
+        def race():
+            redis_client.on_multi = None
+            store.save_debate("race", store.load_debate("race"))
+
+        redis_client.on_multi = race
+        response = client.post("/api/debate/next", params={"session_id": "race"})
+        assert response.status_code == 409
+
+        assert client.post("/api/debate/next", params={"session_id": "race"}).status_code == 200
+        client.post("/api/comments/reset")
+
+
+# ----------------------------------------------------------
+# 댓글 풀 / 세대 번호
+# ----------------------------------------------------------
+def test_reset_pool_clears_and_bumps_epoch(store):
+    store.append_comments("left", LEFT)
+    store.set_persona("left", {"name": "좌"})
+    store.incr_counter("seen", 5)
+    epoch = store.pool_epoch()
+
+    assert store.reset_pool() == epoch + 1
+    assert store.pool_epoch() == epoch + 1
+    assert store.get_comments("left") == []
+    assert store.get_persona("left") is None
+    assert store.get_counter("seen") == 0
+
+
+def test_replace_persona_compares_built_at(store):
+    store.set_persona("left", {"name": "처음", "basis": {"built_at": 1.0}})
+
+    assert not store.replace_persona("left", {"name": "늦은 갱신", "basis": {"built_at": 3.0}}, expected_built_at=0.5)
+    assert store.get_persona("left")["name"] == "처음"
+
+    assert store.replace_persona("left", {"name": "갱신", "basis": {"built_at": 2.0}}, expected_built_at=1.0)
+    assert store.get_persona("left")["name"] == "갱신"
+
+    store.reset_pool()
+    assert not store.replace_persona("left", {"name": "초기화 뒤", "basis": {"built_at": 4.0}}, expected_built_at=2.0)
+    assert store.get_persona("left") is None
+
+
+def test_replace_persona_loses_to_concurrent_write(redis_client):
+    store = RedisStateStore(client=redis_client)
+    store.set_persona("left", {"name": "처음", "basis": {"built_at": 1.0}})
+
+    def race():
+        redis_client.on_multi = None
+        store.set_persona("left", {"name": "수동 재생성", "basis": {"built_at": 5.0}})
+
+    redis_client.on_multi = race
+    assert not store.replace_persona("left", {"name": "갱신", "basis": {"built_at": 2.0}}, expected_built_at=1.0)
+    assert store.get_persona("left")["name"] == "수동 재생성"
+
+
+def test_dedup_index_follows_other_workers_and_epoch(redis_client):
+    from model.comment_persona_engine import CommentPersonaEngine
+
+    worker_a = CommentPersonaEngine(backend="stub", store=RedisStateStore(client=redis_client))
+    worker_b = CommentPersonaEngine(backend="stub", store=RedisStateStore(client=redis_client))
+
+    assert worker_a.add_left_comments(LEFT) == 5
+    # B의 로컬 인덱스는 비어 있지만 추가 전에 저장소에서 A가 넣은 댓글을 따라잡아 중복으로 거름
+    assert worker_b.add_left_comments(LEFT[:2] + ["사교육비 부담을 줄여야 한다"]) == 6
+    assert worker_b.get_stats()["duplicates_removed"] == 2
+
+    # A가 풀을 초기화하면 B는 세대 번호가 바뀐 것을 보고 로컬 인덱스도 비움
+    worker_a.reset()
+    assert worker_b.add_left_comments(LEFT) == 5
+    assert worker_b.left_comments == LEFT